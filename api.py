@@ -0,0 +1,467 @@
+"""
+JSON API v1 (/api/v1) для киосков со сканером и мобильных клиентов.
+
+- Авторизация — та же cookie-сессия, что у сайта: POST /api/v1/session {"username", "password"}.
+- Пакетные операции: заявки, возвраты, поиск предметов по списку номеров (один IN-запрос),
+  решения по заявкам — до API_MAX_BATCH элементов за вызов; результат — по элементу на вход.
+- ?fields=a,b — выбрать только нужные поля: в SELECT попадают только эти колонки.
+- Ответы больше API_COMPRESS_MIN_BYTES сжимаются brotli (если установлен пакет brotli)
+  или gzip — по Accept-Encoding клиента.
+"""
+from flask import Blueprint, current_app, jsonify, request, session
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import load_only
+
+from approvals import APPROVAL_ACTIONS, MAX_BULK_REQUESTS, process_requests
+from audit_log import log_action
+from auth import authenticate, current_user, current_user_id, is_admin
+from bulk_import import import_inventory
+from db_routing import read_replica
+from events import publish_request
+from models import db, InventoryItem, UserRequest, PurchasePlan
+from pagination import (keyset_paginate, parse_inventory_filters, filter_inventory_query, inventory_order,
+                        parse_per_page)
+from purchasing import ReceiveError, default_number_prefix, filter_plan_query, parse_plan_filters, parse_quantity, receive_plans
+from query_budget import query_budget
+
+try:
+    import brotli
+except ImportError:  # необязательная зависимость: без неё только gzip
+    brotli = None
+
+# Предел одного пакетного вызова — как у /admin/requests/bulk
+API_MAX_BATCH = MAX_BULK_REQUESTS
+API_COMPRESS_MIN_BYTES = 1024
+REQUEST_TYPES = ('get_item', 'repair_item')
+
+ITEM_FIELDS = {
+    'id': InventoryItem.id,
+    'inventory_number': InventoryItem.inventory_number,
+    'name': InventoryItem.name,
+    'condition': InventoryItem.condition,
+    'is_available': InventoryItem.is_available,
+    'assigned_to': InventoryItem.assigned_to,
+}
+REQUEST_FIELDS = {
+    'id': UserRequest.id,
+    'user_id': UserRequest.user_id,
+    'request_type': UserRequest.request_type,
+    'inventory_number': UserRequest.inventory_number,
+    'item_id': UserRequest.item_id,
+    'comment': UserRequest.comment,
+    'status': UserRequest.status,
+    'created_at': UserRequest.created_at,
+    'processed_at': UserRequest.processed_at,
+}
+PLAN_FIELDS = {
+    'id': PurchasePlan.id,
+    'item_name': PurchasePlan.item_name,
+    'supplier_name': PurchasePlan.supplier_name,
+    'planned_price': PurchasePlan.planned_price,
+    'quantity': PurchasePlan.quantity,
+    'status': PurchasePlan.status,
+    'received_at': PurchasePlan.received_at,
+}
+
+api = Blueprint('api_v1', __name__, url_prefix='/api/v1')
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@api.errorhandler(ApiError)
+def handle_api_error(error):
+    return jsonify({'error': error.message}), error.status
+
+
+@api.app_errorhandler(404)
+@api.app_errorhandler(405)
+def handle_http_error(error):
+    # Неизвестный адрес под /api/v1 не доходит до blueprint — отвечаем JSON по префиксу пути
+    if not request.path.startswith(api.url_prefix + '/'):
+        return error
+    return jsonify({'error': error.name}), error.code
+
+
+def require_login():
+    if 'username' not in session:
+        raise ApiError('login required', 401)
+
+
+def require_admin():
+    require_login()
+    if not is_admin():
+        raise ApiError('forbidden', 403)
+
+
+def require_user():
+    """Обычный пользователь (у администратора нет своих заявок и предметов)."""
+    require_login()
+    if is_admin():
+        raise ApiError('forbidden', 403)
+    user = current_user()
+    if user is None:
+        raise ApiError('login required', 401)
+    return user
+
+
+def parse_fields(available, *key_columns):
+    """
+    ?fields=a,b -> (колонки для SELECT, имена в ответе). key_columns (ключ пагинации)
+    выбираются всегда, но в ответ попадают, только если их попросили.
+    """
+    raw = request.args.get('fields', '')
+    names = [name.strip() for name in raw.split(',') if name.strip()] or list(available)
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ApiError(f"unknown fields: {', '.join(unknown)}; available: {', '.join(available)}")
+    columns = [available[name] for name in names]
+    for key_column in key_columns:
+        if key_column not in columns:
+            columns.append(key_column)
+    return columns, names
+
+
+def row_to_dict(row, names):
+    result = {}
+    for name in names:
+        value = getattr(row, name)
+        result[name] = value.isoformat() if hasattr(value, 'isoformat') else value
+    return result
+
+
+def batch_from_json(key):
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get(key), list):
+        raise ApiError(f'JSON body with a "{key}" list is required')
+    batch = payload[key]
+    if len(batch) > API_MAX_BATCH:
+        raise ApiError(f'at most {API_MAX_BATCH} entries per call', 413)
+    return payload, batch
+
+
+def page_response(page, names, key):
+    return jsonify({
+        key: [row_to_dict(row, names) for row in page.items],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+    })
+
+
+@api.after_request
+def compress_response(response):
+    """brotli / gzip для JSON-ответов больше API_COMPRESS_MIN_BYTES (по Accept-Encoding)."""
+    response.vary.add('Accept-Encoding')
+    if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+            or 'Content-Encoding' in response.headers or not response.is_json):
+        return response
+    data = response.get_data()
+    if len(data) < current_app.config.get('API_COMPRESS_MIN_BYTES', API_COMPRESS_MIN_BYTES):
+        return response
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        response.set_data(brotli.compress(data, quality=4))
+        response.headers['Content-Encoding'] = 'br'
+    elif accepted['gzip']:
+        import gzip  # только для сжатия ответов — не грузим при старте воркера
+        response.set_data(gzip.compress(data, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+# -------------------- Сессия --------------------
+
+@api.route('/session', methods=['POST'])
+def create_session():
+    payload = request.get_json(silent=True) or {}
+    result = authenticate(payload.get('username'), payload.get('password'), request.remote_addr or '')
+    if result.status in ('throttled', 'busy'):
+        status = 429 if result.status == 'throttled' else 503
+        return jsonify({'error': result.status}), status, {'Retry-After': str(result.retry_after)}
+    if not result.ok:
+        raise ApiError('invalid username or password', 401)
+    log_action(result.user.id, 'Logged in')
+    db.session.commit()
+    return jsonify({'id': result.user.id, 'username': result.user.username, 'admin': is_admin()})
+
+
+@api.route('/session', methods=['DELETE'])
+def delete_session():
+    user_id = session.get('user_id')
+    session.clear()
+    if user_id is not None:
+        log_action(user_id, 'Logged out')
+        db.session.commit()
+    return '', 204
+
+
+# -------------------- Инвентарь --------------------
+
+@api.route('/items')
+@read_replica
+@query_budget(2)
+def list_items():
+    """
+    Инвентарь постранично с фильтрами списка: condition, available, assigned_to, q.
+    Keyset по номеру, с q — по (name, номер): порядок индекса, см. pagination.inventory_order.
+    """
+    require_login()
+    filters = parse_inventory_filters(request.args)
+    order = inventory_order(filters)
+    columns, names = parse_fields(ITEM_FIELDS, *order)
+    query = filter_inventory_query(db.session.query(*columns), filters)
+    page = keyset_paginate(query, order, after=request.args.get('after'),
+                           before=request.args.get('before'), per_page=parse_per_page(request.args.get('per_page')))
+    return page_response(page, names, 'items')
+
+
+@api.route('/items/lookup', methods=['POST'])
+@read_replica(methods=('POST',))
+@query_budget(2)
+def lookup_items():
+    """{"numbers": [...]} -> предметы в порядке запроса (одним IN) + список ненайденных номеров."""
+    require_login()
+    _, numbers = batch_from_json('numbers')
+    numbers = [str(number).strip() for number in numbers]
+    columns, names = parse_fields(ITEM_FIELDS, InventoryItem.inventory_number)
+    rows = {}
+    if numbers:
+        rows = {row.inventory_number: row for row in db.session.query(*columns)
+                .filter(InventoryItem.inventory_number.in_(set(numbers)))}
+    return jsonify({
+        'items': [row_to_dict(rows[number], names) for number in numbers if number in rows],
+        'missing': [number for number in numbers if number not in rows],
+    })
+
+
+@api.route('/items', methods=['POST'])
+def import_items():
+    """Пакетное создание (и при "upsert": true — обновление) предметов, как /admin/import."""
+    require_admin()
+    payload, records = batch_from_json('items')
+    if not all(isinstance(record, dict) for record in records):
+        raise ApiError('"items" must be a list of objects')
+    report = import_inventory(enumerate(records, 1), upsert=bool(payload.get('upsert')))
+    log_action(current_user_id(),
+               f"Imported items via API: {report.inserted} inserted, {report.updated} updated, {report.failed} failed")
+    db.session.commit()
+    return jsonify(report.to_dict()), 201 if report.inserted else 200
+
+
+@api.route('/me/items')
+@query_budget(2)
+def my_items():
+    user = require_user()
+    columns, names = parse_fields(ITEM_FIELDS)
+    rows = db.session.query(*columns).filter(InventoryItem.assigned_to == user.id) \
+        .order_by(InventoryItem.inventory_number).all()
+    return jsonify({'items': [row_to_dict(row, names) for row in rows]})
+
+
+@api.route('/returns', methods=['POST'])
+def return_items():
+    """
+    {"numbers": [...]} — вернуть свои предметы одним вызовом. Результат по каждому номеру:
+    returned / not_assigned (предмет не за вами) / not_found.
+    """
+    user = require_user()
+    _, numbers = batch_from_json('numbers')
+    numbers = list(dict.fromkeys(str(number).strip() for number in numbers))
+    items = {}
+    if numbers:
+        items = {item.inventory_number: item for item in InventoryItem.query.options(
+            load_only(InventoryItem.id, InventoryItem.inventory_number, InventoryItem.name,
+                      InventoryItem.condition, InventoryItem.assigned_to, InventoryItem.is_available)
+        ).filter(InventoryItem.inventory_number.in_(numbers)).order_by(InventoryItem.id).with_for_update()}
+    results = []
+    for number in numbers:
+        item = items.get(number)
+        if item is None:
+            results.append({'inventory_number': number, 'status': 'not_found'})
+        elif item.assigned_to != user.id:
+            results.append({'inventory_number': number, 'status': 'not_assigned'})
+        else:
+            item.assigned_to = None
+            item.is_available = True
+            # Та же запись, что у возврата через сайт: по ней считается отчёт о длительности выдачи
+            log_action(user.id, f"Returned item #{number}")
+            results.append({'inventory_number': number, 'status': 'returned'})
+    db.session.commit()
+    return jsonify({'results': results})
+
+
+# -------------------- Заявки --------------------
+
+@api.route('/requests')
+@read_replica
+@query_budget(3)
+def list_requests():
+    """Свои заявки пользователя или (администратору) все, с фильтром ?status=; keyset по id."""
+    require_login()
+    columns, names = parse_fields(REQUEST_FIELDS, UserRequest.id)
+    query = db.session.query(*columns)
+    if is_admin():
+        if request.args.get('user_id', '').isdigit():
+            query = query.filter(UserRequest.user_id == int(request.args['user_id']))
+    else:
+        user = require_user()
+        query = query.filter(UserRequest.user_id == user.id)
+    if request.args.get('status'):
+        query = query.filter(UserRequest.status == request.args['status'])
+    page = keyset_paginate(query, (UserRequest.id,), after=request.args.get('after'),
+                           before=request.args.get('before'),
+                           per_page=parse_per_page(request.args.get('per_page')), descending=True)
+    return page_response(page, names, 'requests')
+
+
+def _save_requests_one_by_one(results):
+    created = []
+    for result in results:
+        new_request = result.get('request')
+        if new_request is None:
+            continue
+        try:
+            with db.session.begin_nested():
+                db.session.add(new_request)
+                publish_request(new_request)
+        except (IntegrityError, DataError):
+            del result['request'], result['status']
+            result['error'] = f'item {new_request.inventory_number} not found'
+        else:
+            created.append(new_request)
+    db.session.commit()
+    return created
+
+
+@api.route('/requests', methods=['POST'])
+def submit_requests():
+    """
+    {"requests": [{"request_type", "inventory_number", "comment"}, ...]} — все номера
+    проверяются одним запросом; результат по каждому элементу: created (+ id) или ошибка.
+    """
+    user = require_user()
+    _, entries = batch_from_json('requests')
+    numbers = {str(entry.get('inventory_number', '')).strip() for entry in entries if isinstance(entry, dict)}
+    item_ids = {}
+    if numbers:
+        item_ids = dict(db.session.query(InventoryItem.inventory_number, InventoryItem.id)
+                        .filter(InventoryItem.inventory_number.in_(numbers)))
+    results = []
+    created = []
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            results.append({'index': index, 'error': 'not an object'})
+            continue
+        number = str(entry.get('inventory_number', '')).strip()
+        request_type = entry.get('request_type', 'get_item')
+        comment = entry.get('comment', '')
+        if request_type not in REQUEST_TYPES:
+            results.append({'index': index, 'error': f"request_type must be one of {', '.join(REQUEST_TYPES)}"})
+        elif number not in item_ids:
+            results.append({'index': index, 'error': f'item {number} not found'})
+        elif comment is not None and not isinstance(comment, str):
+            results.append({'index': index, 'error': 'comment must be a string'})
+        else:
+            new_request = UserRequest(user_id=user.id, request_type=request_type, inventory_number=number,
+                                      item_id=item_ids[number], comment=comment)
+            created.append(new_request)
+            results.append({'index': index, 'status': 'created', 'request': new_request})
+    try:
+        db.session.add_all(created)
+        for new_request in created:
+            publish_request(new_request)
+        db.session.commit()
+    except (IntegrityError, DataError):
+        # Предмет удалили между проверкой и INSERT: пакет откатился — сохраняем заявки
+        # по одной (SAVEPOINT на каждую), чтобы ошибка досталась только своим элементам
+        db.session.rollback()
+        created = _save_requests_one_by_one(results)
+    for result in results:
+        if 'request' in result:
+            result['id'] = result.pop('request').id
+    return jsonify({'results': results}), 201 if created else 200
+
+
+@api.route('/requests/decisions', methods=['POST'])
+def decide_requests():
+    """{"action": "approve" | "reject", "ids": [...]} — одна транзакция, как /admin/requests/bulk."""
+    require_admin()
+    payload, raw_ids = batch_from_json('ids')
+    action = payload.get('action')
+    if action not in APPROVAL_ACTIONS:
+        raise ApiError(f"action must be one of {', '.join(APPROVAL_ACTIONS)}")
+    try:
+        req_ids = [int(req_id) for req_id in raw_ids]
+    except (TypeError, ValueError):
+        raise ApiError('ids must be integers')
+    results = process_requests(req_ids, action)
+    done = sum(1 for result in results if result.ok)
+    log_action(current_user_id(), f"Bulk {action} via API: {done} of {len(results)} requests")
+    db.session.commit()
+    return jsonify({'results': [result.to_dict() for result in results]})
+
+
+# -------------------- План закупок --------------------
+
+@api.route('/purchase_plans')
+@read_replica
+@query_budget(2)
+def list_purchase_plans():
+    require_admin()
+    columns, names = parse_fields(PLAN_FIELDS, PurchasePlan.id)
+    # Фильтры status / supplier / q — как на странице планов
+    query = filter_plan_query(db.session.query(*columns), parse_plan_filters(request.args))
+    page = keyset_paginate(query, (PurchasePlan.id,), after=request.args.get('after'),
+                           before=request.args.get('before'), per_page=parse_per_page(request.args.get('per_page')))
+    return page_response(page, names, 'purchase_plans')
+
+
+@api.route('/purchase_plans', methods=['POST'])
+def create_purchase_plans():
+    """{"plans": [{"item_name", "supplier_name", "planned_price", "quantity"}, ...]}"""
+    require_admin()
+    _, entries = batch_from_json('plans')
+    plans = []
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            raise ApiError(f'plans[{index}] is not an object')
+        try:
+            planned_price = float(entry.get('planned_price') or 0)
+        except (TypeError, ValueError):
+            raise ApiError(f'plans[{index}].planned_price must be a number')
+        quantity = parse_quantity(entry.get('quantity'))
+        if quantity is None:
+            raise ApiError(f'plans[{index}].quantity must be a positive integer')
+        plans.append(PurchasePlan(item_name=(entry.get('item_name') or '').strip() or 'Без названия',
+                                  supplier_name=(entry.get('supplier_name') or '').strip(),
+                                  planned_price=planned_price, quantity=quantity, status='planned'))
+    db.session.add_all(plans)
+    log_action(current_user_id(), f"Created {len(plans)} purchase plans via API")
+    db.session.commit()
+    return jsonify({'ids': [plan.id for plan in plans]}), 201
+
+
+@api.route('/purchase_plans/received', methods=['POST'])
+def receive_purchase_plans():
+    """
+    {"ids": [...], "prefix": "2024/"} — принять планы и завести их предметы в инвентарь одной транзакцией.
+    Результат по каждому id: received (с диапазоном номеров) / skipped / not_found.
+    """
+    require_admin()
+    payload, raw_ids = batch_from_json('ids')
+    try:
+        plan_ids = [int(plan_id) for plan_id in raw_ids]
+    except (TypeError, ValueError):
+        raise ApiError('ids must be integers')
+    prefix = payload.get('prefix', default_number_prefix())
+    if not isinstance(prefix, str):
+        raise ApiError('prefix must be a string')
+    try:
+        results = receive_plans(plan_ids, prefix.strip(), current_user_id())
+    except ReceiveError as exc:
+        raise ApiError(str(exc), 409)
+    return jsonify({'results': [result.to_dict() for result in results]})
@@ -1,33 +1,130 @@
 import os
-import re
-from flask import Flask, render_template, request, redirect, url_for, session, flash, send_file
-from werkzeug.security import generate_password_hash, check_password_hash
-from io import BytesIO
-import csv
-import json
-import io
-from models import db, User, InventoryItem, PurchasePlan, UserRequest, ActionLog
+import click
+from flask import Flask, g, render_template, request, redirect, url_for, session, flash, stream_with_context, jsonify, abort, send_file
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload
+from werkzeug.middleware.proxy_fix import ProxyFix
+from models import db, User, InventoryItem, PurchasePlan, UserRequest, Job, INVENTORY_NUMBER_RE, ITEM_CONDITIONS
+from pagination import KeysetPage, pager_params, paginate_inventory, parse_inventory_filters
+from exports import inventory_row_to_dict, generate_inventory_csv, generate_inventory_json, generate_inventory_ndjson
+from bulk_import import IMPORT_FORMATS, import_inventory, iter_records
+from approvals import APPROVAL_ACTIONS, MAX_BULK_REQUESTS, process_requests
+from purchasing import (MAX_PLAN_QUANTITY, PLAN_STATUSES, ReceiveError, default_number_prefix, paginate_plans,
+                        parse_plan_filters, parse_quantity, receive_plans)
+from migrations import upgrade_schema, wait_for_database
+from db_routing import init_db_routing, read_replica, replica_router
+from http_cache import conditional_get, fragment_cache, init_http_cache, render_fragment
+from audit_view import audit_row_to_dict, generate_audit_ndjson, paginate_audit_log, parse_audit_filters
+from reports import (checkout_durations, condition_history, refresh_reports, reports_refreshed_at,
+                     repair_frequency, spend_by_supplier)
+from log_archive import archive_action_logs, retention_cutoff
+from stats import get_counters, reconcile_counters
+from availability_index import availability_index
+from search_index import AUTOCOMPLETE_LIMIT, parse_limit, search_index, search_items
+from query_budget import init_query_budget, query_budget
+from metrics import init_metrics, request_metrics
+from auth import authenticate, current_user, current_user_id, is_admin
+from passwords import PasswordHashBusy, init_passwords, password_hasher
+from rate_limit import init_rate_limit
+from audit_log import audit_writer, init_audit_log, log_action
+from api import api
+from events import event_bus, event_stream, init_events, latest_event_id, missed_events, publish_request
+from jobs import ACTIVE_JOB_STATUSES, EXPORT_FORMATS, enqueue, init_jobs, job_to_dict
 import config
 
 app = Flask(__name__)
+if config.PROXY_HOPS:
+    # За прокси request.remote_addr — адрес прокси: лимит входов по IP (rate_limit.py) был бы общим на всех
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=config.PROXY_HOPS, x_proto=config.PROXY_HOPS)
 app.config['SECRET_KEY'] = config.SECRET_KEY
 app.config['SQLALCHEMY_DATABASE_URI'] = config.SQLALCHEMY_DATABASE_URI
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = config.SQLALCHEMY_TRACK_MODIFICATIONS
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = config.SQLALCHEMY_ENGINE_OPTIONS
+app.config['SQLALCHEMY_BINDS'] = config.SQLALCHEMY_BINDS
+app.config['REPLICA_HEALTH_INTERVAL'] = config.REPLICA_HEALTH_INTERVAL
+app.config['REPLICA_MAX_LAG'] = config.REPLICA_MAX_LAG
+app.config['REPLICA_STICKY_SECONDS'] = config.REPLICA_STICKY_SECONDS
+app.config['QUERY_BUDGET_MODE'] = config.QUERY_BUDGET_MODE
+app.config['CURRENT_USER_CACHE_TTL'] = config.CURRENT_USER_CACHE_TTL
+app.config['AUDIT_LOG_MODE'] = config.AUDIT_LOG_MODE
+app.config['AUDIT_LOG_QUEUE_SIZE'] = config.AUDIT_LOG_QUEUE_SIZE
+app.config['AUDIT_LOG_BATCH_SIZE'] = config.AUDIT_LOG_BATCH_SIZE
+app.config['AUDIT_LOG_FLUSH_INTERVAL'] = config.AUDIT_LOG_FLUSH_INTERVAL
+app.config['SEARCH_INDEX_ENABLED'] = config.SEARCH_INDEX_ENABLED
+app.config['SEARCH_INDEX_REFRESH_INTERVAL'] = config.SEARCH_INDEX_REFRESH_INTERVAL
+app.config['AVAILABILITY_INDEX_ENABLED'] = config.AVAILABILITY_INDEX_ENABLED
+app.config['AVAILABILITY_INDEX_REFRESH_INTERVAL'] = config.AVAILABILITY_INDEX_REFRESH_INTERVAL
+app.config['HTTP_CACHE_ENABLED'] = config.HTTP_CACHE_ENABLED
+app.config['STATS_COUNTER_SLOTS'] = config.STATS_COUNTER_SLOTS
+app.config['REPORTS_REFRESH_INTERVAL'] = config.REPORTS_REFRESH_INTERVAL
+app.config['FRAGMENT_CACHE_MAX_ENTRIES'] = config.FRAGMENT_CACHE_MAX_ENTRIES
+app.config['FRAGMENT_CACHE_MAX_BYTES'] = config.FRAGMENT_CACHE_MAX_BYTES
+app.config['METRICS_ENABLED'] = config.METRICS_ENABLED
+app.config['METRICS_DIR'] = config.METRICS_DIR
+app.config['METRICS_FLUSH_INTERVAL'] = config.METRICS_FLUSH_INTERVAL
+app.config['SLOW_REQUEST_MS'] = config.SLOW_REQUEST_MS
+app.config['PASSWORD_HASH_METHOD'] = config.PASSWORD_HASH_METHOD
+app.config['PASSWORD_HASH_WORKERS'] = config.PASSWORD_HASH_WORKERS
+app.config['PASSWORD_HASH_CONCURRENCY'] = config.PASSWORD_HASH_CONCURRENCY
+app.config['PASSWORD_HASH_WAIT'] = config.PASSWORD_HASH_WAIT
+app.config['LOGIN_FAILURE_WINDOW'] = config.LOGIN_FAILURE_WINDOW
+app.config['LOGIN_MAX_FAILURES_PER_USER'] = config.LOGIN_MAX_FAILURES_PER_USER
+app.config['LOGIN_MAX_FAILURES_PER_IP'] = config.LOGIN_MAX_FAILURES_PER_IP
+app.config['JOBS_ENABLED'] = config.JOBS_ENABLED
+app.config['JOBS_POLL_INTERVAL'] = config.JOBS_POLL_INTERVAL
+app.config['JOBS_STALE_AFTER'] = config.JOBS_STALE_AFTER
+app.config['JOBS_EXPORT_DIR'] = config.JOBS_EXPORT_DIR
+app.config['ACTION_LOG_ARCHIVE_DIR'] = config.ACTION_LOG_ARCHIVE_DIR
+app.config['ACTION_LOG_DELETE_BATCH'] = config.ACTION_LOG_DELETE_BATCH
+app.config['API_COMPRESS_MIN_BYTES'] = config.API_COMPRESS_MIN_BYTES
+app.config['EVENTS_POLL_INTERVAL'] = config.EVENTS_POLL_INTERVAL
+app.config['EVENTS_RETENTION'] = config.EVENTS_RETENTION
+app.config['EVENTS_MAX_STREAMS'] = config.EVENTS_MAX_STREAMS
+app.config['WARMUP_ENABLED'] = config.WARMUP_ENABLED
+app.config['WARMUP_DB_CONNECTIONS'] = config.WARMUP_DB_CONNECTIONS
 
 db.init_app(app)
-
-def is_admin():
-    """
-    Проверяем, что:
-      1) Пользователь авторизован в сессии (session['username'] есть)
-      2) session['username'] присутствует в списке ADMIN_LOGINS из config
-    """
-    return 'username' in session and session['username'] in config.ADMIN_LOGINS
-
-
-with app.app_context():
-    db.create_all()
-    
+init_db_routing(app, db)
+# Первым: его before_request срабатывает раньше остальных, after_request — позже
+init_metrics(app)
+init_query_budget(app)
+init_audit_log(app)
+search_index.init_app(app)
+availability_index.init_app(app)
+init_http_cache(app)
+init_jobs(app)
+init_passwords(app)
+init_rate_limit(app)
+init_events(app)
+app.register_blueprint(api)
+
+request_metrics.add_collector('audit_log_pending', 'gauge', 'Audit log rows waiting in the queue.',
+                              lambda: audit_writer.stats()['pending'])
+request_metrics.add_collector('audit_log_dropped_total', 'counter', 'Audit log rows dropped on a full queue.',
+                              lambda: audit_writer.stats()['dropped'])
+request_metrics.add_collector('db_replicas_healthy', 'gauge', 'Read replicas currently in rotation.',
+                              replica_router.healthy_count)
+request_metrics.add_collector('search_index_items', 'gauge', 'Items in the in-memory search index.',
+                              lambda: search_index.stats()['items'])
+request_metrics.add_collector('search_index_bytes', 'gauge', 'Memory held by search index arrays.',
+                              lambda: search_index.stats()['bytes'])
+request_metrics.add_collector('availability_index_items', 'gauge', 'Items in the in-memory availability index.',
+                              lambda: availability_index.stats()['items'])
+request_metrics.add_collector('availability_index_bytes', 'gauge', 'Memory held by availability index arrays.',
+                              lambda: availability_index.stats()['bytes'])
+request_metrics.add_collector('event_stream_subscribers', 'gauge', 'Open /events connections.',
+                              lambda: event_bus.stats()['subscribers'])
+request_metrics.add_collector('fragment_cache_entries', 'gauge', 'Rendered fragments in the cache.',
+                              lambda: fragment_cache.stats()['entries'])
+request_metrics.add_collector('fragment_cache_bytes', 'gauge', 'Size of cached fragments (characters).',
+                              lambda: fragment_cache.stats()['bytes'])
+request_metrics.add_collector('fragment_cache_hits_total', 'counter', 'Fragment cache hits.',
+                              lambda: fragment_cache.stats()['hits'])
+request_metrics.add_collector('fragment_cache_misses_total', 'counter', 'Fragment cache misses.',
+                              lambda: fragment_cache.stats()['misses'])
+
+# Импорт модуля не обращается к БД: схему создаёт `flask --app app db-upgrade` (или __main__ ниже),
+# а соединения, пул хеширования и индексы прогревает warmup.py после старта воркера
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -44,9 +141,15 @@ def register():
             flash('Пользователь с таким логином уже существует!', 'danger')
             return redirect(url_for('register'))
 
+        try:
+            password_hash = password_hasher.hash(password)
+        except PasswordHashBusy:
+            flash('Сервер перегружен, попробуйте ещё раз через несколько секунд.', 'warning')
+            return render_template('register.html'), 503
+
         new_user = User(
             username=username,
-            password_hash=generate_password_hash(password),
+            password_hash=password_hash,
             role='user',
             full_name=full_name
         )
@@ -64,15 +167,17 @@ def login():
         username = request.form.get('username')
         password = request.form.get('password')
 
-        user = User.query.filter_by(username=username).first()
-        if user and check_password_hash(user.password_hash, password):
-            # Авторизация успешна
-            session['username'] = user.username
-            session['role'] = user.role
-
-            # Логируем вход
-            log = ActionLog(user_id=user.id, action='Logged in')
-            db.session.add(log)
+        result = authenticate(username, password, request.remote_addr or '')
+        if result.status == 'throttled':
+            flash(f'Слишком много неудачных попыток входа. Повторите через {result.retry_after} с.', 'danger')
+            return render_template('login.html'), 429, {'Retry-After': str(result.retry_after)}
+        if result.status == 'busy':
+            flash('Сервер перегружен, попробуйте войти через несколько секунд.', 'warning')
+            return render_template('login.html'), 503, {'Retry-After': str(result.retry_after)}
+
+        if result.ok:
+            # Авторизация успешна; логируем вход
+            log_action(result.user.id, 'Logged in')
             db.session.commit()
 
             flash('Вы успешно авторизованы!', 'success')
@@ -87,18 +192,34 @@ def login():
 @app.route('/logout')
 def logout():
     if 'username' in session:
-        user = User.query.filter_by(username=session['username']).first()
-        if user:
-            log = ActionLog(user_id=user.id, action='Logged out')
-            db.session.add(log)
+        user_id = current_user_id()
+        if user_id:
+            log_action(user_id, 'Logged out')
             db.session.commit()
     session.clear()
     flash('Вы вышли из системы.', 'info')
     return redirect(url_for('index'))
 
+def render_inventory_fragment(template_name, key, **context):
+    """
+    Страница инвентаря (фильтры и курсор из query string) -> (HTML фрагмента, KeysetPage для пейджера).
+    При попадании в кэш фрагментов запрос к inventory_items не выполняется.
+    """
+    def load():
+        page, _ = paginate_inventory(request.args)
+        return dict(context, items=page.items), (page.next_cursor, page.prev_cursor)
+
+    fragment, (next_cursor, prev_cursor) = render_fragment(
+        template_name, (InventoryItem,), (key, tuple(sorted(request.args.items(multi=True)))), load)
+    return fragment, KeysetPage([], next_cursor=next_cursor, prev_cursor=prev_cursor)
+
+
 # -------------------- ПОЛЬЗОВАТЕЛЬ --------------------
 
 @app.route('/user/dashboard')
+@read_replica
+@query_budget(3)
+@conditional_get(InventoryItem, User)
 def user_dashboard():
     if 'username' not in session:
         flash('Сначала войдите в систему.', 'warning')
@@ -106,13 +227,16 @@ def user_dashboard():
     if is_admin():
         return redirect(url_for('admin_dashboard'))
 
-    user = User.query.filter_by(username=session['username']).first()
+    user = current_user()
     if not user:
         return render_template('error_403.html')
 
-    # Показываем весь инвентарь (пример)
-    inventory_list = InventoryItem.query.order_by(InventoryItem.inventory_number).all()
-    return render_template('user_dashboard.html', user=user, inventory=inventory_list)
+    # Инвентарь постранично (keyset по inventory_number) с фильтрами из query string;
+    # карточки зависят от пользователя (отметка «закреплён за вами») — он в ключе кэша
+    cards, page = render_inventory_fragment('_inventory_cards.html', user.id, user=user)
+    filters = parse_inventory_filters(request.args)
+    return render_template('user_dashboard.html', user=user, cards=cards, page=page,
+                           filters=filters, params=pager_params(filters, request.args))
 
 @app.route('/user/requests', methods=['GET', 'POST'])
 def user_requests():
@@ -122,7 +246,7 @@ def user_requests():
     if is_admin():
         return render_template('error_403.html')
 
-    user = User.query.filter_by(username=session['username']).first()
+    user = current_user()
     if not user:
         return render_template('error_403.html')
 
@@ -131,20 +255,39 @@ def user_requests():
         inventory_number = request.form.get('inventory_number', '').strip()
         comment = request.form.get('comment', '')
 
+        # Связываем заявку с предметом по FK — одобрение ищет по PK; несуществующий номер не принимаем.
+        # Номер ищем в индексе доступности, в БД — только если его там нет
+        indexed = availability_index.find(inventory_number)
+        if indexed is not None:
+            item_id = indexed.id
+        else:
+            item_id = db.session.query(InventoryItem.id).filter_by(inventory_number=inventory_number).scalar()
+        if item_id is None:
+            flash(f'Предмет #{inventory_number} не найден. Выберите номер из подсказок.', 'danger')
+            return redirect(url_for('user_requests'))
         new_request = UserRequest(
             user_id=user.id,
             request_type=request_type,
             inventory_number=inventory_number,
+            item_id=item_id,
             comment=comment
         )
         db.session.add(new_request)
-        db.session.commit()
+        try:
+            publish_request(new_request)
+            db.session.commit()
+        except IntegrityError:
+            # Предмет удалили в другом воркере, а индекс ещё не пересобран
+            db.session.rollback()
+            flash(f'Предмет #{inventory_number} не найден. Выберите номер из подсказок.', 'danger')
+            return redirect(url_for('user_requests'))
 
         flash('Ваша заявка отправлена!', 'success')
         return redirect(url_for('user_requests'))
 
     user_requests_list = UserRequest.query.filter_by(user_id=user.id).all()
-    return render_template('user_requests.html', user_requests=user_requests_list)
+    return render_template('user_requests.html', user_requests=user_requests_list,
+                           last_event_id=latest_event_id())
 
 @app.route('/user/return_items')
 def user_return_items():
@@ -154,12 +297,14 @@ def user_return_items():
     if is_admin():
         return render_template('error_403.html')
 
-    user = User.query.filter_by(username=session['username']).first()
+    user = current_user()
     if not user:
         return render_template('error_403.html')
 
-    # Предметы, закреплённые за пользователем
-    assigned_items = InventoryItem.query.filter_by(assigned_to=user.id).all()
+    # Предметы, закреплённые за пользователем: из индекса доступности, пока он не готов — из БД
+    assigned_items = availability_index.held_by(user.id)
+    if assigned_items is None:
+        assigned_items = InventoryItem.query.filter_by(assigned_to=user.id).all()
     return render_template('user_return_items.html', assigned_items=assigned_items)
 
 @app.route('/user/return_item/<int:item_id>', methods=['POST'])
@@ -170,16 +315,15 @@ def return_item(item_id):
     if is_admin():
         return render_template('error_403.html')
 
-    user = User.query.filter_by(username=session['username']).first()
+    user = current_user()
+    if not user:
+        return render_template('error_403.html')
     item = InventoryItem.query.get_or_404(item_id)
 
     if item.assigned_to == user.id:
         item.assigned_to = None
         item.is_available = True
-        db.session.commit()
-
-        log = ActionLog(user_id=user.id, action=f"Returned item #{item.inventory_number}")
-        db.session.add(log)
+        log_action(current_user_id(), f"Returned item #{item.inventory_number}")
         db.session.commit()
 
         flash(f'Вы вернули предмет #{item.inventory_number}', 'success')
@@ -188,29 +332,90 @@ def return_item(item_id):
 
     return redirect(url_for('user_return_items'))
 
+# -------------------- ЖИВЫЕ ОБНОВЛЕНИЯ --------------------
+
+@app.route('/events')
+def events():
+    """
+    Поток server-sent events (events.py): изменения заявок и инвентаря без перезагрузки страницы.
+    ?after=<id> — с какого события начинать (страница знает последний id на момент рендера);
+    при переподключении браузер сам присылает Last-Event-ID.
+    """
+    if 'username' not in session:
+        abort(401)
+    user_id = current_user_id()
+    admin = is_admin()
+    after = request.headers.get('Last-Event-ID') or request.args.get('after', '')
+    position = latest_event_id()
+    subscriber = event_bus.subscribe(user_id, admin, position)
+    # Пропущенное читаем уже после подписки: событие, зафиксированное между latest_event_id()
+    # и подпиской, диспетчер мог раздать до нас — оно найдётся здесь; попавшее и в очередь,
+    # и сюда event_stream отправит один раз
+    start = int(after) if after.isdigit() else position
+    backlog = missed_events(start, user_id, admin)
+    retry = 3 if subscriber is not None else config.EVENTS_FALLBACK_RETRY
+    # Без stream_with_context: контекст запроса и соединение с БД освобождаются до начала потока
+    return app.response_class(
+        event_stream(subscriber, position, backlog, retry * 1000, config.EVENTS_HEARTBEAT,
+                     config.EVENTS_STREAM_TIMEOUT),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+# -------------------- ПОИСК --------------------
+
+@app.route('/search')
+@read_replica
+def search():
+    """JSON: предметы, у которых каждое слово запроса q — префикс слова в названии или номере."""
+    if 'username' not in session:
+        return jsonify({'error': 'login required'}), 401
+    query = request.args.get('q', '')
+    items = search_items(query, parse_limit(request.args.get('limit')))
+    return jsonify({'query': query, 'items': [inventory_row_to_dict(item) for item in items]})
+
+@app.route('/search/autocomplete')
+@read_replica
+def search_autocomplete():
+    """Подсказки для поля «Инвентарный номер»: [{value, label, is_available}]."""
+    if 'username' not in session:
+        return jsonify([]), 401
+    items = search_items(request.args.get('q', ''), AUTOCOMPLETE_LIMIT)
+    return jsonify([
+        {'value': item.inventory_number, 'label': f'{item.inventory_number} — {item.name}',
+         'is_available': item.is_available}
+        for item in items
+    ])
+
 # -------------------- АДМИНИСТРАТОР --------------------
 
 @app.route('/admin/dashboard')
+@read_replica
 def admin_dashboard():
     if not is_admin():
         return render_template('error_403.html')
 
-    total_users = User.query.count()
-    total_items = InventoryItem.query.count()
-    total_requests = UserRequest.query.count()
+    # Предрассчитанные счётчики (stats.py) вместо COUNT(*) по большим таблицам
+    counters = get_counters()
 
     return render_template('admin_dashboard.html',
-                           total_users=total_users,
-                           total_items=total_items,
-                           total_requests=total_requests)
+                           total_users=counters.get('users', 0),
+                           total_items=counters.get('items', 0),
+                           total_requests=counters.get('requests', 0),
+                           counters=counters)
 
 @app.route('/admin/inventory')
+@read_replica
+@query_budget(3)
+@conditional_get(InventoryItem)
 def admin_inventory():
-    """Список всего инвентаря для админа."""
+    """Список инвентаря для админа (постранично, с фильтрами)."""
     if not is_admin():
         return render_template('error_403.html')
-    items = InventoryItem.query.order_by(InventoryItem.inventory_number).all()
-    return render_template('admin_inventory.html', items=items)
+    rows, page = render_inventory_fragment('_inventory_rows.html', 'admin')
+    filters = parse_inventory_filters(request.args)
+    return render_template('admin_inventory.html', rows=rows, page=page,
+                           filters=filters, params=pager_params(filters, request.args))
 
 @app.route('/admin/create_item', methods=['GET', 'POST'])
 def create_item():
@@ -228,7 +433,7 @@ def create_item():
         condition = request.form.get('condition', 'new')
 
         # Регулярное выражение: разрешаем цифры, и символы - . /
-        if not re.match(r'^[0-9\-\./]+$', inventory_number):
+        if not INVENTORY_NUMBER_RE.match(inventory_number):
             flash('Инвентарный номер содержит недопустимые символы!', 'danger')
             return redirect(url_for('create_item'))
 
@@ -245,11 +450,7 @@ def create_item():
             is_available=True
         )
         db.session.add(new_item)
-        db.session.commit()
-
-        admin_user = User.query.filter_by(username=session['username']).first()
-        log = ActionLog(user_id=admin_user.id, action=f"Created item #{inventory_number}")
-        db.session.add(log)
+        log_action(current_user_id(), f"Created item #{inventory_number}")
         db.session.commit()
 
         flash('Инвентарь добавлен успешно!', 'success')
@@ -257,6 +458,88 @@ def create_item():
 
     return render_template('create_item.html')
 
+@app.route('/admin/import', methods=['GET', 'POST'])
+def import_items():
+    """
+    Массовый импорт инвентаря из CSV / NDJSON.
+    Файл читается потоково и пишется пачками; в ответ — отчёт с ошибками по строкам
+    (HTML или JSON, если клиент просит application/json).
+    """
+    if not is_admin():
+        return render_template('error_403.html')
+
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        fmt = request.form.get('format', 'csv')
+        upsert = request.form.get('upsert') == 'on'
+        if not upload or fmt not in IMPORT_FORMATS:
+            flash('Выберите файл и формат (CSV или NDJSON).', 'danger')
+            return redirect(url_for('import_items'))
+
+        report = import_inventory(iter_records(upload.stream, fmt), upsert=upsert)
+        log_action(current_user_id(),
+                   f"Imported items: {report.inserted} inserted, {report.updated} updated, {report.failed} failed")
+        db.session.commit()
+
+        if request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json':
+            return jsonify(report.to_dict())
+        return render_template('import_items.html', report=report)
+
+    return render_template('import_items.html', report=None)
+
+
+@app.cli.command('import-items')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(IMPORT_FORMATS), default='csv')
+@click.option('--upsert', is_flag=True, help='Обновлять существующие инвентарные номера.')
+def import_items_command(path, fmt, upsert):
+    """Массовый импорт инвентаря: flask --app app import-items items.csv"""
+    with open(path, 'rb') as f:
+        report = import_inventory(iter_records(f, fmt), upsert=upsert)
+    click.echo(f"inserted: {report.inserted}, updated: {report.updated}, failed: {report.failed}")
+    for error in report.errors:
+        click.echo(f"line {error['line']}: {error['inventory_number']}: {error['error']}", err=True)
+    if report.errors_truncated:
+        click.echo(f"... and {report.failed - len(report.errors)} more errors", err=True)
+
+@app.cli.command('db-upgrade')
+@click.option('--wait', type=int, default=0, help='Сколько секунд ждать, пока БД станет доступна.')
+def db_upgrade_command(wait):
+    """Создать недостающие таблицы и применить ревизии схемы: flask --app app db-upgrade"""
+    wait_for_database(db.engine, wait)
+    applied = upgrade_schema()
+    click.echo('Applied: ' + ', '.join(applied) if applied else 'Schema is up to date')
+
+@app.cli.command('archive-logs')
+@click.option('--days', type=int, default=None, help='Срок хранения (по умолчанию ACTION_LOG_RETENTION_DAYS).')
+@click.option('--dir', 'archive_dir', default=None, help='Каталог архивов (по умолчанию ACTION_LOG_ARCHIVE_DIR).')
+@click.option('--dry-run', is_flag=True, help='Только посчитать строки к архивированию.')
+def archive_logs_command(days, archive_dir, dry_run):
+    """Выгрузить старые записи журнала в .ndjson.gz и удалить их: flask --app app archive-logs"""
+    days = config.ACTION_LOG_RETENTION_DAYS if days is None else days
+    if days <= 0:
+        click.echo('Retention is disabled (ACTION_LOG_RETENTION_DAYS=0)')
+        return
+    report = archive_action_logs(retention_cutoff(days), archive_dir or config.ACTION_LOG_ARCHIVE_DIR,
+                                 delete_batch=config.ACTION_LOG_DELETE_BATCH, dry_run=dry_run)
+    if dry_run:
+        click.echo(f"older than {report.cutoff:%Y-%m-%d %H:%M}: {report.archived} rows")
+    else:
+        click.echo(f"archived: {report.archived}, deleted: {report.deleted}, file: {report.path or '-'}")
+
+@app.cli.command('refresh-reports')
+def refresh_reports_command():
+    """Догнать сводные таблицы отчётов: flask --app app refresh-reports (например, по cron)"""
+    result = refresh_reports()
+    click.echo(', '.join(f"{name}: {value}" for name, value in result.items()))
+
+@app.cli.command('reconcile-stats')
+def reconcile_stats_command():
+    """Пересчитать счётчики панели администратора с нуля: flask --app app reconcile-stats"""
+    counters = reconcile_counters()
+    for name in sorted(counters):
+        click.echo(f"{name}: {counters[name]}")
+
 @app.route('/admin/edit_item/<int:item_id>', methods=['GET', 'POST'])
 def edit_item(item_id):
     if not is_admin():
@@ -288,11 +571,7 @@ def edit_item(item_id):
             # В таком случае уважаем чекбокс "доступен / недоступен"
             item.is_available = is_available_val
 
-        db.session.commit()
-
-        admin_user = User.query.filter_by(username=session['username']).first()
-        log = ActionLog(user_id=admin_user.id, action=f"Edited item #{item.inventory_number}")
-        db.session.add(log)
+        log_action(current_user_id(), f"Edited item #{item.inventory_number}")
         db.session.commit()
 
         flash('Изменения сохранены!', 'success')
@@ -319,13 +598,9 @@ def delete_item(item_id):
 
     if request.method == 'POST':
         # Фактическое удаление
-        admin_user = User.query.filter_by(username=session['username']).first()
-
-        # Логируем
-        log = ActionLog(user_id=admin_user.id, action=f"Deleted item #{item.inventory_number}")
-        db.session.add(log)
-
         db.session.delete(item)
+        # Логируем
+        log_action(current_user_id(), f"Deleted item #{item.inventory_number}")
         db.session.commit()
 
         flash(f'Предмет #{item.inventory_number} удалён из системы.', 'success')
@@ -337,68 +612,84 @@ def delete_item(item_id):
 # -------------------- ЗАЯВКИ (APPROVE/REJECT) --------------------
 
 @app.route('/admin/requests')
+@read_replica
+@query_budget(3)
 def admin_requests():
     if not is_admin():
         return render_template('error_403.html')
 
-    requests_list = UserRequest.query.order_by(UserRequest.status, UserRequest.created_at.desc()).all()
-    return render_template('admin_requests.html', requests=requests_list)
+    # joinedload: шаблон читает req.user.username -> один JOIN вместо запроса на каждую строку
+    requests_list = UserRequest.query.options(joinedload(UserRequest.user)).order_by(UserRequest.status, UserRequest.created_at.desc()).all()
+    return render_template('admin_requests.html', requests=requests_list, last_event_id=latest_event_id())
+
+def process_single_request(req_id, action):
+    results = process_requests([req_id], action)
+    result = results[0]
+    if result.status == 'not_found':
+        abort(404)
+    db.session.commit()
+    flash(result.message, result.category)
+    return redirect(url_for('admin_requests'))
 
 @app.route('/admin/request/<int:req_id>/approve', methods=['POST'])
 def approve_request(req_id):
     if not is_admin():
         return render_template('error_403.html')
-
-    user_req = UserRequest.query.get_or_404(req_id)
-    if user_req.status != 'pending':
-        flash('Заявка уже обработана.', 'warning')
-        return redirect(url_for('admin_requests'))
-
-    item = InventoryItem.query.filter_by(inventory_number=user_req.inventory_number).first()
-    if not item:
-        flash(f'Предмет #{user_req.inventory_number} не найден! Невозможно подтвердить.', 'danger')
-        return redirect(url_for('admin_requests'))
-
-    if user_req.request_type == 'get_item':
-        # Проверяем, что предмет ещё доступен
-        if not item.is_available:
-            flash(f'Предмет #{item.inventory_number} уже недоступен!', 'warning')
-        else:
-            # Назначаем пользователю
-            item.assigned_to = user_req.user_id
-            item.is_available = False
-            user_req.status = 'approved'
-            flash(f'Заявка {req_id} подтверждена: предмет #{item.inventory_number} выдан пользователю.', 'success')
-    elif user_req.request_type == 'repair_item':
-        # Помечаем предмет недоступным, ставим condition='broken'
-        item.is_available = False
-        item.condition = 'broken'
-        user_req.status = 'approved'
-        flash(f'Заявка {req_id} подтверждена: предмет #{item.inventory_number} отправлен на ремонт.', 'success')
-    else:
-        flash('Неизвестный тип заявки.', 'danger')
-
-    db.session.commit()
-    return redirect(url_for('admin_requests'))
+    return process_single_request(req_id, 'approve')
 
 @app.route('/admin/request/<int:req_id>/reject', methods=['POST'])
 def reject_request(req_id):
+    if not is_admin():
+        return render_template('error_403.html')
+    return process_single_request(req_id, 'reject')
+
+@app.route('/admin/requests/bulk', methods=['POST'])
+def bulk_process_requests():
+    """
+    Массовое подтверждение / отклонение заявок одной транзакцией.
+    - JSON: {"action": "approve" | "reject", "ids": [1, 2, ...]} -> {"results": [...]}
+    - форма со страницы заявок: action + чекбоксы req_ids -> flash-сводка и редирект
+    """
     if not is_admin():
         return render_template('error_403.html')
 
-    user_req = UserRequest.query.get_or_404(req_id)
-    if user_req.status != 'pending':
-        flash('Заявка уже обработана.', 'warning')
+    payload = request.get_json(silent=True) if request.is_json else None
+    if payload is not None:
+        action = payload.get('action')
+        raw_ids = payload.get('ids') or []
+    else:
+        action = request.form.get('action')
+        raw_ids = request.form.getlist('req_ids')
+
+    try:
+        req_ids = [int(req_id) for req_id in raw_ids]
+    except (TypeError, ValueError):
+        req_ids = None
+    if action not in APPROVAL_ACTIONS or not req_ids or len(req_ids) > MAX_BULK_REQUESTS:
+        message = f'Нужно действие approve/reject и от 1 до {MAX_BULK_REQUESTS} заявок.'
+        if payload is not None:
+            return jsonify({'error': message}), 400
+        flash(message, 'danger')
         return redirect(url_for('admin_requests'))
 
-    user_req.status = 'rejected'
+    results = process_requests(req_ids, action)
+    done = sum(1 for result in results if result.ok)
+    log_action(current_user_id(), f"Bulk {action}: {done} of {len(results)} requests")
     db.session.commit()
-    flash(f'Заявка {req_id} отклонена.', 'info')
+
+    if payload is not None:
+        return jsonify({'results': [result.to_dict() for result in results]})
+    flash(f'Обработано заявок: {done} из {len(results)}.', 'success' if done == len(results) else 'warning')
+    for result in results:
+        if not result.ok:
+            flash(result.message, result.category)
     return redirect(url_for('admin_requests'))
 
 # -------------------- ПЛАН ЗАКУПОК --------------------
 
 @app.route('/admin/purchase_planning', methods=['GET', 'POST'])
+@read_replica
+@conditional_get(PurchasePlan)
 def purchase_planning():
     if not is_admin():
         return render_template('error_403.html')
@@ -406,147 +697,316 @@ def purchase_planning():
     if request.method == 'POST':
         item_name = request.form.get('item_name', '').strip()
         supplier_name = request.form.get('supplier_name', '').strip()
-        planned_price = float(request.form.get('planned_price', 0))
+        planned_price = float(request.form.get('planned_price') or 0)
+        quantity = parse_quantity(request.form.get('quantity'))
+        if quantity is None:
+            flash(f'Количество — целое число от 1 до {MAX_PLAN_QUANTITY}.', 'danger')
+            return redirect(url_for('purchase_planning'))
 
         plan = PurchasePlan(
             item_name=item_name if item_name else "Без названия",
             supplier_name=supplier_name,
             planned_price=planned_price,
+            quantity=quantity,
             status='planned'
         )
         db.session.add(plan)
-        db.session.commit()
-
-        admin_user = User.query.filter_by(username=session['username']).first()
-        log = ActionLog(user_id=admin_user.id, action=f"Created purchase plan: {item_name}")
-        db.session.add(log)
+        log_action(current_user_id(), f"Created purchase plan: {item_name}")
         db.session.commit()
 
         flash('План закупки добавлен!', 'success')
         return redirect(url_for('purchase_planning'))
 
-    plans = PurchasePlan.query.all()
-    return render_template('purchase_planning.html', plans=plans)
+    # Список постранично (keyset по id, сначала новые) с фильтрами; фрагмент кэшируется по query string
+    def load():
+        page, _ = paginate_plans(request.args)
+        return {'plans': page.items}, (page.next_cursor, page.prev_cursor)
+
+    plan_list, (next_cursor, prev_cursor) = render_fragment(
+        '_purchase_plan_list.html', (PurchasePlan,), ('plans', tuple(sorted(request.args.items(multi=True)))), load)
+    filters = parse_plan_filters(request.args)
+    return render_template('purchase_planning.html', plan_list=plan_list, filters=filters,
+                           params=pager_params(filters, request.args),
+                           page=KeysetPage([], next_cursor=next_cursor, prev_cursor=prev_cursor),
+                           statuses=PLAN_STATUSES, number_prefix=default_number_prefix())
+
+def receive_and_report(plan_ids):
+    """Приёмка планов из формы (prefix — префикс инвентарных номеров) -> flash-сводка и редирект."""
+    prefix = request.form.get('prefix', default_number_prefix()).strip()
+    try:
+        results = receive_plans(plan_ids, prefix, current_user_id())
+    except ReceiveError as exc:
+        flash(str(exc), 'danger')
+        return redirect(url_for('purchase_planning'))
+    if len(results) == 1:
+        flash(results[0].message, results[0].category)
+        return redirect(url_for('purchase_planning'))
+    done = [result for result in results if result.ok]
+    flash(f'Принято планов: {len(done)} из {len(results)}, создано предметов: {sum(r.items for r in done)}.',
+          'success' if len(done) == len(results) else 'warning')
+    for result in results:
+        if not result.ok:
+            flash(result.message, result.category)
+    return redirect(url_for('purchase_planning'))
 
 @app.route('/admin/purchase_plan/<int:plan_id>/mark_received', methods=['POST'])
 def mark_plan_received(plan_id):
     """
-    Пометить план закупки как купленный (status='received').
-    Сохраняем в истории (action logs).
+    Пометить план закупки как купленный (status='received') и завести его quantity предметов
+    в инвентарь с номерами подряд. Сохраняем в истории (action logs).
     """
     if not is_admin():
         return render_template('error_403.html')
+    return receive_and_report([plan_id])
 
-    plan = PurchasePlan.query.get_or_404(plan_id)
-    plan.status = 'received'
-    db.session.commit()
-
-    admin_user = User.query.filter_by(username=session['username']).first()
-    log = ActionLog(user_id=admin_user.id, action=f"Purchase plan received: {plan.item_name}")
-    db.session.add(log)
-    db.session.commit()
-
-    flash(f'План закупки #{plan_id} помечен как купленный.', 'success')
-    return redirect(url_for('purchase_planning'))
+@app.route('/admin/purchase_plans/receive', methods=['POST'])
+def bulk_receive_plans():
+    """Приёмка отмеченных планов одной транзакцией (чекбоксы plan_ids со страницы планов)."""
+    if not is_admin():
+        return render_template('error_403.html')
+    try:
+        plan_ids = [int(plan_id) for plan_id in request.form.getlist('plan_ids')]
+    except ValueError:
+        plan_ids = None
+    if not plan_ids or len(plan_ids) > MAX_BULK_REQUESTS:
+        flash(f'Отметьте от 1 до {MAX_BULK_REQUESTS} планов.', 'danger')
+        return redirect(url_for('purchase_planning'))
+    return receive_and_report(plan_ids)
 
 # -------------------- ОТЧЁТЫ (CSV, JSON) --------------------
 
+def reports_version():
+    """Часть ETag отчётов: время обновления сводок (их догоняет периодическая задача jobs.py)."""
+    if not is_admin():
+        return ''
+    if 'reports_refreshed_at' not in g:
+        g.reports_refreshed_at = reports_refreshed_at()
+    return g.reports_refreshed_at
+
 @app.route('/admin/reports')
+@read_replica
+@query_budget(6)
+@conditional_get(PurchasePlan, key=reports_version)
 def reports():
     if not is_admin():
         return render_template('error_403.html')
-    return render_template('reports.html')
+    # Все отчёты — из сводных таблиц (reports.py) и одного GROUP BY по purchase_plans
+    return render_template(
+        'reports.html',
+        refreshed_at=reports_version(),
+        conditions=ITEM_CONDITIONS,
+        condition_history=condition_history(),
+        checkouts=checkout_durations(),
+        repairs=repair_frequency(),
+        suppliers=spend_by_supplier(),
+    )
+
+@app.route('/admin/reports/refresh', methods=['POST'])
+def refresh_reports_now():
+    if not is_admin():
+        return render_template('error_403.html')
+    refresh_reports()
+    flash('Отчёты обновлены.', 'success')
+    return redirect(url_for('reports'))
+
+def stream_download(chunks, mimetype, filename):
+    """
+    Отдаём файл генератором: первый байт уходит сразу, память не растёт с размером таблицы.
+    stream_with_context держит контекст запроса (и сессию БД) открытым до конца выгрузки.
+    """
+    return app.response_class(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment;filename={filename}'}
+    )
 
-import io
-import csv
 
 @app.route('/admin/export_csv')
+@read_replica
+@conditional_get(InventoryItem)
 def export_csv():
     if not is_admin():
         return render_template('error_403.html')
+    return stream_download(generate_inventory_csv(), 'text/csv', 'inventory.csv')
 
-    items = InventoryItem.query.all()
 
-    # Создаём "текстовый" буфер
-    output_str = io.StringIO()
-    writer = csv.writer(output_str, delimiter=',')
-    writer.writerow(['ID', 'InventoryNumber', 'Name', 'Condition', 'is_available', 'assigned_to'])
+@app.route('/admin/export_json')
+@read_replica
+@conditional_get(InventoryItem)
+def export_json():
+    if not is_admin():
+        return render_template('error_403.html')
+    return stream_download(generate_inventory_json(), 'application/json', 'inventory.json')
 
-    for item in items:
-        writer.writerow([
-            item.id,
-            item.inventory_number,
-            item.name,
-            item.condition,
-            'Да' if item.is_available else 'Нет',
-            item.assigned_to if item.assigned_to else ''
-        ])
 
-    # Содержимое CSV в виде обычной строки
-    csv_data = output_str.getvalue()
+@app.route('/admin/export_ndjson')
+@read_replica
+@conditional_get(InventoryItem)
+def export_ndjson():
+    if not is_admin():
+        return render_template('error_403.html')
+    return stream_download(generate_inventory_ndjson(), 'application/x-ndjson', 'inventory.ndjson')
 
-    # Кодируем в utf-8-sig
-    bytes_buffer = io.BytesIO(csv_data.encode('utf-8-sig'))
+@app.route('/admin/audit_stats')
+def audit_stats():
+    """Счётчики фоновой записи журнала действий (queued / flushed / dropped / pending)."""
+    if not is_admin():
+        return render_template('error_403.html')
+    return jsonify(audit_writer.stats())
 
-    return send_file(
-        bytes_buffer,
-        mimetype='text/csv',
-        as_attachment=True,
-        download_name='inventory.csv'
-    )
+@app.route('/metrics')
+def metrics():
+    """
+    Метрики для Prometheus. Если задан METRICS_TOKEN — только с заголовком
+    Authorization: Bearer <токен>, иначе — только администратору.
+    """
+    if not config.METRICS_ENABLED:
+        abort(404)
+    if config.METRICS_TOKEN:
+        if request.headers.get('Authorization') != f'Bearer {config.METRICS_TOKEN}':
+            abort(401)
+    elif not is_admin():
+        abort(403)
+    return app.response_class(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/cache_stats')
+def cache_stats():
+    """Заполненность и попадания кэша фрагментов этого процесса."""
+    if not is_admin():
+        return render_template('error_403.html')
+    return jsonify(fragment_cache.stats())
 
+# -------------------- ЖУРНАЛ ДЕЙСТВИЙ --------------------
 
-@app.route('/admin/export_json')
-def export_json():
+@app.route('/admin/audit')
+@read_replica
+@query_budget(3)
+def admin_audit():
     if not is_admin():
         return render_template('error_403.html')
-
-    items = InventoryItem.query.all()
-    data = []
-    for item in items:
-        data.append({
-            'id': item.id,
-            'inventory_number': item.inventory_number,
-            'name': item.name,
-            'condition': item.condition,
-            'is_available': item.is_available,
-            'assigned_to': item.assigned_to
-        })
-    json_data = json.dumps(data, ensure_ascii=False, indent=2)
-    return app.response_class(
-        json_data,
-        mimetype='application/json',
-        headers={'Content-Disposition': 'attachment;filename=inventory.json'}
-    )
+    # Keyset по (timestamp, id), сначала новые; фильтры user / action / since / until
+    page, filters = paginate_audit_log(request.args)
+    return render_template('admin_audit.html', logs=page.items, page=page, filters=filters)
+
+@app.route('/admin/audit.json')
+@read_replica
+@query_budget(3)
+def admin_audit_api():
+    """JSON-версия /admin/audit: те же фильтры и курсоры after / before."""
+    if not is_admin():
+        return jsonify({'error': 'forbidden'}), 403
+    page, filters = paginate_audit_log(request.args)
+    return jsonify({
+        'items': [audit_row_to_dict(row) for row in page.items],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+        'filters': filters,
+    })
+
+@app.route('/admin/audit/export')
+@read_replica
+def export_audit():
+    """Весь текущий фильтр журнала в NDJSON, потоково."""
+    if not is_admin():
+        return render_template('error_403.html')
+    filters = parse_audit_filters(request.args)
+    return stream_download(generate_audit_ndjson(filters), 'application/x-ndjson', 'action_logs.ndjson')
 
 # -------------------- УПРАВЛЕНИЕ ПОЛЬЗОВАТЕЛЯМИ --------------------
 
 @app.route('/admin/users')
+@read_replica
+@query_budget(3)
 def admin_users():
     if not is_admin():
         return render_template('error_403.html')
-    users = User.query.all()
+    # selectinload: весь инвентарь пользователей одним запросом WHERE assigned_to IN (...)
+    users = User.query.options(selectinload(User.inventory)).all()
     return render_template('admin_users.html', users=users)
 
 @app.route('/admin/delete_user/<int:user_id>', methods=['POST'])
 def delete_user(user_id):
+    """
+    Удаление пользователя — фоновая задача (jobs.delete_user_job): у пользователя могут быть
+    тысячи предметов и заявок, запрос не ждёт, пока они освободятся.
+    """
     if not is_admin():
         return render_template('error_403.html')
 
     user_to_delete = User.query.get_or_404(user_id)
-    # Освобождаем все предметы, закреплённые за этим пользователем
-    for item in user_to_delete.inventory:
-        item.assigned_to = None
-        item.is_available = True
-
+    job = enqueue('delete_user', created_by=current_user_id(), user_id=user_to_delete.id)
+    log_action(current_user_id(), f"Queued deletion of user {user_to_delete.username} (job {job.id})")
     db.session.commit()
 
-    db.session.delete(user_to_delete)
+    if wants_json():
+        return jsonify(job_to_dict(job)), 202
+    flash(f'Удаление пользователя {user_to_delete.username} поставлено в очередь (задача #{job.id}).', 'success')
+    return redirect(url_for('admin_jobs'))
+
+# -------------------- ФОНОВЫЕ ЗАДАЧИ --------------------
+
+def wants_json():
+    return request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+
+@app.route('/admin/jobs')
+@query_budget(2)
+def admin_jobs():
+    if not is_admin():
+        return render_template('error_403.html')
+    jobs = Job.query.order_by(Job.id.desc()).limit(50).all()
+    has_active = any(job.status in ACTIVE_JOB_STATUSES for job in jobs)
+    return render_template('admin_jobs.html', jobs=[job_to_dict(job) for job in jobs], has_active=has_active)
+
+@app.route('/admin/jobs/<int:job_id>')
+def job_status(job_id):
+    """Состояние задачи для опроса клиентом (JSON)."""
+    if not is_admin():
+        return jsonify({'error': 'forbidden'}), 403
+    return jsonify(job_to_dict(Job.query.get_or_404(job_id)))
+
+@app.route('/admin/jobs/export', methods=['POST'])
+def enqueue_export():
+    if not is_admin():
+        return render_template('error_403.html')
+    fmt = request.form.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        abort(400)
+    job = enqueue('export_inventory', created_by=current_user_id(), fmt=fmt)
+    if wants_json():
+        return jsonify(job_to_dict(job)), 202
+    flash(f'Выгрузка {fmt.upper()} поставлена в очередь (задача #{job.id}).', 'success')
+    return redirect(url_for('admin_jobs'))
+
+@app.route('/admin/jobs/archive_logs', methods=['POST'])
+def enqueue_archive_logs():
+    if not is_admin():
+        return render_template('error_403.html')
+    if config.ACTION_LOG_RETENTION_DAYS <= 0:
+        flash('Срок хранения журнала не задан (ACTION_LOG_RETENTION_DAYS=0).', 'danger')
+        return redirect(url_for('admin_jobs'))
+    job = enqueue('archive_logs', created_by=current_user_id(), days=config.ACTION_LOG_RETENTION_DAYS)
+    log_action(current_user_id(), f"Queued action log archiving (job {job.id})")
     db.session.commit()
-    flash('Пользователь и все связанные предметы освобождены.', 'success')
-    return redirect(url_for('admin_users'))
+    if wants_json():
+        return jsonify(job_to_dict(job)), 202
+    flash(f'Архивирование журнала поставлено в очередь (задача #{job.id}).', 'success')
+    return redirect(url_for('admin_jobs'))
+
+@app.route('/admin/jobs/<int:job_id>/download')
+def download_job_result(job_id):
+    if not is_admin():
+        return render_template('error_403.html')
+    job = Job.query.get_or_404(job_id)
+    result = job_to_dict(job)['result'] or {}
+    if job.kind != 'export_inventory' or job.status != 'succeeded' or not os.path.exists(result.get('path', '')):
+        abort(404)
+    mimetype, filename = EXPORT_FORMATS[result['format']]
+    return send_file(result['path'], mimetype=mimetype, as_attachment=True, download_name=filename)
 
 # -------------------- Запуск --------------------
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8080, debug=True)
\ No newline at end of file
+    # Только для разработки; продакшен: flask --app app db-upgrade, затем gunicorn -c gunicorn.conf.py wsgi:app
+    with app.app_context():
+        upgrade_schema()
+    app.run(host='0.0.0.0', port=8080, debug=config.DEBUG)
\ No newline at end of file
@@ -0,0 +1,137 @@
+from datetime import datetime
+
+from sqlalchemy import or_
+
+from events import publish_request
+from models import InventoryItem, UserRequest
+
+# Сколько заявок можно обработать за один bulk-запрос (одна транзакция)
+MAX_BULK_REQUESTS = 1000
+
+APPROVAL_ACTIONS = ('approve', 'reject')
+
+
+class ApprovalResult:
+    """
+    Итог обработки одной заявки.
+    - status: approved / rejected / skipped / not_found
+    - category: категория flash-сообщения (success / info / warning / danger)
+    """
+
+    def __init__(self, req_id, status, category, message):
+        self.req_id = req_id
+        self.status = status
+        self.category = category
+        self.message = message
+
+    @property
+    def ok(self):
+        return self.status in ('approved', 'rejected')
+
+    def to_dict(self):
+        return {'id': self.req_id, 'status': self.status, 'message': self.message}
+
+
+def _lock_requests(req_ids):
+    """
+    SELECT ... FOR UPDATE по заявкам в порядке id: параллельный админ ждёт,
+    а не обрабатывает ту же заявку второй раз. Фиксированный порядок блокировок — без дедлоков.
+    """
+    return {
+        user_req.id: user_req
+        for user_req in UserRequest.query.filter(UserRequest.id.in_(req_ids))
+        .order_by(UserRequest.id).with_for_update().all()
+    }
+
+
+def _lock_items(user_requests):
+    """
+    Предметы заявок под FOR UPDATE: is_available проверяем и меняем под блокировкой.
+    Ищем по FK item_id; по строке inventory_number — только для заявок без item_id.
+    Ключи словаря: ('id', item.id) и ('number', inventory_number).
+    """
+    item_ids = {user_req.item_id for user_req in user_requests if user_req.item_id is not None}
+    numbers = {user_req.inventory_number for user_req in user_requests if user_req.item_id is None}
+    conditions = []
+    if item_ids:
+        conditions.append(InventoryItem.id.in_(item_ids))
+    if numbers:
+        conditions.append(InventoryItem.inventory_number.in_(numbers))
+    if not conditions:
+        return {}
+    items = {}
+    for item in InventoryItem.query.filter(or_(*conditions)).order_by(InventoryItem.id).with_for_update():
+        items[('id', item.id)] = item
+        items[('number', item.inventory_number)] = item
+    return items
+
+
+def _item_for(user_req, items):
+    if user_req.item_id is not None:
+        return items.get(('id', user_req.item_id))
+    return items.get(('number', user_req.inventory_number))
+
+
+def _approve(req_id, user_req, item):
+    if not item:
+        return ApprovalResult(req_id, 'skipped', 'danger',
+                              f'Предмет #{user_req.inventory_number} не найден! Невозможно подтвердить.')
+
+    if user_req.request_type == 'get_item':
+        # Проверяем, что предмет ещё доступен
+        if not item.is_available:
+            return ApprovalResult(req_id, 'skipped', 'warning',
+                                  f'Предмет #{item.inventory_number} уже недоступен!')
+        # Назначаем пользователю
+        item.assigned_to = user_req.user_id
+        item.is_available = False
+        user_req.status = 'approved'
+        user_req.processed_at = datetime.utcnow()
+        publish_request(user_req)
+        return ApprovalResult(req_id, 'approved', 'success',
+                              f'Заявка {req_id} подтверждена: предмет #{item.inventory_number} выдан пользователю.')
+
+    if user_req.request_type == 'repair_item':
+        # Помечаем предмет недоступным, ставим condition='broken'
+        item.is_available = False
+        item.condition = 'broken'
+        user_req.status = 'approved'
+        user_req.processed_at = datetime.utcnow()
+        publish_request(user_req)
+        return ApprovalResult(req_id, 'approved', 'success',
+                              f'Заявка {req_id} подтверждена: предмет #{item.inventory_number} отправлен на ремонт.')
+
+    return ApprovalResult(req_id, 'skipped', 'danger', 'Неизвестный тип заявки.')
+
+
+def process_requests(req_ids, action):
+    """
+    Подтвердить или отклонить заявки req_ids в одной транзакции.
+    Возвращает список ApprovalResult в порядке req_ids; commit делает вызывающий код.
+    Две заявки на один предмет в одной пачке: выдаётся по первой, вторая — «уже недоступен».
+    """
+    if action not in APPROVAL_ACTIONS:
+        raise ValueError(f"action must be one of {APPROVAL_ACTIONS}, got {action!r}")
+
+    # Убираем повторы, сохраняя порядок
+    req_ids = list(dict.fromkeys(req_ids))
+    requests_by_id = _lock_requests(req_ids)
+    items = {}
+    if action == 'approve':
+        items = _lock_items([user_req for user_req in requests_by_id.values() if user_req.status == 'pending'])
+
+    results = []
+    for req_id in req_ids:
+        user_req = requests_by_id.get(req_id)
+        if user_req is None:
+            results.append(ApprovalResult(req_id, 'not_found', 'danger', f'Заявка {req_id} не найдена.'))
+        elif user_req.status != 'pending':
+            results.append(ApprovalResult(req_id, 'skipped', 'warning', 'Заявка уже обработана.'))
+        elif action == 'reject':
+            user_req.status = 'rejected'
+            user_req.processed_at = datetime.utcnow()
+            publish_request(user_req)
+            results.append(ApprovalResult(req_id, 'rejected', 'info', f'Заявка {req_id} отклонена.'))
+        else:
+            results.append(_approve(req_id, user_req, _item_for(user_req, items)))
+    return results
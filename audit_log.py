@@ -0,0 +1,186 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session
+
+from models import db, ActionLog
+
+# Режимы записи журнала действий:
+# - async: строки уходят в очередь и пишутся фоновым потоком пачками (по умолчанию)
+# - strict: строка добавляется в текущую сессию и фиксируется тем же commit, что и само действие
+AUDIT_LOG_MODES = ('async', 'strict')
+
+_STOP = object()
+
+
+class AuditLogWriter:
+    """
+    Фоновая пакетная запись ActionLog.
+    - Ограниченная очередь: если она полна, put ждёт put_timeout секунд (backpressure),
+      потом строка отбрасывается и учитывается в счётчике dropped.
+    - Поток сбрасывает пачку, когда набралось batch_size строк или прошло flush_interval секунд.
+    - При завершении процесса (atexit) очередь дописывается до конца.
+    Поток стартует лениво в каждом процессе — безопасно для pre-fork воркеров.
+    """
+
+    def __init__(self, queue_size=10000, batch_size=500, flush_interval=1.0, put_timeout=0.5):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._app = None
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.queued = 0
+        self.flushed = 0
+        self.dropped = 0
+
+    def init_app(self, app):
+        self._app = app
+        self.batch_size = app.config.get('AUDIT_LOG_BATCH_SIZE', self.batch_size)
+        self.flush_interval = app.config.get('AUDIT_LOG_FLUSH_INTERVAL', self.flush_interval)
+        self.put_timeout = app.config.get('AUDIT_LOG_PUT_TIMEOUT', self.put_timeout)
+        queue_size = app.config.get('AUDIT_LOG_QUEUE_SIZE')
+        if queue_size:
+            self._queue = queue.Queue(maxsize=queue_size)
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            # После fork поток родителя не существует — заводим свой (и свою очередь)
+            if self._pid is not None and self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def enqueue(self, user_id, action):
+        self._ensure_started()
+        row = {'user_id': user_id, 'action': action, 'timestamp': datetime.utcnow()}
+        try:
+            self._queue.put(row, timeout=self.put_timeout)
+        except queue.Full:
+            self._count(dropped=1)
+            if self._app is not None:
+                self._app.logger.warning('Audit log queue is full, dropped: %s', action)
+            return False
+        self._count(queued=1)
+        return True
+
+    def _count(self, queued=0, flushed=0, dropped=0):
+        with self._stats_lock:
+            self.queued += queued
+            self.flushed += flushed
+            self.dropped += dropped
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'queued': self.queued,
+                'flushed': self.flushed,
+                'dropped': self.dropped,
+                'pending': self._queue.qsize(),
+            }
+
+    def _run(self):
+        while True:
+            batch = []
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    row = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if row is _STOP:
+                    self._queue.task_done()
+                    stop = True
+                    break
+                batch.append(row)
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch):
+        try:
+            with self._app.app_context():
+                # Один многострочный INSERT (executemany) и один commit на пачку
+                db.session.execute(insert(ActionLog), batch)
+                db.session.commit()
+            self._count(flushed=len(batch))
+        except Exception:
+            self._count(dropped=len(batch))
+            self._app.logger.exception('Failed to write %d audit log rows', len(batch))
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self):
+        """Дождаться записи всего, что уже в очереди (для тестов, бенчмарков и CLI)."""
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.join()
+
+    def stop(self, timeout=10):
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+
+audit_writer = AuditLogWriter()
+
+
+def init_audit_log(app):
+    mode = app.config.get('AUDIT_LOG_MODE', 'async')
+    if mode not in AUDIT_LOG_MODES:
+        raise ValueError(f"AUDIT_LOG_MODE must be one of {AUDIT_LOG_MODES}, got {mode!r}")
+    audit_writer.init_app(app)
+
+
+def log_action(user_id, action):
+    """
+    Записать действие в журнал. Вызывается до commit вызывающего кода.
+    - strict: строка попадает в db.session и фиксируется тем же commit, что и бизнес-изменение.
+    - async: если у сессии открыта транзакция, строка ждёт её успешного commit (при rollback —
+      отбрасывается): изменения могли уйти в БД flush-ем или set-based UPDATE / INSERT мимо
+      unit of work, и «чистая» сессия ещё ничего не значит. Вызывающий код обязан сделать commit.
+      Без транзакции строка сразу уходит в очередь фоновой записи.
+    """
+    if current_app.config.get('AUDIT_LOG_MODE', 'async') == 'strict':
+        db.session.add(ActionLog(user_id=user_id, action=action))
+        return True
+    session = db.session()
+    if session.in_transaction():
+        session.info.setdefault('pending_audit_log', []).append((user_id, action))
+        return True
+    return audit_writer.enqueue(user_id, action)
+
+
+@event.listens_for(Session, 'after_commit')
+def _enqueue_pending_audit_log(session):
+    for user_id, action in session.info.pop('pending_audit_log', ()):
+        audit_writer.enqueue(user_id, action)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_audit_log(session):
+    session.info.pop('pending_audit_log', None)
@@ -0,0 +1,127 @@
+"""
+Просмотр журнала действий (ActionLog): фильтры, keyset-пагинация по (timestamp, id)
+от новых к старым и потоковая выгрузка выбранного фильтра в NDJSON.
+
+Каждому фильтру соответствует индекс из ActionLog.__table_args__:
+- user -> (user_id, timestamp)
+- action -> (action, timestamp): префикс действия, например 'Returned item'
+- since / until и «без фильтров» -> (timestamp)
+Префикс action — диапазон индекса, а не равенство: внутри него строки упорядочены по action,
+поэтому страницу по timestamp база собирает сортировкой всех совпавших строк. Для префикса
+одного действия это его записи, для широкого ('R') — почти весь журнал: сужайте user / since.
+id в индексы не входит явно: InnoDB и SQLite и так хранят ключ строки в каждом индексе.
+"""
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import false
+
+from models import db, User, ActionLog
+from pagination import escape_like, keyset_paginate, pager_params, parse_per_page
+
+AUDIT_EXPORT_CHUNK_SIZE = 1000
+
+AUDIT_COLUMNS = (ActionLog.id, ActionLog.user_id, ActionLog.action, ActionLog.timestamp, User.username)
+AUDIT_ORDER = (ActionLog.timestamp, ActionLog.id)
+
+
+def _parse_datetime(value, end_of_day=False):
+    """'2024-05-01' или '2024-05-01T12:30'. Для даты без времени until включает весь день."""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def parse_audit_filters(args):
+    """
+    Фильтры журнала из query string (пустые и некорректные значения отбрасываются):
+    - user: ID или логин пользователя
+    - action: префикс текста действия
+    - since / until: дата или дата-время (until для даты — включительно)
+    """
+    filters = {}
+    for name in ('user', 'action'):
+        value = args.get(name, '').strip()
+        if value:
+            filters[name] = value
+    since = args.get('since', '').strip()
+    if since and _parse_datetime(since):
+        filters['since'] = since
+    until = args.get('until', '').strip()
+    if until and _parse_datetime(until):
+        filters['until'] = until
+    return filters
+
+
+def filter_audit_query(query, filters):
+    if 'user' in filters:
+        user = filters['user']
+        if user.isdigit():
+            user_id = int(user)
+        else:
+            # Логин -> id одним запросом по UNIQUE-индексу, дальше работает индекс (user_id, timestamp)
+            user_id = db.session.query(User.id).filter_by(username=user).scalar()
+            if user_id is None:
+                # Неизвестный логин — пустой результат, а не user_id IS NULL (записи удалённых пользователей)
+                return query.filter(false())
+        query = query.filter(ActionLog.user_id == user_id)
+    if 'action' in filters:
+        query = query.filter(ActionLog.action.like(escape_like(filters['action']) + '%', escape='\\'))
+    if 'since' in filters:
+        query = query.filter(ActionLog.timestamp >= _parse_datetime(filters['since']))
+    if 'until' in filters:
+        query = query.filter(ActionLog.timestamp < _parse_datetime(filters['until'], end_of_day=True))
+    return query
+
+
+def audit_query(filters):
+    query = db.session.query(*AUDIT_COLUMNS).outerjoin(User, ActionLog.user_id == User.id)
+    return filter_audit_query(query, filters)
+
+
+def paginate_audit_log(args):
+    """
+    Страница журнала (сначала новые). Возвращаем (page, params) — как paginate_inventory:
+    params сохраняются в ссылках «Назад» / «Далее» и в ссылке на выгрузку.
+    """
+    filters = parse_audit_filters(args)
+    per_page = parse_per_page(args.get('per_page'))
+    page = keyset_paginate(
+        audit_query(filters),
+        AUDIT_ORDER,
+        after=args.get('after'),
+        before=args.get('before'),
+        per_page=per_page,
+        descending=True,
+    )
+    return page, pager_params(filters, args)
+
+
+def audit_row_to_dict(row):
+    return {
+        'id': row.id,
+        'user_id': row.user_id,
+        'username': row.username,
+        'action': row.action,
+        'timestamp': row.timestamp.isoformat() if row.timestamp else None,
+    }
+
+
+def generate_audit_ndjson(filters, chunk_size=AUDIT_EXPORT_CHUNK_SIZE):
+    """Весь фильтр в NDJSON: те же keyset-страницы по (timestamp, id), память — один чанк."""
+    query = audit_query(filters)
+    cursor = None
+    while True:
+        page = keyset_paginate(query, AUDIT_ORDER, after=cursor,
+                               per_page=chunk_size, descending=True)
+        if page.items:
+            yield ''.join(
+                json.dumps(audit_row_to_dict(row), ensure_ascii=False) + '\n' for row in page.items
+            ).encode('utf-8')
+        if not page.has_next:
+            return
+        cursor = page.next_cursor
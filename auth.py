@@ -0,0 +1,214 @@
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, session
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+
+import config
+from models import db, User
+from passwords import PasswordHashBusy, password_hasher
+from rate_limit import login_retry_after, record_login_failure, record_login_success
+from stats import get_version
+
+# Максимум пользователей в процессном кэше (LRU), чтобы память не росла бесконечно
+USER_CACHE_MAX_SIZE = 10000
+
+
+class _UserIdentityCache:
+    """
+    Процессный кэш пользователей по id с коротким TTL.
+    Храним отсоединённые (detached) экземпляры User; в сессию запроса их
+    возвращает db.session.merge(..., load=False) — без обращения к БД.
+    Свои изменения сбрасывают запись сразу (слушатели User ниже). Чужие (другой воркер,
+    поток задач) — через версию таблицы users из stats.py, как у индексов в памяти:
+    sync_version() не чаще раза в interval секунд читает её и при изменении очищает кэш.
+    Запись помнит версию, при которой пользователя прочитали, и с другой версией не отдаётся.
+    """
+
+    def __init__(self, max_size=USER_CACHE_MAX_SIZE):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_size = max_size
+        self.version = None
+        self._next_version_check = 0.0
+
+    def sync_version(self, load_version, interval):
+        """Сверить версию (load_version() — запрос к БД) не чаще раза в interval секунд; вернуть текущую."""
+        now = time.monotonic()
+        if now < self._next_version_check:
+            return self.version
+        version = load_version()
+        with self._lock:
+            self._next_version_check = now + interval
+            if version != self.version:
+                self._data.clear()
+                self.version = version
+        return version
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is None:
+                return None
+            expires_at, version, user = entry
+            if expires_at < time.monotonic() or version != self.version:
+                del self._data[user_id]
+                return None
+            self._data.move_to_end(user_id)
+            return user
+
+    def put(self, user_id, user, ttl, version=None):
+        with self._lock:
+            if version != self.version:
+                # Пока пользователя читали, другой запрос увидел новую версию — запись уже устарела
+                return
+            self._data[user_id] = (time.monotonic() + ttl, version, user)
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.version = None
+            self._next_version_check = 0.0
+
+
+user_cache = _UserIdentityCache()
+
+
+def is_admin():
+    """
+    Проверяем, что:
+      1) Пользователь авторизован в сессии (session['username'] есть)
+      2) session['username'] присутствует в списке ADMIN_LOGINS из config
+    """
+    return 'username' in session and session['username'] in config.ADMIN_LOGINS
+
+
+class LoginResult:
+    """
+    Итог authenticate().
+    - status: ok / invalid / throttled (много неудач, retry_after секунд) / busy (нет слота хеширования)
+    """
+
+    def __init__(self, status, user=None, retry_after=None):
+        self.status = status
+        self.user = user
+        self.retry_after = retry_after
+
+    @property
+    def ok(self):
+        return self.status == 'ok'
+
+
+def authenticate(username, password, ip):
+    """
+    Проверка логина и пароля для HTML-формы и API: ограничение неудачных попыток (rate_limit.py),
+    проверка хеша в пуле (passwords.py) и пересчёт хеша со старыми параметрами.
+    При успехе вызывает login_user; commit — за вызывающим.
+    """
+    retry_after = login_retry_after(username, ip)
+    if retry_after:
+        # Отказ до проверки пароля: перебор не тратит CPU на хеширование
+        return LoginResult('throttled', retry_after=retry_after)
+
+    user = User.query.filter_by(username=username).first()
+    try:
+        valid = user is not None and password_hasher.verify(user.password_hash, password or '')
+    except PasswordHashBusy:
+        return LoginResult('busy', retry_after=5)
+    if not valid:
+        record_login_failure(username, ip)
+        return LoginResult('invalid')
+
+    record_login_success(username)
+    login_user(user)
+    if password_hasher.needs_rehash(user.password_hash):
+        # Параметры хеша поменялись (PASSWORD_HASH_METHOD) — пароль сейчас известен, пересчитываем
+        try:
+            user.password_hash = password_hasher.hash(password)
+        except PasswordHashBusy:
+            pass
+    return LoginResult('ok', user=user)
+
+
+def login_user(user):
+    """Запоминаем в сессии id (для загрузки по PK) и логин (для is_admin и шаблонов)."""
+    session['user_id'] = user.id
+    session['username'] = user.username
+    session['role'] = user.role
+
+
+def current_user_id():
+    """id текущего пользователя из сессии, без запроса к БД."""
+    user_id = session.get('user_id')
+    if user_id is None and 'username' in session:
+        # Сессия, выданная до появления user_id: один раз дозагружаем пользователя
+        user = current_user()
+        return user.id if user else None
+    return user_id
+
+
+def current_user():
+    """
+    Текущий пользователь, загружается не больше одного раза за запрос (кэш в flask.g).
+    При CURRENT_USER_CACHE_TTL > 0 дополнительно используется процессный кэш; раз в
+    CURRENT_USER_CACHE_VERSION_INTERVAL секунд он сверяет версию users (один запрос по stat_counters).
+    """
+    if 'current_user' in g:
+        return g.current_user
+
+    user = cached = version = None
+    user_id = session.get('user_id')
+    ttl = current_app.config.get('CURRENT_USER_CACHE_TTL', 0)
+
+    if user_id is not None:
+        if ttl > 0:
+            version = user_cache.sync_version(
+                lambda: get_version(User), current_app.config.get('CURRENT_USER_CACHE_VERSION_INTERVAL', 1.0))
+            cached = user_cache.get(user_id)
+        if cached is not None:
+            user = db.session.merge(cached, load=False)
+        else:
+            user = db.session.get(User, user_id)
+    elif 'username' in session:
+        user = User.query.filter_by(username=session['username']).first()
+        if user:
+            session['user_id'] = user.id
+
+    # Пользователь удалён или переименован -> сессия недействительна
+    if user is not None and user.username != session.get('username'):
+        user = None
+
+    if user is not None and ttl > 0 and cached is None:
+        user_cache.put(user.id, _detached_copy(user), ttl, version)
+
+    g.current_user = user
+    return user
+
+
+def _detached_copy(user):
+    """Копия только колонок пользователя — в кэш не попадают связи и состояние сессии запроса."""
+    copy = User(
+        id=user.id,
+        username=user.username,
+        password_hash=user.password_hash,
+        role=user.role,
+        full_name=user.full_name
+    )
+    make_transient_to_detached(copy)
+    return copy
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_cached_user(mapper, connection, target):
+    # Смена роли, пароля, удаление — выбрасываем пользователя из процессного кэша
+    user_cache.invalidate(target.id)
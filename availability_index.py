@@ -0,0 +1,226 @@
+"""
+Индекс доступности инвентаря в памяти процесса: свободен ли предмет, за кем он числится
+и что на руках у пользователя — без запроса к inventory_items.
+
+Данные в плоских массивах (слот = позиция предмета по возрастанию id), около 25 байт
+на предмет: id и assigned_to — array('i'), флаги и состояние — bytearray, инвентарные
+номера — одна строка байтов со смещениями плюс перестановка слотов по номеру для bisect.
+На 1 млн предметов это ~25 МБ против сотен байт на ORM-объект или запись dict.
+Кто что держит — {user_id: set(слотов)} только для выданных предметов.
+
+Выдача, возврат и правка меняют слот на месте. Новые и переименованные предметы в массивы
+не вставляются (это сдвиг всех слотов): они лежат в небольшом словаре поверх массивов,
+а старый слот помечается удалённым. Когда таких правок много, индекс уплотняется пересборкой.
+Синхронизация с БД и другими воркерами — item_sync.ItemIndex (события change_events).
+Индекс — подсказка для чтения: решения о выдаче принимаются под FOR UPDATE (approvals.py),
+а пока индекс строится или номера в нём нет, вызывающий код идёт в БД.
+"""
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+
+from item_sync import ItemIndex
+from models import ITEM_CONDITIONS
+
+AVAILABLE = 0x01
+DELETED = 0x02
+# Состояние — индекс в ITEM_CONDITIONS в старших битах флагов; неизвестное значение -> CONDITION_OTHER
+CONDITION_SHIFT = 4
+CONDITION_OTHER = 0x0f
+
+IndexedItem = namedtuple('IndexedItem', 'id inventory_number condition is_available assigned_to')
+
+
+def _pack_flags(is_available, condition):
+    code = ITEM_CONDITIONS.index(condition) if condition in ITEM_CONDITIONS else CONDITION_OTHER
+    return (AVAILABLE if is_available else 0) | (code << CONDITION_SHIFT)
+
+
+def _unpack_condition(flags):
+    code = flags >> CONDITION_SHIFT
+    return ITEM_CONDITIONS[code] if code < len(ITEM_CONDITIONS) else None
+
+
+class AvailabilityIndex(ItemIndex):
+    name = 'availability index'
+    config_prefix = 'AVAILABILITY_INDEX'
+
+    def __init__(self):
+        super().__init__(refresh_interval=2.0)
+        self._ids = array('i')
+        self._assigned = array('i')
+        self._flags = bytearray()
+        self._numbers = b''
+        self._offsets = array('I', [0])
+        self._by_number = array('i')
+        self._held = {}
+        self._deleted = 0
+        # Новые и переименованные предметы: {id: IndexedItem}, {номер: id}, {user_id: set(id)}
+        self._extra = {}
+        self._extra_numbers = {}
+        self._extra_held = {}
+
+    def __len__(self):
+        return len(self._ids) - self._deleted + len(self._extra)
+
+    def pending_changes(self):
+        return self._deleted + len(self._extra)
+
+    def stats(self):
+        with self._lock:
+            held = sum(len(slots) for slots in self._held.values())
+            held += sum(len(ids) for ids in self._extra_held.values())
+            size = (self._ids.itemsize * len(self._ids) + self._assigned.itemsize * len(self._assigned)
+                    + len(self._flags) + len(self._numbers) + self._offsets.itemsize * len(self._offsets)
+                    + self._by_number.itemsize * len(self._by_number))
+            return {'ready': self.ready, 'items': len(self), 'held': held, 'bytes': size,
+                    'pending': self.pending_changes(), 'version': self.version}
+
+    # ---- построение ----
+
+    def _load(self, states):
+        ids = array('i')
+        assigned = array('i')
+        flags = bytearray()
+        numbers = []
+        for state in states:
+            ids.append(state.id)
+            assigned.append(state.assigned_to or 0)
+            flags.append(_pack_flags(state.is_available, state.condition))
+            numbers.append(state.inventory_number.encode())
+
+        offsets = array('I', [0])
+        for number in numbers:
+            offsets.append(offsets[-1] + len(number))
+        by_number = array('i', sorted(range(len(numbers)), key=numbers.__getitem__))
+        blob = b''.join(numbers)
+        del numbers
+        held = {}
+        for slot, user_id in enumerate(assigned):
+            if user_id:
+                held.setdefault(user_id, set()).add(slot)
+
+        with self._lock:
+            self._ids, self._assigned, self._flags = ids, assigned, flags
+            self._numbers, self._offsets, self._by_number = blob, offsets, by_number
+            self._held = held
+            self._deleted = 0
+            self._extra, self._extra_numbers, self._extra_held = {}, {}, {}
+        return len(ids)
+
+    # ---- чтение ----
+
+    def _number(self, slot):
+        return self._numbers[self._offsets[slot]:self._offsets[slot + 1]]
+
+    def _slot_for_id(self, item_id):
+        slot = bisect_left(self._ids, item_id)
+        if slot < len(self._ids) and self._ids[slot] == item_id and not self._flags[slot] & DELETED:
+            return slot
+        return None
+
+    def _slot_for_number(self, inventory_number):
+        key = inventory_number.encode()
+        low, high = 0, len(self._by_number)
+        while low < high:
+            middle = (low + high) // 2
+            if self._number(self._by_number[middle]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self._by_number):
+            slot = self._by_number[low]
+            if self._number(slot) == key and not self._flags[slot] & DELETED:
+                return slot
+        return None
+
+    def _item(self, slot):
+        flags = self._flags[slot]
+        return IndexedItem(self._ids[slot], self._number(slot).decode(), _unpack_condition(flags),
+                           bool(flags & AVAILABLE), self._assigned[slot] or None)
+
+    def find(self, inventory_number):
+        """IndexedItem по номеру или None — индекс не готов или номера в нём нет (спросить БД)."""
+        if not self.usable():
+            return None
+        with self._lock:
+            item_id = self._extra_numbers.get(inventory_number)
+            if item_id is not None:
+                return self._extra[item_id]
+            slot = self._slot_for_number(inventory_number)
+            return self._item(slot) if slot is not None else None
+
+    def get(self, item_id):
+        if not self.usable():
+            return None
+        with self._lock:
+            if item_id in self._extra:
+                return self._extra[item_id]
+            slot = self._slot_for_id(item_id)
+            return self._item(slot) if slot is not None else None
+
+    def held_by(self, user_id):
+        """Предметы пользователя по возрастанию номера; None — индекс не готов (спросить БД)."""
+        if not self.usable():
+            return None
+        with self._lock:
+            items = [self._item(slot) for slot in self._held.get(user_id, ())
+                     if not self._flags[slot] & DELETED]
+            items.extend(self._extra[item_id] for item_id in self._extra_held.get(user_id, ()))
+        return sorted(items, key=lambda item: item.inventory_number)
+
+    # ---- изменения ----
+
+    def upsert(self, state):
+        """Новое состояние предмета (item_sync.ItemState): на месте, а новый или переименованный — поверх массивов."""
+        with self._lock:
+            slot = self._slot_for_id(state.id)
+            if slot is not None and self._number(slot) == state.inventory_number.encode():
+                old_user = self._assigned[slot]
+                new_user = state.assigned_to or 0
+                if old_user != new_user:
+                    _discard(self._held, old_user, slot)
+                    if new_user:
+                        self._held.setdefault(new_user, set()).add(slot)
+                    self._assigned[slot] = new_user
+                self._flags[slot] = _pack_flags(state.is_available, state.condition)
+                return
+            if slot is not None:
+                self._mark_deleted(slot)
+            self._drop_extra(state.id)
+            self._extra[state.id] = IndexedItem(state.id, state.inventory_number, state.condition,
+                                                bool(state.is_available), state.assigned_to or None)
+            self._extra_numbers[state.inventory_number] = state.id
+            if state.assigned_to:
+                self._extra_held.setdefault(state.assigned_to, set()).add(state.id)
+
+    def remove(self, item_id):
+        with self._lock:
+            slot = self._slot_for_id(item_id)
+            if slot is not None:
+                self._mark_deleted(slot)
+            self._drop_extra(item_id)
+
+    def _mark_deleted(self, slot):
+        _discard(self._held, self._assigned[slot], slot)
+        self._flags[slot] |= DELETED
+        self._deleted += 1
+
+    def _drop_extra(self, item_id):
+        item = self._extra.pop(item_id, None)
+        if item is None:
+            return
+        if self._extra_numbers.get(item.inventory_number) == item_id:
+            del self._extra_numbers[item.inventory_number]
+        _discard(self._extra_held, item.assigned_to, item_id)
+
+
+def _discard(held, user_id, key):
+    keys = held.get(user_id)
+    if keys is not None:
+        keys.discard(key)
+        if not keys:
+            del held[user_id]
+
+
+availability_index = AvailabilityIndex()
@@ -0,0 +1,348 @@
+"""
+Нагрузочный сценарий по реальным маршрутам: вход, кабинеты, подача и подтверждение
+заявок, поиск, отчёты, выгрузки. Виртуальные пользователи и администраторы работают
+параллельно, каждый со своей cookie-сессией; по каждому маршруту считаются
+пропускная способность и p50/p95/p99, результат пишется в JSON для сравнения между коммитами.
+
+Данные — benchmarks/seed.py (--seed заполнит пустую БД); скрипту нужен тот же DATABASE_URL,
+что и серверу: из БД берутся логины, инвентарные номера и id заявок для подтверждения.
+
+    DATABASE_URL=sqlite:///bench.db python benchmarks/load_test.py --seed --in-process --duration 20
+    DATABASE_URL=sqlite:///bench.db gunicorn -c gunicorn.conf.py wsgi:app
+    DATABASE_URL=sqlite:///bench.db python benchmarks/load_test.py --base-url http://localhost:8080 \
+        --users 32 --admins 4 --duration 60 --output bench_results/$(git rev-parse --short HEAD).json
+    python benchmarks/load_test.py --compare bench_results/a1b2c3d.json bench_results/e4f5a6b.json
+
+--in-process гоняет сценарий через Flask test client в этом же процессе (без сервера и сети;
+цифры ниже, чем у gunicorn, но для сравнения коммитов между собой годятся).
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import queue
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.throughput import percentile  # noqa: E402
+
+# Сценарии: (название для отчёта, вес, функция шага). Шаг получает VirtualUser и возвращает
+# (метод, путь, данные формы или None, JSON или None)
+USER_STEPS = (
+    ('GET /user/dashboard', 30, lambda vu: ('GET', '/user/dashboard', None, None)),
+    ('GET /user/requests', 15, lambda vu: ('GET', '/user/requests', None, None)),
+    ('POST /user/requests', 10, lambda vu: ('POST', '/user/requests', {
+        'request_type': 'get_item' if vu.rnd.random() < 0.8 else 'repair_item',
+        'inventory_number': vu.rnd.choice(vu.data.numbers),
+        'comment': 'load test',
+    }, None)),
+    ('GET /user/return_items', 10, lambda vu: ('GET', '/user/return_items', None, None)),
+    ('GET /search/autocomplete', 25, lambda vu: (
+        'GET', '/search/autocomplete?' + urllib.parse.urlencode({'q': vu.rnd.choice(vu.data.numbers)[:4]}), None, None)),
+    ('GET /search', 10, lambda vu: (
+        'GET', '/search?' + urllib.parse.urlencode({'q': vu.rnd.choice(vu.data.numbers)[:6]}), None, None)),
+)
+
+ADMIN_STEPS = (
+    ('GET /admin/dashboard', 20, lambda vu: ('GET', '/admin/dashboard', None, None)),
+    ('GET /admin/inventory', 25, lambda vu: ('GET', '/admin/inventory?' + urllib.parse.urlencode(
+        {'condition': vu.rnd.choice(('', 'new', 'in_use', 'broken'))}), None, None)),
+    ('POST /admin/requests/bulk', 15, lambda vu: vu.approve_step()),
+    ('GET /admin/requests', 5, lambda vu: ('GET', '/admin/requests', None, None)),
+    ('GET /admin/reports', 10, lambda vu: ('GET', '/admin/reports', None, None)),
+    ('GET /admin/audit', 10, lambda vu: ('GET', '/admin/audit', None, None)),
+    ('GET /admin/purchase_planning', 5, lambda vu: ('GET', '/admin/purchase_planning', None, None)),
+    ('GET /admin/export_csv', 2, lambda vu: ('GET', '/admin/export_csv', None, None)),
+)
+
+# Заявок на подтверждение в одном запросе bulk
+APPROVE_BATCH = 5
+# Сколько pending-заявок заранее взять из БД для подтверждений
+PENDING_POOL = 20000
+
+
+class ScenarioData:
+    """Что берём из БД перед прогоном: логины, номера предметов, очередь pending-заявок."""
+
+    def __init__(self, usernames, numbers, pending_ids):
+        self.usernames = usernames
+        self.numbers = numbers
+        self.pending = queue.Queue()
+        for req_id in pending_ids:
+            self.pending.put(req_id)
+
+
+def load_scenario_data(app, limit_users=5000, limit_numbers=5000):
+    from models import db, User, InventoryItem, UserRequest
+    import config
+
+    with app.app_context():
+        usernames = [name for (name,) in db.session.query(User.username)
+                     .filter(User.username.notin_(config.ADMIN_LOGINS)).order_by(User.id).limit(limit_users)]
+        numbers = [number for (number,) in db.session.query(InventoryItem.inventory_number)
+                   .order_by(InventoryItem.id).limit(limit_numbers)]
+        pending = [req_id for (req_id,) in db.session.query(UserRequest.id)
+                   .filter_by(status='pending').order_by(UserRequest.id).limit(PENDING_POOL)]
+        db.session.remove()
+    if not usernames or not numbers:
+        raise SystemExit('No users or items in the database: run with --seed or benchmarks/seed.py first')
+    return ScenarioData(usernames, numbers, pending)
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Каждый маршрут меряем отдельно: редирект после POST не превращается в ещё один GET
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def request(self, method, path, form=None, payload=None):
+        headers = {}
+        data = None
+        if form is not None:
+            data = urllib.parse.urlencode(form).encode()
+        elif payload is not None:
+            data = json.dumps(payload).encode()
+            headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with self.opener.open(req) as response:
+                return response.status, len(response.read())
+        except urllib.error.HTTPError as error:
+            return error.code, len(error.read())
+
+
+class FlaskClient:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, form=None, payload=None):
+        response = self.client.open(path, method=method, data=form, json=payload)
+        size = len(response.get_data())
+        return response.status_code, size
+
+
+class VirtualUser:
+    def __init__(self, client, username, password, steps, data, seed_value):
+        self.client = client
+        self.username = username
+        self.password = password
+        self.steps = steps
+        self.weights = [weight for _, weight, _ in steps]
+        self.data = data
+        self.rnd = random.Random(seed_value)
+
+    def approve_step(self):
+        ids = []
+        while len(ids) < APPROVE_BATCH:
+            try:
+                ids.append(self.data.pending.get_nowait())
+            except queue.Empty:
+                break
+        if not ids:
+            return None
+        return 'POST', '/admin/requests/bulk', None, {'action': 'approve', 'ids': ids}
+
+    def run(self, deadline, think_time, recorder):
+        started = time.perf_counter()
+        status, size = self.client.request('POST', '/login', {'username': self.username, 'password': self.password})
+        recorder.record('POST /login', time.perf_counter() - started, status, size, ok=status == 302)
+        while time.monotonic() < deadline:
+            name, _, step = self.rnd.choices(self.steps, self.weights)[0]
+            call = step(self)
+            if call is None:
+                continue
+            method, path, form, payload = call
+            started = time.perf_counter()
+            try:
+                status, size = self.client.request(method, path, form, payload)
+            except Exception:
+                recorder.record(name, time.perf_counter() - started, None, 0, ok=False)
+                continue
+            recorder.record(name, time.perf_counter() - started, status, size, ok=status < 400)
+            if think_time:
+                time.sleep(self.rnd.uniform(0, 2 * think_time))
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routes = {}
+
+    def record(self, name, elapsed, status, size, ok):
+        with self._lock:
+            route = self.routes.setdefault(name, {'latencies': [], 'errors': 0, 'bytes': 0, 'statuses': {}})
+            route['latencies'].append(elapsed)
+            route['bytes'] += size
+            route['statuses'][str(status)] = route['statuses'].get(str(status), 0) + 1
+            if not ok:
+                route['errors'] += 1
+
+    def summary(self, elapsed):
+        routes = {}
+        for name, route in sorted(self.routes.items()):
+            values = sorted(route['latencies'])
+            routes[name] = {
+                'count': len(values),
+                'errors': route['errors'],
+                'statuses': route['statuses'],
+                'rps': round(len(values) / elapsed, 2),
+                'mean_ms': round(statistics.mean(values) * 1000, 2),
+                'p50_ms': round(percentile(values, 50) * 1000, 2),
+                'p95_ms': round(percentile(values, 95) * 1000, 2),
+                'p99_ms': round(percentile(values, 99) * 1000, 2),
+                'max_ms': round(values[-1] * 1000, 2),
+                'bytes': route['bytes'],
+            }
+        total = sum(route['count'] for route in routes.values())
+        return {
+            'requests': total,
+            'errors': sum(route['errors'] for route in routes.values()),
+            'elapsed_s': round(elapsed, 2),
+            'rps': round(total / elapsed, 2),
+            'routes': routes,
+        }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_summary(result):
+    print(f"{result['requests']} requests in {result['elapsed_s']}s, {result['rps']} req/s, errors: {result['errors']}")
+    print(f"{'route':32} {'count':>7} {'err':>5} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, route in result['routes'].items():
+        print(f"{name:32} {route['count']:>7} {route['errors']:>5} {route['rps']:>8.1f} "
+              f"{route['p50_ms']:>8.1f} {route['p95_ms']:>8.1f} {route['p99_ms']:>8.1f}")
+
+
+def compare(base_path, new_path, threshold):
+    """Сравнить два JSON-отчёта; код возврата 1, если p95 какого-то маршрута вырос больше threshold %."""
+    with open(base_path) as f:
+        base = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{base.get('commit') or base_path} -> {new.get('commit') or new_path}")
+    print(f"{'route':32} {'p50':>17} {'p95':>17} {'Δp95':>7}")
+    regressions = []
+    for name, route in new['routes'].items():
+        old = base['routes'].get(name)
+        if old is None:
+            print(f"{name:32} {'new':>17}")
+            continue
+        change = (route['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100 if old['p95_ms'] else 0.0
+        print(f"{name:32} {old['p50_ms']:>7.1f} → {route['p50_ms']:>7.1f} "
+              f"{old['p95_ms']:>7.1f} → {route['p95_ms']:>7.1f} {change:>+6.0f}%")
+        if change > threshold:
+            regressions.append(name)
+    print(f"total: {base['rps']} → {new['rps']} req/s")
+    if regressions:
+        print(f"p95 regressed by more than {threshold}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:8080')
+    parser.add_argument('--in-process', action='store_true', help='Flask test client вместо HTTP')
+    parser.add_argument('--users', type=int, default=16, help='виртуальных пользователей')
+    parser.add_argument('--admins', type=int, default=2, help='виртуальных администраторов')
+    parser.add_argument('--admin-username', default='admin')
+    parser.add_argument('--password', default=None, help='пароль всех пользователей (по умолчанию seed.SEED_PASSWORD)')
+    parser.add_argument('--duration', type=float, default=30.0, help='секунд')
+    parser.add_argument('--think-ms', type=float, default=0.0, help='средняя пауза между шагами')
+    parser.add_argument('--random-seed', type=int, default=1)
+    parser.add_argument('--output', help='куда записать JSON-отчёт')
+    parser.add_argument('--seed', action='store_true', help='заполнить БД, если она пустая')
+    parser.add_argument('--seed-users', type=int, default=1000)
+    parser.add_argument('--seed-items', type=int, default=10000)
+    parser.add_argument('--seed-requests', type=int, default=10000)
+    parser.add_argument('--seed-plans', type=int, default=1000)
+    parser.add_argument('--seed-logs', type=int, default=50000)
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help='сравнить два отчёта и выйти')
+    parser.add_argument('--threshold', type=float, default=20.0, help='допустимый рост p95 для --compare, %%')
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(compare(args.compare[0], args.compare[1], args.threshold))
+
+    from app import app
+    from benchmarks.seed import SEED_PASSWORD, seed
+    from migrations import upgrade_schema
+    from models import db, User
+
+    seeded = None
+    with app.app_context():
+        upgrade_schema()
+        if args.seed and db.session.query(User.id).first() is None:
+            seeded = seed(users=args.seed_users, items=args.seed_items, requests=args.seed_requests,
+                          plans=args.seed_plans, logs=args.seed_logs, admin_username=args.admin_username)
+        database = db.engine.url.render_as_string(hide_password=True)
+        db.session.remove()
+    data = load_scenario_data(app)
+    password = args.password or SEED_PASSWORD
+
+    def make_client():
+        return FlaskClient(app) if args.in_process else HttpClient(args.base_url.rstrip('/'))
+
+    rnd = random.Random(args.random_seed)
+    virtual_users = [
+        VirtualUser(make_client(), rnd.choice(data.usernames), password, USER_STEPS, data, rnd.random())
+        for _ in range(args.users)
+    ] + [
+        VirtualUser(make_client(), args.admin_username, password, ADMIN_STEPS, data, rnd.random())
+        for _ in range(args.admins)
+    ]
+
+    recorder = Recorder()
+    started = time.monotonic()
+    deadline = started + args.duration
+    with ThreadPoolExecutor(max_workers=len(virtual_users)) as pool:
+        futures = [pool.submit(vu.run, deadline, args.think_ms / 1000, recorder) for vu in virtual_users]
+        for future in futures:
+            future.result()
+    elapsed = time.monotonic() - started
+
+    result = recorder.summary(elapsed)
+    result.update({
+        'commit': git_commit(),
+        'started_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'target': 'in-process' if args.in_process else args.base_url,
+        'database': database,
+        'users': args.users,
+        'admins': args.admins,
+        'duration_s': args.duration,
+        'think_ms': args.think_ms,
+        'seeded': seeded,
+    })
+    print_summary(result)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f'written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Планы и задержки запросов горячих маршрутов — с индексами и без них.
+
+Скрипт берёт запросы маршрутов (admin_requests, user_requests, approve_request,
+user_return_items, фильтры инвентаря, выборки журнала), печатает EXPLAIN и медиану
+времени выполнения. Затем временно удаляет индексы из models.py, повторяет замер
+и создаёт индексы обратно.
+
+    DATABASE_URL=sqlite:///bench.db python benchmarks/query_plans.py --seed-items 200000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import select, text  # noqa: E402
+
+from models import db, User, InventoryItem, UserRequest, ActionLog  # noqa: E402
+
+# Индексы, которые сравниваем (UNIQUE и первичные ключи не трогаем)
+BENCHMARKED_MODELS = (InventoryItem, UserRequest, ActionLog)
+
+
+def route_queries(sample):
+    """{название: SELECT} — те же запросы, что выполняют маршруты app.py."""
+    since = sample['now'] - timedelta(days=1)
+    return {
+        'admin_requests (first 50)': select(UserRequest, User).join(User, UserRequest.user)
+        .order_by(UserRequest.status, UserRequest.created_at.desc()).limit(50),
+        'user_requests': select(UserRequest).where(UserRequest.user_id == sample['user_id']),
+        'approve_request: requests by number': select(UserRequest)
+        .where(UserRequest.inventory_number == sample['inventory_number']),
+        'approve_request: requests by item FK': select(UserRequest)
+        .where(UserRequest.item_id == sample['item_id']),
+        'user_return_items': select(InventoryItem).where(InventoryItem.assigned_to == sample['user_id']),
+        'inventory: condition filter page': select(InventoryItem)
+        .where(InventoryItem.condition == 'broken').order_by(InventoryItem.inventory_number).limit(51),
+        'inventory: available page': select(InventoryItem)
+        .where(InventoryItem.is_available.is_(True)).order_by(InventoryItem.inventory_number).limit(51),
+        'action_logs: user history': select(ActionLog).where(ActionLog.user_id == sample['user_id'])
+        .order_by(ActionLog.timestamp.desc()).limit(50),
+        'action_logs: last 24h': select(ActionLog).where(ActionLog.timestamp >= since),
+    }
+
+
+def explain(connection, statement):
+    sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True}))
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.dialect.name == 'sqlite' else 'EXPLAIN '
+    rows = connection.execute(text(prefix + sql)).all()
+    if connection.dialect.name == 'sqlite':
+        return [row[-1] for row in rows]
+    return [' | '.join(str(value) for value in row) for row in rows]
+
+
+def time_query(connection, statement, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        connection.execute(statement).all()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def measure(connection, queries, repeat):
+    return {
+        name: (time_query(connection, statement, repeat), explain(connection, statement))
+        for name, statement in queries.items()
+    }
+
+
+def benchmarked_indexes():
+    return [index for model in BENCHMARKED_MODELS for index in model.__table__.indexes if not index.unique]
+
+
+def pick_sample(connection):
+    user_id = connection.execute(
+        select(InventoryItem.assigned_to).where(InventoryItem.assigned_to.isnot(None)).limit(1)
+    ).scalar() or 1
+    item_id, number = connection.execute(
+        select(UserRequest.item_id, UserRequest.inventory_number).limit(1)
+    ).first() or (1, '0000/001')
+    return {'user_id': user_id, 'item_id': item_id, 'inventory_number': number, 'now': datetime.utcnow()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed-users', type=int, default=2000)
+    parser.add_argument('--seed-items', type=int, default=50000)
+    parser.add_argument('--seed-requests', type=int, default=100000)
+    parser.add_argument('--seed-logs', type=int, default=200000)
+    args = parser.parse_args()
+
+    from app import app
+    from benchmarks.seed import seed
+    from migrations import upgrade_schema
+
+    with app.app_context():
+        upgrade_schema()
+        if not db.session.query(InventoryItem.id).limit(1).scalar():
+            print('Seeding synthetic data...')
+            seed(users=args.seed_users, items=args.seed_items, requests=args.seed_requests,
+                 plans=1000, logs=args.seed_logs)
+
+        with db.engine.connect() as connection:
+            queries = route_queries(pick_sample(connection))
+            indexed = measure(connection, queries, args.repeat)
+
+        indexes = benchmarked_indexes()
+        with db.engine.begin() as connection:
+            for index in indexes:
+                index.drop(connection)
+        # Новые соединения: кэш подготовленных выражений драйвера помнит старые планы
+        db.engine.dispose()
+        try:
+            with db.engine.connect() as connection:
+                unindexed = measure(connection, queries, args.repeat)
+        finally:
+            with db.engine.begin() as connection:
+                for index in indexes:
+                    index.create(connection)
+            db.engine.dispose()
+
+    print(f"{'query':40} {'no index ms':>12} {'indexed ms':>12} {'speedup':>8}")
+    for name in queries:
+        before, after = unindexed[name][0], indexed[name][0]
+        print(f'{name:40} {before:>12.2f} {after:>12.2f} {before / after if after else 0:>7.1f}x')
+    for name in queries:
+        print(f'\n== {name}')
+        print('  without indexes:')
+        for line in unindexed[name][1]:
+            print('    ' + line)
+        print('  with indexes:')
+        for line in indexed[name][1]:
+            print('    ' + line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""
+Генератор синтетических данных для бенчмарков.
+
+Пишет многострочными INSERT'ами пачками, в обход ORM unit of work; счётчики
+панели (stats.py) после заполнения пересчитываются целиком.
+
+    DATABASE_URL=sqlite:///bench.db python benchmarks/seed.py --items 200000 --requests 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from models import db, User, InventoryItem, PurchasePlan, UserRequest, ActionLog, ITEM_CONDITIONS  # noqa: E402
+
+SEED_BATCH_SIZE = 5000
+ITEM_NAMES = ['Мяч футбольный', 'Мяч баскетбольный', 'Сетка волейбольная', 'Скакалка', 'Гантели',
+              'Лыжи', 'Коньки', 'Ракетка', 'Конус', 'Обруч', 'Мат гимнастический', 'Секундомер']
+SUPPLIERS = ['СпортОпт', 'Атлет', 'ФизкультПро', 'Чемпион', None]
+REQUEST_STATUSES = ('pending', 'approved', 'rejected')
+ACTIONS = ('Logged in', 'Logged out', 'Returned item #{}', 'Edited item #{}', 'Created item #{}')
+
+# Пароль всех синтетических пользователей (user00001 ... и admin)
+SEED_PASSWORD = 'password'
+
+
+def _insert_batches(model, rows_iter, batch_size=SEED_BATCH_SIZE):
+    batch = []
+    total = 0
+    for row in rows_iter:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            db.session.execute(insert(model), batch)
+            db.session.commit()
+            total += len(batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(model), batch)
+        db.session.commit()
+        total += len(batch)
+    return total
+
+
+def inventory_number(i):
+    return f'{i // 1000:04d}/{i % 1000:03d}'
+
+
+def seed(users=1000, items=10000, requests=10000, plans=1000, logs=50000, seed_value=42, admin_username='admin'):
+    """
+    Заполнить пустую БД. Требует app context. Возвращает словарь {таблица: строк}.
+    Пользователь admin_username создаётся первым (id=1), с паролем SEED_PASSWORD.
+    """
+    rnd = random.Random(seed_value)
+    # Один хеш на всех: хеширование 10^5 паролей заняло бы больше времени, чем весь сид
+    password_hash = generate_password_hash(SEED_PASSWORD)
+    now = datetime.utcnow()
+    counts = {}
+
+    counts['users'] = _insert_batches(User, (
+        {
+            'username': admin_username if i == 0 else f'user{i:05d}',
+            'password_hash': password_hash,
+            'role': 'admin' if i == 0 else 'user',
+            'full_name': f'Спортсмен {i}',
+        }
+        for i in range(users)
+    ))
+
+    def item_rows():
+        for i in range(items):
+            assigned = rnd.random() < 0.3
+            yield {
+                'inventory_number': inventory_number(i),
+                'name': rnd.choice(ITEM_NAMES),
+                'condition': rnd.choice(ITEM_CONDITIONS),
+                'is_available': not assigned,
+                'assigned_to': rnd.randint(2, users) if assigned and users > 1 else None,
+            }
+    counts['inventory_items'] = _insert_batches(InventoryItem, item_rows())
+
+    def request_rows():
+        for _ in range(requests):
+            i = rnd.randrange(items) if items else 0
+            yield {
+                'user_id': rnd.randint(1, users),
+                'request_type': 'get_item' if rnd.random() < 0.8 else 'repair_item',
+                'inventory_number': inventory_number(i),
+                'item_id': i + 1 if items else None,
+                'status': rnd.choice(REQUEST_STATUSES),
+                'created_at': now - timedelta(minutes=rnd.randrange(60 * 24 * 365)),
+            }
+    counts['user_requests'] = _insert_batches(UserRequest, request_rows())
+
+    counts['purchase_plans'] = _insert_batches(PurchasePlan, (
+        {
+            'item_name': rnd.choice(ITEM_NAMES),
+            'supplier_name': rnd.choice(SUPPLIERS),
+            'planned_price': round(rnd.uniform(100, 10000), 2),
+            'quantity': rnd.randint(1, 20),
+            'status': 'received' if rnd.random() < 0.6 else 'planned',
+        }
+        for _ in range(plans)
+    ))
+
+    counts['action_logs'] = _insert_batches(ActionLog, (
+        {
+            'user_id': rnd.randint(1, users),
+            'action': rnd.choice(ACTIONS).format(inventory_number(rnd.randrange(max(items, 1)))),
+            'timestamp': now - timedelta(seconds=rnd.randrange(60 * 60 * 24 * 365 * 2)),
+        }
+        for _ in range(logs)
+    ))
+
+    from stats import reconcile_counters
+    reconcile_counters()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--plans', type=int, default=1000)
+    parser.add_argument('--logs', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    from app import app
+    from migrations import upgrade_schema
+    with app.app_context():
+        upgrade_schema()
+        started = time.perf_counter()
+        counts = seed(args.users, args.items, args.requests, args.plans, args.logs, args.seed)
+        elapsed = time.perf_counter() - started
+    for table, count in counts.items():
+        print(f'{table}: {count}')
+    print(f'seeded in {elapsed:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""
+Замер старта воркеров: время загрузки приложения, первого ответа и память на воркер
+при N одновременно форкнутых процессах — так же, как мастер gunicorn поднимает воркеры
+(только stdlib; память — из /proc/<pid>/smaps_rollup, т.е. Linux).
+
+- без --preload каждый воркер сам импортирует wsgi (gunicorn по умолчанию);
+- --preload: приложение импортируется один раз до fork, воркеры делят загруженные модули
+  (copy-on-write) — как GUNICORN_PRELOAD=1;
+- --schema-on-import: ещё и upgrade_schema() в каждом воркере — так стартовал app.py,
+  пока схема создавалась при импорте; для сравнения с текущим путём.
+
+PSS делит общие страницы между процессами, поэтому сумма PSS воркеров — честная оценка
+памяти всего пула; private — то, что воркер не делит ни с кем. Процессы пула хеширования
+паролей (PASSWORD_HASH_WORKERS, запускаются прогревом) считаются в память своего воркера.
+
+    DATABASE_URL=sqlite:///bench.db python benchmarks/startup.py --workers 16
+    DATABASE_URL=sqlite:///bench.db python benchmarks/startup.py --workers 16 --preload --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.load_test import git_commit  # noqa: E402
+
+MEMORY_FIELDS = {'Rss': 'rss_mb', 'Pss': 'pss_mb', 'Private_Clean': 'private_mb', 'Private_Dirty': 'private_mb'}
+
+
+def read_memory(pid):
+    """RSS / PSS / private (МБ) процесса pid по /proc/<pid>/smaps_rollup."""
+    memory = {'rss_mb': 0.0, 'pss_mb': 0.0, 'private_mb': 0.0}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as rollup:
+            for line in rollup:
+                name, _, rest = line.partition(':')
+                if name in MEMORY_FIELDS:
+                    memory[MEMORY_FIELDS[name]] += int(rest.split()[0]) / 1024
+    except OSError:
+        return None
+    return {key: round(value, 1) for key, value in memory.items()}
+
+
+def child_pids(pid):
+    pids = []
+    try:
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as children:
+                pids.extend(int(child) for child in children.read().split())
+    except OSError:
+        pass
+    return pids
+
+
+def read_worker_memory(pid):
+    """Память воркера вместе с его процессами (пул хеширования паролей): они тоже на воркер."""
+    memory = read_memory(pid)
+    if memory is None:
+        return {}
+    helpers = [read_memory(child) for child in child_pids(pid)]
+    helpers = [helper for helper in helpers if helper]
+    for helper in helpers:
+        for key in memory:
+            memory[key] = round(memory[key] + helper[key], 1)
+    memory['processes'] = 1 + len(helpers)
+    return memory
+
+
+def load_app(schema_on_import):
+    from wsgi import app
+    if schema_on_import:
+        from migrations import upgrade_schema
+        with app.app_context():
+            upgrade_schema()
+    return app
+
+
+def run_worker(forked_at, preloaded_app, args, report):
+    """Тело воркера: загрузка (если не preload), первый запрос, прогрев — и отчёт родителю."""
+    result = {'pid': os.getpid()}
+    try:
+        app = preloaded_app or load_app(args.schema_on_import)
+        if preloaded_app is not None and args.schema_on_import:
+            load_app(True)
+        result['boot_ms'] = round((time.perf_counter() - forked_at) * 1000, 1)
+        warm_up = None
+        if args.warm_up:
+            from warmup import start_warm_up
+            warm_up = start_warm_up(app)
+        started = time.perf_counter()
+        response = app.test_client().get(args.path)
+        result['first_request_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        result['status'] = response.status_code
+        result['ready_ms'] = round((time.perf_counter() - forked_at) * 1000, 1)
+        if warm_up is not None:
+            warm_up.join()
+            result['warm_up_done_ms'] = round((time.perf_counter() - forked_at) * 1000, 1)
+    except Exception as exc:
+        result['error'] = f'{exc.__class__.__name__}: {exc}'
+    report.write(json.dumps(result) + '\n')
+    report.flush()
+
+
+def spawn_workers(args, preloaded_app):
+    workers = []
+    for _ in range(args.workers):
+        report_read, report_write = os.pipe()
+        release_read, release_write = os.pipe()
+        forked_at = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(report_read)
+            os.close(release_write)
+            # Концы каналов уже запущенных воркеров: иначе они не увидят EOF при освобождении
+            for _, report, release in workers:
+                report.close()
+                os.close(release)
+            with os.fdopen(report_write, 'w') as report:
+                run_worker(forked_at, preloaded_app, args, report)
+            # Живём, пока родитель не снимет память со всех воркеров сразу
+            os.read(release_read, 1)
+            from passwords import password_hasher
+            password_hasher.shutdown(wait=True)
+            os._exit(0)
+        os.close(report_write)
+        os.close(release_read)
+        workers.append((pid, os.fdopen(report_read), release_write))
+    return workers
+
+
+def summarize(results, master):
+    ok = [result for result in results if 'error' not in result]
+
+    def column(name):
+        return [result[name] for result in ok if name in result]
+
+    def stats(values):
+        return {'median': round(statistics.median(values), 1), 'max': round(max(values), 1)} if values else None
+
+    return {
+        'workers_ok': len(ok),
+        'boot_ms': stats(column('boot_ms')),
+        'first_request_ms': stats(column('first_request_ms')),
+        'ready_ms': stats(column('ready_ms')),
+        'warm_up_done_ms': stats(column('warm_up_done_ms')),
+        'rss_mb': stats(column('rss_mb')),
+        'private_mb': stats(column('private_mb')),
+        'pss_total_mb': round(sum(column('pss_mb')) + (master or {}).get('pss_mb', 0), 1),
+    }
+
+
+def print_report(report):
+    mode = 'preload + fork' if report['preload'] else 'fork + import in each worker'
+    if report['schema_on_import']:
+        mode += ', schema check on import'
+    print(f"{report['workers']} workers ({mode}): all ready in {report['all_ready_s']}s")
+    print(f"{'pid':>8} {'boot_ms':>9} {'first_ms':>9} {'ready_ms':>9} {'rss_mb':>8} {'pss_mb':>8} {'priv_mb':>8} {'procs':>5}")
+    for result in report['results']:
+        if 'error' in result:
+            print(f"{result['pid']:>8} error: {result['error']}")
+            continue
+        print(f"{result['pid']:>8} {result['boot_ms']:>9} {result['first_request_ms']:>9} {result['ready_ms']:>9} "
+              f"{result.get('rss_mb', '-'):>8} {result.get('pss_mb', '-'):>8} {result.get('private_mb', '-'):>8} {result.get('processes', '-'):>5}")
+    summary = report['summary']
+    for name in ('boot_ms', 'first_request_ms', 'ready_ms', 'warm_up_done_ms', 'rss_mb', 'private_mb'):
+        if summary[name]:
+            print(f"{name:18} median {summary[name]['median']:>8}  max {summary[name]['max']:>8}")
+    print(f"{'pss_total_mb':18} {summary['pss_total_mb']} (master + all workers)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--preload', action='store_true', help='импортировать приложение до fork')
+    parser.add_argument('--schema-on-import', action='store_true', help='upgrade_schema() в каждом воркере')
+    parser.add_argument('--warm-up', action='store_true', help='запускать warmup.py, как хук post_worker_init')
+    parser.add_argument('--path', default='/', help='первый запрос каждого воркера')
+    parser.add_argument('--output', help='куда записать JSON-отчёт')
+    args = parser.parse_args()
+
+    preloaded_app = None
+    started = time.perf_counter()
+    if args.preload:
+        preloaded_app = load_app(False)
+    preload_s = time.perf_counter() - started
+
+    workers = spawn_workers(args, preloaded_app)
+    results = [json.loads(report.readline() or '{"error": "worker died"}') for _, report, _ in workers]
+    all_ready_s = time.perf_counter() - started
+    for result, (pid, _, _) in zip(results, workers):
+        result.setdefault('pid', pid)
+        result.update(read_worker_memory(pid))
+    master = read_memory(os.getpid())
+    for pid, report, release in workers:
+        os.close(release)
+        report.close()
+        os.waitpid(pid, 0)
+
+    report = {
+        'commit': git_commit(),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'workers': args.workers,
+        'preload': args.preload,
+        'schema_on_import': args.schema_on_import,
+        'warm_up': args.warm_up,
+        'cpu_count': os.cpu_count(),
+        'preload_s': round(preload_s, 2),
+        'all_ready_s': round(all_ready_s, 2),
+        'master': master,
+        'results': results,
+        'summary': summarize(results, master),
+    }
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Нагрузочный замер пропускной способности запущенного приложения (только stdlib).
+
+Пример (SQLite вместо MySQL):
+    DATABASE_URL=sqlite:///bench.db gunicorn -c gunicorn.conf.py wsgi:app
+    python benchmarks/throughput.py --base-url http://localhost:8080 \
+        --username admin --password admin --path /admin/inventory --path /admin/requests \
+        --concurrency 32 --duration 30
+"""
+import argparse
+import http.cookiejar
+import statistics
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def make_opener(base_url, username, password):
+    """Отдельный opener (и cookie-сессия) на каждого виртуального клиента."""
+    jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+    if username:
+        data = urllib.parse.urlencode({'username': username, 'password': password}).encode()
+        opener.open(base_url + '/login', data=data).read()
+    return opener
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_client(opener, base_url, paths, deadline, results, errors, lock):
+    local = {path: [] for path in paths}
+    local_errors = 0
+    i = 0
+    while time.monotonic() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            with opener.open(base_url + path) as response:
+                response.read()
+        except Exception:
+            local_errors += 1
+            continue
+        local[path].append(time.perf_counter() - started)
+    with lock:
+        for path, values in local.items():
+            results[path].extend(values)
+        errors[0] += local_errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:8080')
+    parser.add_argument('--username')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--path', dest='paths', action='append', help='можно указать несколько раз')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0, help='секунд')
+    args = parser.parse_args()
+
+    base_url = args.base_url.rstrip('/')
+    paths = args.paths or ['/']
+    openers = [make_opener(base_url, args.username, args.password) for _ in range(args.concurrency)]
+
+    results = {path: [] for path in paths}
+    errors = [0]
+    lock = threading.Lock()
+    started = time.monotonic()
+    deadline = started + args.duration
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for opener in openers:
+            pool.submit(run_client, opener, base_url, paths, deadline, results, errors, lock)
+    elapsed = time.monotonic() - started
+
+    total = sum(len(values) for values in results.values())
+    print(f"{total} requests in {elapsed:.1f}s, {total / elapsed:.1f} req/s, errors: {errors[0]}")
+    print(f"{'path':40} {'count':>8} {'mean ms':>9} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for path, values in results.items():
+        values.sort()
+        mean = statistics.mean(values) * 1000 if values else 0.0
+        print(f"{path:40} {len(values):>8} {mean:>9.1f} "
+              f"{percentile(values, 50) * 1000:>8.1f} {percentile(values, 95) * 1000:>8.1f} "
+              f"{percentile(values, 99) * 1000:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+import csv
+import io
+import json
+from collections import Counter
+
+from sqlalchemy import insert, update
+from sqlalchemy.exc import DataError, IntegrityError
+
+from item_sync import publish_items
+from models import db, InventoryItem, INVENTORY_NUMBER_RE, ITEM_CONDITIONS
+from stats import record_bulk_changes, record_bulk_insert
+
+# Строк на одну пачку: один SELECT на уникальность + один многострочный INSERT + один commit
+IMPORT_BATCH_SIZE = 1000
+# Сколько ошибок храним в отчёте (остальные только считаем), чтобы отчёт не съел память
+MAX_REPORTED_ERRORS = 1000
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+# Длины колонок: executemany не проверяет их сам — MySQL в strict-режиме отвергнет всю пачку
+MAX_NUMBER_LENGTH = InventoryItem.inventory_number.type.length
+MAX_NAME_LENGTH = InventoryItem.name.type.length
+
+# Заголовки CSV: принимаем и собственные имена колонок, и формат /admin/export_csv
+CSV_FIELD_ALIASES = {
+    'inventory_number': 'inventory_number',
+    'inventorynumber': 'inventory_number',
+    'name': 'name',
+    'condition': 'condition',
+}
+
+
+class ImportReport:
+    """Итог импорта: счётчики и построчные ошибки (line — номер строки во входном файле)."""
+
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, line, inventory_number, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'inventory_number': inventory_number, 'error': message})
+
+    @property
+    def errors_truncated(self):
+        return self.failed > len(self.errors)
+
+    def to_dict(self):
+        return {
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.errors_truncated,
+        }
+
+
+def iter_csv_records(text_stream):
+    reader = csv.DictReader(text_stream)
+    for line, row in enumerate(reader, start=2):
+        record = {}
+        for key, value in row.items():
+            field = CSV_FIELD_ALIASES.get((key or '').strip().lower())
+            if field:
+                record[field] = value
+        yield line, record
+
+
+def iter_ndjson_records(text_stream):
+    for line, raw in enumerate(text_stream, start=1):
+        raw = raw.strip()
+        if not raw:
+            continue
+        try:
+            record = json.loads(raw)
+        except ValueError as exc:
+            yield line, exc
+            continue
+        yield line, record if isinstance(record, dict) else ValueError('expected a JSON object')
+
+
+def iter_records(binary_stream, fmt):
+    """Потоково читаем загруженный файл (utf-8, BOM допустим) — файл целиком в память не грузится."""
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"format must be one of {IMPORT_FORMATS}, got {fmt!r}")
+    text_stream = io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        return iter_csv_records(text_stream)
+    return iter_ndjson_records(text_stream)
+
+
+def _validate(line, record, report):
+    """Проверка одной строки; возвращает словарь для INSERT или None (ошибка уже в отчёте)."""
+    if isinstance(record, Exception):
+        report.add_error(line, None, f'Invalid JSON: {record}')
+        return None
+    inventory_number = str(record.get('inventory_number') or '').strip()
+    if not INVENTORY_NUMBER_RE.match(inventory_number):
+        report.add_error(line, inventory_number, 'Invalid inventory number')
+        return None
+    if len(inventory_number) > MAX_NUMBER_LENGTH:
+        report.add_error(line, inventory_number, f'Inventory number is longer than {MAX_NUMBER_LENGTH} characters')
+        return None
+    condition = str(record.get('condition') or 'new').strip()
+    if condition not in ITEM_CONDITIONS:
+        report.add_error(line, inventory_number, f'Unknown condition: {condition}')
+        return None
+    name = str(record.get('name') or '').strip()
+    if len(name) > MAX_NAME_LENGTH:
+        report.add_error(line, inventory_number, f'Name is longer than {MAX_NAME_LENGTH} characters')
+        return None
+    return {
+        'inventory_number': inventory_number,
+        'name': name if name else "Без названия",
+        'condition': condition,
+    }
+
+
+def _flush_batch(batch, upsert, report):
+    """
+    batch: {inventory_number: (line, values)} — дубли внутри пачки уже отсеяны.
+    Уникальность против БД проверяем одним SELECT ... WHERE inventory_number IN (...).
+    """
+    existing = {
+        inventory_number: (item_id, condition)
+        for inventory_number, item_id, condition in
+        db.session.query(InventoryItem.inventory_number, InventoryItem.id, InventoryItem.condition)
+        .filter(InventoryItem.inventory_number.in_(list(batch)))
+        .all()
+    }
+
+    new_rows = []
+    updates = []
+    # {(старое состояние, новое): строк} — счётчики панели одним apply_deltas на пачку
+    transitions = Counter()
+    written = []
+    for inventory_number, (line, values) in batch.items():
+        if inventory_number in existing:
+            if upsert:
+                item_id, old_condition = existing[inventory_number]
+                updates.append({
+                    'id': item_id,
+                    'name': values['name'],
+                    'condition': values['condition'],
+                })
+                transitions[(old_condition, values['condition'])] += 1
+                written.append((line, inventory_number))
+            else:
+                report.add_error(line, inventory_number, 'Inventory number already exists')
+        else:
+            new_rows.append(dict(values, is_available=True))
+            written.append((line, inventory_number))
+
+    try:
+        if new_rows:
+            db.session.execute(insert(InventoryItem), new_rows)
+            record_bulk_insert(InventoryItem, new_rows)
+            publish_items(numbers=[row['inventory_number'] for row in new_rows])
+        if updates:
+            # ORM bulk UPDATE по первичному ключу (executemany) — в обход unit of work,
+            # поэтому счётчики панели и события для индексов в памяти пишем сами
+            db.session.execute(update(InventoryItem), updates)
+            record_bulk_changes(InventoryItem, 'condition', transitions)
+            publish_items(ids=[row['id'] for row in updates])
+        db.session.commit()
+    except (IntegrityError, DataError) as exc:
+        # Номер успели занять параллельно или БД отвергла значение: пачка откатывается целиком,
+        # каждая её строка попадает в отчёт, импорт продолжается со следующей пачки
+        db.session.rollback()
+        message = f'Batch rolled back: {str(exc.orig)[:200]}'
+        for line, inventory_number in written:
+            report.add_error(line, inventory_number, message)
+        return
+    report.inserted += len(new_rows)
+    report.updated += len(updates)
+
+
+def import_inventory(records, upsert=False, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Массовый импорт инвентаря из итератора (line, record).
+    Пачки по batch_size строк фиксируются по отдельности: ошибка в строке не
+    откатывает остальной файл, а попадает в отчёт.
+    upsert=True — существующие номера обновляются (name, condition), иначе это ошибка.
+    """
+    report = ImportReport()
+    batch = {}
+    for line, record in records:
+        values = _validate(line, record, report)
+        if values is None:
+            continue
+        inventory_number = values['inventory_number']
+        if inventory_number in batch:
+            report.add_error(line, inventory_number, 'Duplicate inventory number in file')
+            continue
+        batch[inventory_number] = (line, values)
+        if len(batch) >= batch_size:
+            _flush_batch(batch, upsert, report)
+            batch = {}
+    if batch:
+        _flush_batch(batch, upsert, report)
+    # Ошибки уникальности добавляются при сбросе пачки — возвращаем порядок строк файла
+    report.errors.sort(key=lambda error: error['line'])
+    return report
@@ -11,6 +11,160 @@ DB_NAME = os.environ.get('DB_NAME', 'sports_inventory')
 # Список логинов администраторов
 ADMIN_LOGINS = ["admin"]  # можно добавить других
 
-# SQLAlchemy URI
-SQLALCHEMY_DATABASE_URI = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+# SQLAlchemy URI (DATABASE_URL целиком переопределяет, например sqlite:///bench.db для бенчмарков)
+SQLALCHEMY_DATABASE_URI = os.environ.get(
+    'DATABASE_URL',
+    f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
+)
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Пул соединений. Размер пула должен покрывать число потоков воркера (GUNICORN_THREADS),
+# иначе потоки будут ждать свободное соединение до DB_POOL_TIMEOUT секунд.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+# Меньше wait_timeout MySQL, чтобы не получать «MySQL server has gone away»
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+DB_CONNECT_TIMEOUT = int(os.environ.get('DB_CONNECT_TIMEOUT', 10))
+DB_READ_TIMEOUT = int(os.environ.get('DB_READ_TIMEOUT', 30))
+DB_WRITE_TIMEOUT = int(os.environ.get('DB_WRITE_TIMEOUT', 30))
+
+
+def build_engine_options(uri):
+    """Параметры create_engine для SQLALCHEMY_ENGINE_OPTIONS (у SQLite свой пул — не трогаем)."""
+    if uri.startswith('sqlite'):
+        return {}
+    return {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+        'connect_args': {
+            'connect_timeout': DB_CONNECT_TIMEOUT,
+            'read_timeout': DB_READ_TIMEOUT,
+            'write_timeout': DB_WRITE_TIMEOUT,
+        },
+    }
+
+
+SQLALCHEMY_ENGINE_OPTIONS = build_engine_options(SQLALCHEMY_DATABASE_URI)
+
+# Реплики только для чтения (db_routing.py), через запятую: mysql+pymysql://...@replica1/db,...
+# Пусто — всё читается с основной БД
+DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+SQLALCHEMY_BINDS = {
+    f'replica_{i}': {'url': url, **build_engine_options(url)}
+    for i, url in enumerate(DATABASE_REPLICA_URLS)
+}
+# Как часто проверять реплики (сек), допустимое отставание MySQL-реплики (сек) и сколько секунд
+# после записи сессия пользователя читает только с основной БД
+REPLICA_HEALTH_INTERVAL = float(os.environ.get('REPLICA_HEALTH_INTERVAL', 5.0))
+REPLICA_MAX_LAG = int(os.environ.get('REPLICA_MAX_LAG', 30))
+REPLICA_STICKY_SECONDS = float(os.environ.get('REPLICA_STICKY_SECONDS', 5.0))
+
+# Сколько обратных прокси стоит перед приложением (nginx.conf в docker-compose.yml — 1): IP клиента
+# для ограничения неудачных входов берётся из X-Forwarded-For. 0 — запросы приходят напрямую
+PROXY_HOPS = int(os.environ.get('PROXY_HOPS', 0))
+
+# Режим отладки для `python app.py` (в продакшене приложение запускает gunicorn, см. gunicorn.conf.py)
+DEBUG = os.environ.get('FLASK_DEBUG', '0') == '1'
+
+# Контроль числа SQL-запросов на HTTP-запрос (ловим N+1): off / warn / raise
+QUERY_BUDGET_MODE = os.environ.get('QUERY_BUDGET_MODE', 'off')
+
+# TTL (сек) процессного кэша текущего пользователя; 0 — кэш выключен,
+# пользователь грузится по id один раз за запрос
+CURRENT_USER_CACHE_TTL = float(os.environ.get('CURRENT_USER_CACHE_TTL', 0))
+# Не чаще раза в столько секунд кэш сверяет версию таблицы users (stats.py): смена роли или
+# удаление пользователя в другом воркере сбрасывает кэш не позже чем через этот интервал, а не через TTL
+CURRENT_USER_CACHE_VERSION_INTERVAL = float(os.environ.get('CURRENT_USER_CACHE_VERSION_INTERVAL', 1.0))
+
+# Журнал действий (ActionLog):
+# async — фоновая пакетная запись; strict — в одной транзакции с самим действием
+AUDIT_LOG_MODE = os.environ.get('AUDIT_LOG_MODE', 'async')
+AUDIT_LOG_QUEUE_SIZE = int(os.environ.get('AUDIT_LOG_QUEUE_SIZE', 10000))
+AUDIT_LOG_BATCH_SIZE = int(os.environ.get('AUDIT_LOG_BATCH_SIZE', 500))
+AUDIT_LOG_FLUSH_INTERVAL = float(os.environ.get('AUDIT_LOG_FLUSH_INTERVAL', 1.0))
+
+# Поиск по инвентарю (search_index.py): индекс в памяти процесса; 0 — только запросы LIKE к БД.
+# Раз в SEARCH_INDEX_REFRESH_INTERVAL секунд индекс сверяет версию таблицы и применяет новые события change_events
+SEARCH_INDEX_ENABLED = os.environ.get('SEARCH_INDEX_ENABLED', '1') == '1'
+SEARCH_INDEX_REFRESH_INTERVAL = float(os.environ.get('SEARCH_INDEX_REFRESH_INTERVAL', 5.0))
+
+# Индекс доступности (availability_index.py): кто держит предмет и что на руках у пользователя — из памяти.
+# Раз в AVAILABILITY_INDEX_REFRESH_INTERVAL секунд сверяет версию таблицы и применяет изменения других воркеров (item_sync.py)
+AVAILABILITY_INDEX_ENABLED = os.environ.get('AVAILABILITY_INDEX_ENABLED', '1') == '1'
+AVAILABILITY_INDEX_REFRESH_INTERVAL = float(os.environ.get('AVAILABILITY_INDEX_REFRESH_INTERVAL', 2.0))
+
+# Журнал действий: сколько дней хранить в БД (0 — бессрочно) и куда складывать архивы
+ACTION_LOG_RETENTION_DAYS = int(os.environ.get('ACTION_LOG_RETENTION_DAYS', 180))
+ACTION_LOG_ARCHIVE_DIR = os.environ.get('ACTION_LOG_ARCHIVE_DIR', 'archive')
+# Строк в одной транзакции DELETE: меньше — короче блокировки, больше — быстрее архивирование
+ACTION_LOG_DELETE_BATCH = int(os.environ.get('ACTION_LOG_DELETE_BATCH', 1000))
+
+# HTTP-кэш (http_cache.py): ETag / 304 для страниц только для чтения и кэш отрендеренных таблиц.
+# Размер кэша фрагментов — на процесс: не больше N записей и M символов HTML
+HTTP_CACHE_ENABLED = os.environ.get('HTTP_CACHE_ENABLED', '1') == '1'
+FRAGMENT_CACHE_MAX_ENTRIES = int(os.environ.get('FRAGMENT_CACHE_MAX_ENTRIES', 1024))
+FRAGMENT_CACHE_MAX_BYTES = int(os.environ.get('FRAGMENT_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+# Счётчики панели и версии таблиц (stats.py): сколько строк-слотов у каждого счётчика.
+# Больше — реже параллельные записи ждут друг друга на строке счётчика, чтение суммирует слоты
+STATS_COUNTER_SLOTS = int(os.environ.get('STATS_COUNTER_SLOTS', 8))
+
+# Отчёты (reports.py): фоновая задача jobs.py догоняет сводные таблицы раз в N секунд
+REPORTS_REFRESH_INTERVAL = int(os.environ.get('REPORTS_REFRESH_INTERVAL', 300))
+
+# Фоновые задачи (jobs.py): есть ли в процессе исполнитель (0 — нет, задачи выполнят другие воркеры),
+# как часто он проверяет очередь (сек), через сколько секунд без отчёта о прогрессе задача
+# считается прерванной, куда складывать файлы выгрузок
+JOBS_ENABLED = os.environ.get('JOBS_ENABLED', '1') == '1'
+JOBS_POLL_INTERVAL = float(os.environ.get('JOBS_POLL_INTERVAL', 2.0))
+JOBS_STALE_AFTER = int(os.environ.get('JOBS_STALE_AFTER', 600))
+JOBS_EXPORT_DIR = os.environ.get('JOBS_EXPORT_DIR', 'exports')
+
+# Метрики запросов (metrics.py): /metrics в формате Prometheus. METRICS_TOKEN — токен для сборщика
+# (Authorization: Bearer ...), без него /metrics доступен только администратору.
+# METRICS_DIR — общий каталог, через который складываются метрики всех воркеров gunicorn
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5.0))
+# Запросы дольше N мс пишутся в лог вместе с самыми медленными SQL; 0 — выключено
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 0))
+
+# Пароли (passwords.py): параметры хеша в формате Werkzeug; хеши со старыми параметрами
+# пересчитываются при входе. PASSWORD_HASH_WORKERS > 0 — проверка в пуле процессов воркера;
+# PASSWORD_HASH_CONCURRENCY — сколько хеширований одновременно на воркер (по умолчанию = WORKERS),
+# остальные ждут PASSWORD_HASH_WAIT секунд и получают 503
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_CONCURRENCY = int(os.environ.get('PASSWORD_HASH_CONCURRENCY', 0))
+PASSWORD_HASH_WAIT = float(os.environ.get('PASSWORD_HASH_WAIT', 5.0))
+
+# Ограничение неудачных входов (rate_limit.py): не больше N неудач за окно по логину и по IP; 0 — без ограничения
+LOGIN_FAILURE_WINDOW = int(os.environ.get('LOGIN_FAILURE_WINDOW', 300))
+LOGIN_MAX_FAILURES_PER_USER = int(os.environ.get('LOGIN_MAX_FAILURES_PER_USER', 5))
+LOGIN_MAX_FAILURES_PER_IP = int(os.environ.get('LOGIN_MAX_FAILURES_PER_IP', 20))
+
+# JSON API (api.py, /api/v1): ответы больше N байт сжимаются brotli (если установлен пакет brotli) или gzip
+API_COMPRESS_MIN_BYTES = int(os.environ.get('API_COMPRESS_MIN_BYTES', 1024))
+
+# Живые обновления (events.py, GET /events): как часто воркер читает новые события (сек), сколько их хранить (сек),
+# сколько открытых соединений держит процесс (у gthread каждое занимает поток — gunicorn.conf.py добавляет
+# их сверх GUNICORN_THREADS; 0 — без ограничения, тогда соединения делят потоки с обычными запросами;
+# сервер gunicorn_events.conf.py на gevent задаёт свой предел — почти worker_connections),
+# через сколько секунд переподключаться клиентам сверх предела, период пинга и максимальная длина соединения
+EVENTS_POLL_INTERVAL = float(os.environ.get('EVENTS_POLL_INTERVAL', 1.0))
+EVENTS_RETENTION = int(os.environ.get('EVENTS_RETENTION', 3600))
+EVENTS_MAX_STREAMS = int(os.environ.get('EVENTS_MAX_STREAMS', 16))
+EVENTS_FALLBACK_RETRY = int(os.environ.get('EVENTS_FALLBACK_RETRY', 15))
+EVENTS_HEARTBEAT = int(os.environ.get('EVENTS_HEARTBEAT', 15))
+EVENTS_STREAM_TIMEOUT = int(os.environ.get('EVENTS_STREAM_TIMEOUT', 300))
+
+# Прогрев воркера после старта в фоне (warmup.py, хук post_worker_init в gunicorn.conf.py): соединения пула,
+# пул хеширования паролей, индексы поиска и доступности. WARMUP_DB_CONNECTIONS — сколько соединений открыть заранее
+WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', '1') == '1'
+WARMUP_DB_CONNECTIONS = int(os.environ.get('WARMUP_DB_CONNECTIONS', min(DB_POOL_SIZE, 4)))
@@ -0,0 +1,207 @@
+"""
+Маршрутизация чтения на реплики БД.
+
+Реплики задаются DATABASE_REPLICA_URLS и регистрируются как binds 'replica_0', 'replica_1', ...
+Читать с реплики разрешено только маршрутам с @read_replica и только простым SELECT:
+- INSERT / UPDATE / DELETE, flush, SELECT ... FOR UPDATE и text() идут на основную БД;
+- после первой записи в запросе все последующие чтения этого запроса — с основной
+  (read-after-write), а сессия пользователя ещё REPLICA_STICKY_SECONDS секунд читает
+  с основной: редирект после POST показывает только что сохранённое, несмотря на отставание реплики;
+- фоновые потоки (журнал, индекс поиска, задачи) работают без контекста запроса — всегда основная.
+Фоновый поток раз в REPLICA_HEALTH_INTERVAL секунд проверяет реплики (SELECT 1, у MySQL —
+ещё и отставание репликации); недоступная или отставшая дольше REPLICA_MAX_LAG реплика
+выводится из ротации, пока проверка снова не пройдёт. Нет здоровых реплик — читаем с основной.
+"""
+import itertools
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+
+REPLICA_BIND_PREFIX = 'replica_'
+STICKY_SESSION_KEY = '_primary_until'
+
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+def read_replica(view=None, methods=READ_METHODS):
+    """
+    Декоратор маршрута: его SELECT-запросы можно отправлять на реплику.
+    Ставится под @app.route (как query_budget) — атрибут читает before_request из init_db_routing.
+    Только для методов methods (по умолчанию GET / HEAD): POST того же маршрута, который
+    что-то меняет, читает с основной. Для POST, который только читает (поиск по списку
+    номеров), — @read_replica(methods=('POST',)).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            return view(*args, **kwargs)
+        wrapper.read_replica = frozenset(methods)
+        return wrapper
+    return decorator(view) if view is not None else decorator
+
+
+def _mark_write():
+    if has_request_context():
+        g.db_wrote = True
+        g.db_primary = True
+
+
+def _is_plain_select(clause):
+    return (
+        clause is not None
+        and getattr(clause, 'is_select', False)
+        and getattr(clause, '_for_update_arg', None) is None
+    )
+
+
+class RoutingSession(Session):
+    """db.session: SELECT маршрутов @read_replica — на здоровую реплику, остальное как обычно."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or getattr(clause, 'is_dml', False):
+                _mark_write()
+            elif _is_plain_select(clause) and replica_router.reads_allowed():
+                engine = replica_router.choose()
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter:
+    def __init__(self, health_interval=5.0, max_lag=30, sticky_seconds=5.0):
+        self.health_interval = health_interval
+        self.max_lag = max_lag
+        self.sticky_seconds = sticky_seconds
+        self._app = None
+        self.bind_keys = []
+        self._healthy = {}
+        self._round_robin = itertools.count()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.bind_keys)
+
+    def init_app(self, app):
+        self._app = app
+        self.health_interval = app.config.get('REPLICA_HEALTH_INTERVAL', self.health_interval)
+        self.max_lag = app.config.get('REPLICA_MAX_LAG', self.max_lag)
+        self.sticky_seconds = app.config.get('REPLICA_STICKY_SECONDS', self.sticky_seconds)
+        self.bind_keys = sorted(key for key in app.config.get('SQLALCHEMY_BINDS') or {}
+                            if key and key.startswith(REPLICA_BIND_PREFIX))
+        # До первой проверки реплики считаем здоровыми
+        self._healthy = {key: True for key in self.bind_keys}
+
+    def reads_allowed(self):
+        return (
+            self.enabled
+            and has_request_context()
+            and g.get('db_read_replica', False)
+            and not g.get('db_primary', False)
+        )
+
+    def choose(self):
+        self._ensure_started()
+        healthy = [key for key in self.bind_keys if self._healthy.get(key)]
+        if not healthy:
+            return None
+        key = healthy[next(self._round_robin) % len(healthy)]
+        return current_app.extensions['sqlalchemy'].engines[key]
+
+    def healthy_count(self):
+        return sum(1 for key in self.bind_keys if self._healthy.get(key))
+
+    def mark_unhealthy(self, key):
+        if self._healthy.get(key):
+            self._healthy[key] = False
+            if self._app is not None:
+                self._app.logger.warning('Replica %s marked unhealthy', key)
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='replica-health', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.health_interval)
+            with self._app.app_context():
+                engines = self._app.extensions['sqlalchemy'].engines
+                for key in self.bind_keys:
+                    healthy = self.check(engines[key])
+                    if healthy != self._healthy.get(key):
+                        self._app.logger.warning('Replica %s is %s', key, 'healthy' if healthy else 'unhealthy')
+                    self._healthy[key] = healthy
+
+    def check(self, engine):
+        """SELECT 1 и (MySQL) отставание репликации не больше max_lag секунд."""
+        try:
+            with engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+                if engine.dialect.name != 'mysql':
+                    return True
+                lag = _mysql_replication_lag(connection)
+        except Exception:
+            return False
+        return lag is None or (lag is not False and lag <= self.max_lag)
+
+
+def _mysql_replication_lag(connection):
+    """
+    Отставание в секундах; None — узнать нельзя (нет прав REPLICATION CLIENT или это не реплика),
+    False — репликация остановлена.
+    """
+    for statement, column in (('SHOW REPLICA STATUS', 'Seconds_Behind_Source'),
+                              ('SHOW SLAVE STATUS', 'Seconds_Behind_Master')):
+        try:
+            row = connection.execute(text(statement)).mappings().first()
+        except Exception:
+            continue
+        if row is None:
+            return None
+        lag = row.get(column)
+        return False if lag is None else lag
+    return None
+
+
+replica_router = ReplicaRouter()
+
+
+def init_db_routing(app, db):
+    replica_router.init_app(app)
+    if not replica_router.enabled:
+        return
+
+    with app.app_context():
+        for key in replica_router.bind_keys:
+            def on_error(context, key=key):
+                if context.is_disconnect:
+                    replica_router.mark_unhealthy(key)
+            event.listen(db.engines[key], 'handle_error', on_error)
+
+    @app.before_request
+    def choose_database():
+        view = app.view_functions.get(request.endpoint)
+        g.db_read_replica = request.method in getattr(view, 'read_replica', ())
+        if session.get(STICKY_SESSION_KEY, 0) > time.time():
+            g.db_primary = True
+
+    @app.after_request
+    def remember_write(response):
+        if g.get('db_wrote') and replica_router.sticky_seconds > 0:
+            session[STICKY_SESSION_KEY] = time.time() + replica_router.sticky_seconds
+        return response
@@ -0,0 +1,369 @@
+"""
+Живые обновления страниц через server-sent events (GET /events).
+
+- publish() пишет событие в таблицу change_events в транзакции самого изменения:
+  откат изменения откатывает и событие, а событие видят все процессы gunicorn.
+- EventBus — шина в памяти процесса: один поток-диспетчер на процесс раз в
+  EVENTS_POLL_INTERVAL секунд (или сразу после commit с событием в этом же процессе)
+  читает новые строки по PK и раскладывает их по очередям подписчиков. Сколько бы
+  ни было открытых соединений, к БД идёт один короткий запрос на процесс, а не на клиента.
+- События 'item' пишет item_sync.py при каждом изменении предмета через ORM.
+- Подписчик видит все события 'item', а 'request' — только свои (администратор — все).
+  События 'items' (изменения предметов в обход ORM) нужны только индексам в памяти
+  (item_sync.py) и в поток не попадают.
+- Клиент, переподключаясь, присылает Last-Event-ID: пропущенное досылается из таблицы.
+- В продакшене /events обслуживает отдельный сервер gunicorn_events.conf.py на воркерах gevent:
+  простаивающее соединение — гринлет, ждущий очередь подписчика, а не поток ОС, и процесс держит
+  тысячи вкладок. Код потока от этого не меняется: gevent подменяет threading и queue.
+- Если /events попал на воркер gthread (без отдельного сервера), соединение занимает поток, поэтому
+  их на процесс не больше EVENTS_MAX_STREAMS (gunicorn.conf.py заводит для них отдельные потоки).
+  Сверх предела клиент получает пропущенное и переподключается через EVENTS_FALLBACK_RETRY секунд
+  (дешёвый опрос по PK вместо перезагрузки страницы).
+"""
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, event, func, or_, select
+from sqlalchemy.orm import Session
+
+from models import db, ChangeEvent
+
+EVENT_TOPICS = ('request', 'item', 'items')
+# Что уходит в GET /events; 'items' — списки id / номеров для индексов в памяти (item_sync.py)
+STREAM_TOPICS = ('request', 'item')
+# Сколько событий может ждать отправки одному клиенту; переполнение -> клиент перезагружает страницу
+EVENTS_QUEUE_SIZE = 100
+# Сколько пропущенных событий досылать при переподключении; больше — быстрее перезагрузить страницу
+EVENTS_REPLAY_LIMIT = 500
+EVENTS_BATCH_SIZE = 500
+# Пропуск в id (транзакция с меньшим id ещё не зафиксирована) ждём столько секунд
+EVENTS_GAP_TIMEOUT = 10
+# Чистка старых событий (периодическая задача jobs.py): строк в одной транзакции DELETE
+EVENTS_PRUNE_BATCH = 1000
+
+_OVERFLOW = object()
+
+
+def request_payload(user_req):
+    return {
+        'id': user_req.id,
+        'user_id': user_req.user_id,
+        'request_type': user_req.request_type,
+        'inventory_number': user_req.inventory_number,
+        'status': user_req.status,
+        'created_at': user_req.created_at,
+        'processed_at': user_req.processed_at,
+    }
+
+
+def item_payload(item):
+    return {
+        'id': item.id,
+        'inventory_number': item.inventory_number,
+        'name': item.name,
+        'condition': item.condition,
+        'is_available': item.is_available,
+        'assigned_to': item.assigned_to,
+    }
+
+
+def event_values(topic, payload, user_id=None):
+    """Значения строки change_events — для db.session.add и для INSERT из слушателей flush."""
+    if topic not in EVENT_TOPICS:
+        raise ValueError(f"topic must be one of {EVENT_TOPICS}, got {topic!r}")
+    return {'topic': topic, 'user_id': user_id,
+            'payload': json.dumps(payload, ensure_ascii=False, default=str)}
+
+
+def publish(topic, payload, user_id=None):
+    """Добавить событие в текущую транзакцию db.session; подписчики получат его после commit."""
+    db.session.add(ChangeEvent(**event_values(topic, payload, user_id)))
+    db.session().info['change_events_published'] = True
+
+
+def publish_request(user_req):
+    if user_req.id is None or user_req.created_at is None:
+        # Новой заявке id и created_at назначает INSERT
+        db.session.flush()
+    publish('request', request_payload(user_req), user_id=user_req.user_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_event_bus(session):
+    if session.info.pop('change_events_published', False):
+        event_bus.wake()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_event_wakeup(session):
+    session.info.pop('change_events_published', None)
+
+
+def latest_event_id():
+    """Последний id событий: страница отдаёт его в /events?after=..., чтобы не пропустить изменения после рендера."""
+    return db.session.query(func.max(ChangeEvent.id)).scalar() or 0
+
+
+def visible_to(query, user_id, admin):
+    query = query.where(ChangeEvent.topic.in_(STREAM_TOPICS))
+    if admin:
+        return query
+    return query.where(or_(ChangeEvent.topic == 'item', ChangeEvent.user_id == user_id))
+
+
+def format_event(event_id, topic, payload):
+    return f'id: {event_id}\nevent: {topic}\ndata: {payload}\n\n'
+
+
+class Subscriber:
+    def __init__(self, user_id, admin):
+        self.user_id = user_id
+        self.admin = admin
+        self.queue = queue.Queue(maxsize=EVENTS_QUEUE_SIZE)
+
+    def wants(self, topic, user_id):
+        if topic == 'request':
+            return self.admin or user_id == self.user_id
+        return topic == 'item'
+
+    def offer(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            # Клиент не успевает читать — сбрасываем очередь и просим перезагрузить страницу
+            with self.queue.mutex:
+                self.queue.queue.clear()
+            self.queue.put_nowait(_OVERFLOW)
+
+
+class EventReader:
+    """
+    Чтение change_events по PK с позиции last_id. Пропуск в id — транзакция с меньшим id
+    ещё не зафиксирована: такие id перечитываются, пока не появятся (или EVENTS_GAP_TIMEOUT).
+    topics — чьи payload нужны; строки остальных тем тоже сдвигают позицию, но без payload.
+    Общая часть EventBus и индексов в памяти (item_sync.py).
+    """
+
+    def __init__(self, topics):
+        self.topics = topics
+        self.last_id = None
+        self.gaps = {}
+
+    def start(self, position, gaps=()):
+        now = time.monotonic()
+        self.last_id = position
+        self.gaps = {event_id: now for event_id in gaps}
+
+    def read(self, session, limit=EVENTS_BATCH_SIZE):
+        """Следующие строки (id, topic, user_id, payload) по возрастанию id, не больше limit."""
+        now = time.monotonic()
+        self.gaps = {event_id: seen for event_id, seen in self.gaps.items() if now - seen < EVENTS_GAP_TIMEOUT}
+        condition = ChangeEvent.id > self.last_id
+        if self.gaps:
+            condition = or_(condition, ChangeEvent.id.in_(self.gaps))
+        payload = case((ChangeEvent.topic.in_(self.topics), ChangeEvent.payload), else_=None).label('payload')
+        rows = session.execute(
+            select(ChangeEvent.id, ChangeEvent.topic, ChangeEvent.user_id, payload)
+            .where(condition).order_by(ChangeEvent.id).limit(limit)
+        ).all()
+        for row in rows:
+            if row.id > self.last_id:
+                # Пропущенные id — незафиксированные пока транзакции: перечитаем их позже
+                if row.id - self.last_id <= EVENTS_BATCH_SIZE:
+                    for missing in range(self.last_id + 1, row.id):
+                        self.gaps[missing] = now
+                self.last_id = row.id
+            else:
+                self.gaps.pop(row.id, None)
+        return rows
+
+
+def event_position(session):
+    """
+    (последний id, id незафиксированных пока событий перед ним) — позиция для EventReader.start
+    перед чтением таблицы целиком: изменений этих транзакций в прочитанном ещё не будет.
+    """
+    last_id = session.execute(select(func.max(ChangeEvent.id))).scalar() or 0
+    low = max(0, last_id - EVENTS_BATCH_SIZE)
+    present = set(session.execute(
+        select(ChangeEvent.id).where(ChangeEvent.id > low, ChangeEvent.id <= last_id)
+    ).scalars())
+    return last_id, [event_id for event_id in range(low + 1, last_id) if event_id not in present]
+
+
+def events_pruned_after(session, position):
+    """Могли ли события после position уже удалить чисткой (prune_events)."""
+    first_id = session.execute(select(func.min(ChangeEvent.id))).scalar()
+    return first_id is None or first_id > position + 1
+
+
+class EventBus:
+    """
+    Раздача событий подписчикам процесса. Поток-диспетчер стартует с первой подпиской
+    (как JobRunner — лениво); пока подписчиков нет, к БД не обращается.
+    """
+
+    def __init__(self, poll_interval=1.0, max_streams=16):
+        self.poll_interval = poll_interval
+        self.max_streams = max_streams
+        self._app = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._reader = EventReader(STREAM_TOPICS)
+
+    def init_app(self, app):
+        self._app = app
+        self.poll_interval = app.config.get('EVENTS_POLL_INTERVAL', self.poll_interval)
+        self.max_streams = app.config.get('EVENTS_MAX_STREAMS', self.max_streams)
+
+    def ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._subscribers = set()
+            self._wakeup = threading.Event()
+            self._reader = EventReader(STREAM_TOPICS)
+            self._thread = threading.Thread(target=self._run, name='event-bus', daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        if self._subscribers:
+            self._wakeup.set()
+
+    def subscribe(self, user_id, admin, position):
+        """
+        Новый подписчик или None, если в процессе уже max_streams открытых соединений.
+        position — latest_event_id() на момент подписки: простаивавший диспетчер начнёт с него.
+        """
+        self.ensure_started()
+        with self._lock:
+            if self.max_streams and len(self._subscribers) >= self.max_streams:
+                return None
+            subscriber = Subscriber(user_id, admin)
+            self._subscribers.add(subscriber)
+            if self._reader.last_id is None:
+                self._reader.start(position)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def stats(self):
+        return {'subscribers': len(self._subscribers), 'last_id': self._reader.last_id or 0}
+
+    def _run(self):
+        while True:
+            try:
+                with self._lock:
+                    idle = not self._subscribers
+                    if idle:
+                        # Без подписчиков не читаем; следующий подписчик задаст позицию сам
+                        self._reader.last_id = None
+                if not idle:
+                    with self._app.app_context():
+                        self._dispatch()
+            except Exception:
+                self._app.logger.exception('Event bus iteration failed')
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _dispatch(self):
+        rows = self._reader.read(db.session)
+        db.session.rollback()
+        for row in rows:
+            with self._lock:
+                subscribers = list(self._subscribers)
+            for subscriber in subscribers:
+                if subscriber.wants(row.topic, row.user_id):
+                    subscriber.offer((row.id, row.topic, row.payload))
+
+event_bus = EventBus()
+
+
+def init_events(app):
+    event_bus.init_app(app)
+
+
+def prune_events(retention, batch_size=EVENTS_PRUNE_BATCH):
+    """
+    Удалить события старше retention секунд пачками по batch_size: id старых строк —
+    по индексу created_at, каждая пачка — своя короткая транзакция (не держим блокировки
+    на всю таблицу). Возвращает число удалённых строк.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=retention)
+    deleted = 0
+    while True:
+        with db.engine.begin() as connection:
+            ids = connection.execute(
+                select(ChangeEvent.id).where(ChangeEvent.created_at < cutoff)
+                .order_by(ChangeEvent.created_at).limit(batch_size)
+            ).scalars().all()
+            if ids:
+                connection.execute(ChangeEvent.__table__.delete().where(ChangeEvent.id.in_(ids)))
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            return deleted
+
+
+def missed_events(after, user_id, admin):
+    """События после after (Last-Event-ID), видимые пользователю. None — пропущено слишком много."""
+    rows = db.session.execute(
+        visible_to(select(ChangeEvent.id, ChangeEvent.topic, ChangeEvent.payload), user_id, admin)
+        .where(ChangeEvent.id > after).order_by(ChangeEvent.id).limit(EVENTS_REPLAY_LIMIT + 1)
+    ).all()
+    if len(rows) > EVENTS_REPLAY_LIMIT:
+        return None
+    return [(row.id, row.topic, row.payload) for row in rows]
+
+
+def event_stream(subscriber, position, backlog, retry_ms, heartbeat, timeout):
+    """
+    Тело ответа text/event-stream. Не использует контекст запроса и db.session:
+    соединение с БД возвращается в пул до начала потока.
+    subscriber=None — без подписки: досылаем пропущенное и просим переподключиться через retry_ms.
+    """
+    try:
+        yield f'retry: {retry_ms}\n\n'
+        if backlog is None:
+            yield 'event: reset\ndata: {}\n\n'
+            return
+        sent = set()
+        for event_id, topic, payload in backlog:
+            sent.add(event_id)
+            yield format_event(event_id, topic, payload)
+        # Пустое событие с id только сдвигает Last-Event-ID клиента: переподключение продолжит отсюда
+        yield f'id: {max([position, *sent])}\n\n'
+        if subscriber is None:
+            return
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # Клиент переподключится с Last-Event-ID; поток воркера не занят навсегда
+                return
+            try:
+                item = subscriber.queue.get(timeout=min(heartbeat, remaining))
+            except queue.Empty:
+                # Комментарий держит соединение через прокси и обнаруживает ушедших клиентов
+                yield ': ping\n\n'
+                continue
+            if item is _OVERFLOW:
+                yield 'event: reset\ndata: {}\n\n'
+                return
+            if item[0] not in sent:
+                yield format_event(*item)
+    finally:
+        if subscriber is not None:
+            event_bus.unsubscribe(subscriber)
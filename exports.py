@@ -0,0 +1,118 @@
+import csv
+import io
+import json
+
+from models import db, InventoryItem
+
+# Сколько строк за один запрос к БД. Память процесса ограничена одним чанком,
+# независимо от размера таблицы.
+EXPORT_CHUNK_SIZE = 1000
+
+INVENTORY_EXPORT_COLUMNS = (
+    InventoryItem.id,
+    InventoryItem.inventory_number,
+    InventoryItem.name,
+    InventoryItem.condition,
+    InventoryItem.is_available,
+    InventoryItem.assigned_to,
+)
+
+
+def iter_chunks(columns, key_column, chunk_size=EXPORT_CHUNK_SIZE, query=None):
+    """
+    Постраничный обход таблицы по возрастанию key_column (keyset, без OFFSET).
+    Отдаём списки кортежей (не ORM-объекты): без identity map и лишних аллокаций.
+    Каждый чанк — отдельный короткий SELECT, поэтому долгий экспорт не держит
+    открытый курсор/снимок на сервере БД.
+    """
+    if query is None:
+        query = db.session.query(*columns)
+    key_name = key_column.key
+    last_key = None
+    while True:
+        chunk_query = query
+        if last_key is not None:
+            chunk_query = chunk_query.filter(key_column > last_key)
+        rows = chunk_query.order_by(key_column).limit(chunk_size).all()
+        if not rows:
+            return
+        yield rows
+        last_key = getattr(rows[-1], key_name)
+        if len(rows) < chunk_size:
+            return
+
+
+def inventory_row_to_dict(row):
+    return {
+        'id': row.id,
+        'inventory_number': row.inventory_number,
+        'name': row.name,
+        'condition': row.condition,
+        'is_available': row.is_available,
+        'assigned_to': row.assigned_to
+    }
+
+
+def generate_inventory_csv(chunk_size=EXPORT_CHUNK_SIZE, progress=None):
+    """
+    CSV частями: BOM (как раньше давал utf-8-sig, чтобы Excel понял кодировку),
+    заголовок, затем по одному куску текста на чанк строк.
+    progress(rows) — сколько строк отдано вместе со следующим куском (у заголовка его нет).
+    """
+    rows_done = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=',')
+
+    def flush():
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return data.encode('utf-8')
+
+    writer.writerow(['ID', 'InventoryNumber', 'Name', 'Condition', 'is_available', 'assigned_to'])
+    yield '\ufeff'.encode('utf-8') + flush()
+
+    for rows in iter_chunks(INVENTORY_EXPORT_COLUMNS, InventoryItem.id, chunk_size):
+        for row in rows:
+            writer.writerow([
+                row.id,
+                row.inventory_number,
+                row.name,
+                row.condition,
+                'Да' if row.is_available else 'Нет',
+                row.assigned_to if row.assigned_to else ''
+            ])
+        rows_done += len(rows)
+        if progress is not None:
+            progress(rows_done)
+        yield flush()
+
+
+def generate_inventory_json(chunk_size=EXPORT_CHUNK_SIZE, progress=None):
+    """JSON-массив частями; формат совпадает с прежним json.dumps(..., indent=2). progress — как у CSV."""
+    first = True
+    rows_done = 0
+    yield b'['
+    for rows in iter_chunks(INVENTORY_EXPORT_COLUMNS, InventoryItem.id, chunk_size):
+        parts = []
+        for row in rows:
+            item = json.dumps(inventory_row_to_dict(row), ensure_ascii=False, indent=2)
+            parts.append(('\n  ' if first else ',\n  ') + item.replace('\n', '\n  '))
+            first = False
+        rows_done += len(rows)
+        if progress is not None:
+            progress(rows_done)
+        yield ''.join(parts).encode('utf-8')
+    yield b']' if first else b'\n]'
+
+
+def generate_inventory_ndjson(chunk_size=EXPORT_CHUNK_SIZE, progress=None):
+    """NDJSON: один JSON-объект на строку — удобно для потоковой загрузки в другие системы. progress — как у CSV."""
+    rows_done = 0
+    for rows in iter_chunks(INVENTORY_EXPORT_COLUMNS, InventoryItem.id, chunk_size):
+        rows_done += len(rows)
+        if progress is not None:
+            progress(rows_done)
+        yield ''.join(
+            json.dumps(inventory_row_to_dict(row), ensure_ascii=False) + '\n' for row in rows
+        ).encode('utf-8')
@@ -0,0 +1,42 @@
+import multiprocessing
+import os
+
+# Профиль продакшен-запуска: несколько процессов (обход GIL) x несколько потоков
+# (ожидание БД не блокирует воркер). Всё переопределяется переменными окружения.
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8080')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+# В продакшене /events обслуживает сервер gevent (gunicorn_events.conf.py) за прокси (nginx.conf).
+# Если /events всё же пришёл сюда, соединение занимает поток gthread на всё время жизни: до
+# EVENTS_MAX_STREAMS таких потоков добавляем сверх GUNICORN_THREADS, чтобы живые обновления
+# не отнимали потоки у обычных запросов (поток потока событий соединения с БД не держит)
+threads += int(os.environ.get('EVENTS_MAX_STREAMS', 16))
+worker_class = 'gthread'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# Импорт приложения один раз в мастере: воркеры получают загруженные модули через fork (copy-on-write) —
+# быстрее старт и меньше памяти на воркер. Код при HUP тогда не перечитывается — только полный рестарт
+preload_app = os.environ.get('GUNICORN_PRELOAD', '0') == '1'
+# Перезапуск воркеров после N запросов — страховка от утечек памяти
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 1000))
+# Пустое значение выключает access-лог
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-') or None
+errorlog = '-'
+
+
+def on_starting(server):
+    # Снимки метрик прошлого запуска (metrics.py) не должны попасть в суммы нового
+    metrics_dir = os.environ.get('METRICS_DIR')
+    if metrics_dir and os.path.isdir(metrics_dir):
+        for name in os.listdir(metrics_dir):
+            if name.startswith('metrics_') and name.endswith('.json'):
+                os.remove(os.path.join(metrics_dir, name))
+
+
+def post_worker_init(worker):
+    # Соединения пула, пул хеширования и индексы прогреваются фоном (warmup.py): воркер уже принимает запросы
+    from app import app
+    from warmup import start_warm_up
+    start_warm_up(app)
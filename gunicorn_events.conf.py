@@ -0,0 +1,25 @@
+import os
+
+# Отдельный сервер для GET /events (events.py): тот же wsgi:app, но воркер gevent. Открытое
+# соединение — гринлет в ожидании очереди, а не поток ОС: процесс держит тысячи простаивающих
+# вкладок. Обычные страницы остаются на gthread (gunicorn.conf.py), /events на этот сервер
+# направляет обратный прокси (nginx.conf):
+#     gunicorn -c gunicorn_events.conf.py wsgi:app
+bind = os.environ.get('EVENTS_BIND', '0.0.0.0:8081')
+workers = int(os.environ.get('EVENTS_WORKERS', 2))
+worker_class = 'gevent'
+worker_connections = int(os.environ.get('EVENTS_WORKER_CONNECTIONS', 5000))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# Приложение импортируется в воркере — после того как gevent подменил threading, socket и queue
+preload_app = False
+raw_env = [
+    # Подписчиков на процесс — почти до worker_connections: запас остаётся под короткие ответы
+    # сверх предела (пропущенное + retry) и под переподключения
+    f'EVENTS_MAX_STREAMS={max(worker_connections - 100, 1)}',
+    # Фоновые задачи и прогрев индексов — дело воркеров gthread: здесь они заняли бы цикл событий
+    'JOBS_ENABLED=0',
+]
+accesslog = os.environ.get('GUNICORN_ACCESSLOG', '-') or None
+errorlog = '-'
@@ -0,0 +1,155 @@
+"""
+HTTP-кэширование страниц «только для чтения».
+
+Версии таблиц — счётчики '<префикс>.version' из stats.py; их увеличивает каждый
+INSERT / UPDATE / DELETE через ORM (и bulk-операции через record_bulk_*).
+- conditional_get(*models): строгий ETag из версий таблиц, URL и пользователя сессии;
+  совпал If-None-Match — 304 без вызова view и без рендера шаблона.
+- render_fragment(...): отрендеренный кусок страницы (тело таблицы) в LRU-кэше процесса,
+  ключ включает версии таблиц — после записи старые фрагменты просто перестают находиться
+  и вытесняются по LRU.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, render_template, request, session
+from markupsafe import Markup
+
+from stats import get_versions, version_name
+
+
+class FragmentCache:
+    """
+    LRU по числу записей и по суммарному размеру HTML (в символах).
+    Потокобезопасен; у каждого процесса свой — согласованность даёт версия в ключе.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, html, meta=None):
+        size = len(html)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[0])
+            self._entries[key] = (html, meta)
+            self._size += size
+            while self._entries and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._size, 'hits': self.hits, 'misses': self.misses}
+
+
+fragment_cache = FragmentCache()
+
+
+def init_http_cache(app):
+    fragment_cache.max_entries = app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', fragment_cache.max_entries)
+    fragment_cache.max_bytes = app.config.get('FRAGMENT_CACHE_MAX_BYTES', fragment_cache.max_bytes)
+    # Новый деплой с другими шаблонами не должен отвечать 304 на страницы старой вёрстки:
+    # в ETag входит время изменения шаблонов (одинаковое у всех воркеров на одной машине)
+    mtimes = [0.0]
+    for folder in (app.template_folder and os.path.join(app.root_path, app.template_folder), app.static_folder):
+        if folder and os.path.isdir(folder):
+            for root, _, files in os.walk(folder):
+                mtimes.extend(os.path.getmtime(os.path.join(root, name)) for name in files)
+    app.extensions['http_cache_salt'] = f"{app.config.get('HTTP_CACHE_SALT', '')}:{max(mtimes)}"
+
+
+def table_versions(*models):
+    """Версии таблиц models; все версии читаются одним запросом и кэшируются на время запроса."""
+    if 'table_versions' not in g:
+        g.table_versions = get_versions()
+    return tuple(g.table_versions.get(version_name(model), 0) for model in models)
+
+
+def _identity():
+    return session.get('user_id'), session.get('role'), session.get('username')
+
+
+def compute_etag(models, extra=''):
+    parts = [
+        extra,
+        current_app.extensions.get('http_cache_salt', ''),
+        request.endpoint,
+        request.full_path,
+        repr(_identity()),
+        repr(table_versions(*models)),
+    ]
+    return hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def conditional_get(*models, key=None):
+    """
+    Декоратор GET-маршрута, чьё содержимое зависит только от таблиц models, URL и пользователя.
+    key() — дополнительная часть ETag для данных вне версионируемых таблиц (например, сводок отчётов).
+    Страницы с flash-сообщениями не кэшируются: сообщение показывается один раз.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if (request.method not in ('GET', 'HEAD') or not current_app.config.get('HTTP_CACHE_ENABLED', True)
+                    or session.get('_flashes')):
+                return view(*args, **kwargs)
+            etag = compute_etag(models, str(key()) if key else '')
+            if etag in request.if_none_match:
+                response = current_app.response_class(status=304)
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'private, no-cache'
+                return response
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not session.get('_flashes'):
+                response.set_etag(etag)
+                # Браузер хранит копию, но перед показом всегда спрашивает сервер (дешёвый 304)
+                response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+def render_fragment(template_name, models, key, load):
+    """
+    Отрендерить template_name через кэш фрагментов. Возвращает (Markup, meta).
+    - key: всё, от чего кроме таблиц models зависит результат (фильтры, курсор, пользователь)
+    - load(): вызывается только при промахе, возвращает (context шаблона, meta);
+      meta (например, курсоры пагинации) хранится рядом с HTML
+    """
+    cache_key = (template_name, table_versions(*models), key)
+    entry = fragment_cache.get(cache_key)
+    if entry is not None:
+        return Markup(entry[0]), entry[1]
+    context, meta = load()
+    html = render_template(template_name, **context)
+    fragment_cache.set(cache_key, html, meta)
+    return Markup(html), meta
+
@@ -0,0 +1,235 @@
+"""
+Лента изменений inventory_items для индексов в памяти процесса (search_index.py,
+availability_index.py) и общая часть их синхронизации с БД.
+
+- Изменение предмета через ORM пишет событие 'item' с новым состоянием предмета
+  (у удалённого — deleted) в change_events, в той же транзакции: слушатель after_flush ниже.
+- Запись в обход unit of work (bulk_import.py, purchasing.py, jobs.py) вызывает publish_items():
+  событие 'items' со списком id или номеров, сами строки индекс дочитывает из БД.
+- ItemIndex: свои изменения применяются после commit (write-through); чужие — не чаще раза
+  в refresh_interval: если версия 'items.version' (stats.py) изменилась, фоновый поток читает
+  события после позиции индекса и применяет их по предмету. Полная пересборка — только при
+  первом запуске, когда событий больше ITEM_SYNC_MAX_EVENTS или часть их уже удалена чисткой
+  (EVENTS_RETENTION), и для уплотнения, когда точечных правок накопилось много.
+"""
+import json
+import logging
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import event, inspect, insert
+from sqlalchemy.orm import Session
+
+from events import (EVENTS_BATCH_SIZE, EventReader, event_position, event_values, events_pruned_after,
+                    item_payload, publish)
+from exports import iter_chunks
+from models import db, ChangeEvent, InventoryItem
+from stats import get_version
+
+logger = logging.getLogger(__name__)
+
+ITEM_TOPICS = ('item', 'items')
+ITEM_COLUMNS = (InventoryItem.id, InventoryItem.inventory_number, InventoryItem.name,
+                InventoryItem.condition, InventoryItem.is_available, InventoryItem.assigned_to)
+ItemState = namedtuple('ItemState', 'id inventory_number name condition is_available assigned_to')
+
+# id / номеров в одном событии 'items': payload — TEXT (64 КБ в MySQL)
+ITEMS_EVENT_CHUNK = 500
+# Больше событий за одну синхронизацию — дешевле пересобрать индекс целиком
+ITEM_SYNC_MAX_EVENTS = 5000
+# Точечных правок больше max(COMPACT_MIN_CHANGES, COMPACT_RATIO * размер индекса) -> пересборка
+COMPACT_MIN_CHANGES = 1000
+COMPACT_RATIO = 0.05
+
+# Индексы процесса: им after_commit передаёт изменения своей транзакции
+item_indexes = []
+
+
+def publish_items(ids=None, numbers=None):
+    """
+    Событие 'items' для INSERT / UPDATE в обход ORM (в текущей транзакции): индексы дочитают
+    эти строки из БД, а id, которых в таблице уже нет, уберут.
+    """
+    for key, values in (('ids', ids), ('numbers', numbers)):
+        values = list(values or ())
+        for start in range(0, len(values), ITEMS_EVENT_CHUNK):
+            publish('items', {key: values[start:start + ITEMS_EVENT_CHUNK]})
+
+
+def load_items(column, values):
+    """Текущие ItemState строк, у которых column IN values (пачками)."""
+    states = []
+    for start in range(0, len(values), ITEMS_EVENT_CHUNK):
+        rows = db.session.query(*ITEM_COLUMNS).filter(column.in_(values[start:start + ITEMS_EVENT_CHUNK])).all()
+        states.extend(ItemState(*row) for row in rows)
+    return states
+
+
+class ItemIndex:
+    """
+    Общая часть индексов предметов. Подкласс задаёт name и config_prefix (ключи
+    <prefix>_ENABLED / <prefix>_REFRESH_INTERVAL) и реализует _load(states) — построить
+    структуры и подменить их под self._lock, upsert(state), remove(item_id), __len__ и
+    pending_changes() — сколько точечных правок ждёт уплотнения.
+    """
+
+    name = 'item index'
+    config_prefix = None
+
+    def __init__(self, refresh_interval):
+        self._lock = threading.RLock()
+        self._reader = EventReader(ITEM_TOPICS)
+        self.version = None
+        self.ready = False
+        self._building = False
+        self._next_check = 0.0
+        self.app = None
+        self.enabled = True
+        self.refresh_interval = refresh_interval
+        item_indexes.append(self)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get(f'{self.config_prefix}_ENABLED', True)
+        self.refresh_interval = app.config.get(f'{self.config_prefix}_REFRESH_INTERVAL', self.refresh_interval)
+
+    def compaction_due(self):
+        return self.pending_changes() > max(COMPACT_MIN_CHANGES, len(self) * COMPACT_RATIO)
+
+    # ---- построение ----
+
+    def build(self):
+        """Полная (пере)сборка по таблице. Требует app context."""
+        # Версию и позицию событий читаем до данных: изменения во время чтения применит
+        # следующая синхронизация, а не потеряются
+        version = get_version(InventoryItem)
+        position, gaps = event_position(db.session)
+        count = self._load(ItemState(*row) for chunk in iter_chunks(ITEM_COLUMNS, InventoryItem.id)
+                           for row in chunk)
+        db.session.remove()
+        with self._lock:
+            self._reader.start(position, gaps)
+            self.version = version
+            self.ready = True
+        return count
+
+    def catch_up(self, version):
+        """Применить события после позиции индекса. False — нужна полная пересборка."""
+        if events_pruned_after(db.session, self._reader.last_id):
+            return False
+        applied = 0
+        while True:
+            rows = self._reader.read(db.session)
+            for row in rows:
+                if row.payload is not None:
+                    self.apply_event(row.topic, json.loads(row.payload))
+            applied += len(rows)
+            if len(rows) < EVENTS_BATCH_SIZE:
+                break
+            if applied >= ITEM_SYNC_MAX_EVENTS:
+                return False
+        self.version = version
+        return True
+
+    def apply_event(self, topic, payload):
+        if topic == 'item':
+            if payload.get('deleted'):
+                self.remove(payload['id'])
+            else:
+                self.upsert(ItemState(*(payload.get(field) for field in ItemState._fields)))
+            return
+        if 'ids' in payload:
+            states = load_items(InventoryItem.id, payload['ids'])
+            missing = set(payload['ids']) - {state.id for state in states}
+        else:
+            states = load_items(InventoryItem.inventory_number, payload.get('numbers', []))
+            missing = ()
+        with self._lock:
+            for item_id in missing:
+                self.remove(item_id)
+            for state in states:
+                self.upsert(state)
+
+    def _sync_in_background(self):
+        started = time.perf_counter()
+        try:
+            with self.app.app_context():
+                if self.ready and not self.compaction_due() and self.catch_up(get_version(InventoryItem)):
+                    return
+                count = self.build()
+            logger.info('%s: %d items in %.2fs', self.name, count, time.perf_counter() - started)
+        except Exception:
+            logger.exception('%s sync failed', self.name)
+        finally:
+            self._building = False
+
+    def refresh(self):
+        """Сверить версию таблицы (не чаще refresh_interval) и догнать изменения в фоновом потоке."""
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        if now < self._next_check or self._building:
+            return
+        self._next_check = now + self.refresh_interval
+        if self.ready and get_version(InventoryItem) == self.version and not self.compaction_due():
+            return
+        with self._lock:
+            if self._building:
+                return
+            self._building = True
+        threading.Thread(target=self._sync_in_background, name=self.name.replace(' ', '-'), daemon=True).start()
+
+    def usable(self):
+        self.refresh()
+        return self.enabled and self.ready
+
+
+# ---- синхронизация с ORM ----
+
+@event.listens_for(Session, 'after_flush')
+def _publish_item_changes(session, flush_context):
+    changed = {}
+    for obj in session.new:
+        if isinstance(obj, InventoryItem):
+            changed[obj.id] = ItemState(obj.id, obj.inventory_number, obj.name, obj.condition,
+                                        obj.is_available, obj.assigned_to)
+    for obj in session.dirty:
+        if isinstance(obj, InventoryItem) and session.is_modified(obj):
+            changed[obj.id] = ItemState(obj.id, obj.inventory_number, obj.name, obj.condition,
+                                        obj.is_available, obj.assigned_to)
+    deleted = {}
+    for obj in session.deleted:
+        if isinstance(obj, InventoryItem):
+            # После DELETE атрибуты не дочитать — берём то, что уже загружено
+            deleted[obj.id] = inspect(obj).dict.get('inventory_number')
+            changed[obj.id] = None
+    if not changed:
+        return
+    rows = [event_values('item', item_payload(state)) for state in changed.values() if state is not None]
+    rows.extend(event_values('item', {'id': item_id, 'inventory_number': number, 'deleted': True})
+                for item_id, number in deleted.items())
+    session.connection().execute(insert(ChangeEvent), rows)
+    session.info.setdefault('item_changes', {}).update(changed)
+    session.info['change_events_published'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_item_changes(session):
+    changes = session.info.pop('item_changes', None)
+    if not changes:
+        return
+    for index in item_indexes:
+        if not index.ready:
+            continue
+        with index._lock:
+            for item_id, state in changes.items():
+                if state is None:
+                    index.remove(item_id)
+                else:
+                    index.upsert(state)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_item_changes(session):
+    session.info.pop('item_changes', None)
@@ -0,0 +1,392 @@
+"""
+Фоновые задачи для долгих операций администратора.
+
+Задача — строка в таблице jobs (переживает рестарт). Маршрут ставит задачу
+в очередь и сразу отвечает; выполняет её поток JobRunner в любом воркере:
+задачу «захватывает» тот, чей UPDATE ... SET status='running' WHERE status='queued'
+изменил строку, поэтому одна задача не выполнится дважды и между процессами gunicorn.
+Прогресс пишется в отдельной короткой транзакции, клиент опрашивает /admin/jobs/<id>.
+
+Между задачами очереди тот же поток выполняет периодические задачи (@periodic_task):
+обслуживание, которому не место в обработке запроса (сводки отчётов, чистка событий).
+Поток есть в каждом воркере, а запуск за интервал — один на всех: его забирает тот,
+чей UPDATE сдвинул отметку 'periodic.<имя>' в report_watermarks (как захват задачи).
+"""
+import json
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, User, InventoryItem, UserRequest, Job, ReportWatermark
+
+JOB_STATUSES = ('queued', 'running', 'succeeded', 'failed')
+ACTIVE_JOB_STATUSES = ('queued', 'running')
+
+# Обработчики задач: {kind: функция(ctx, **params) -> result (JSON-совместимый)}
+JOB_HANDLERS = {}
+
+
+def job_handler(kind):
+    def decorator(func_):
+        JOB_HANDLERS[kind] = func_
+        return func_
+    return decorator
+
+
+# Периодические задачи: {имя: (функция(app), ключ app.config с интервалом в секундах, интервал по умолчанию)}
+PERIODIC_TASKS = {}
+
+
+def periodic_task(name, interval_key, default_interval):
+    def decorator(func_):
+        PERIODIC_TASKS[name] = (func_, interval_key, default_interval)
+        return func_
+    return decorator
+
+
+class JobContext:
+    """Передаётся обработчику: отчёт о прогрессе без влияния на его транзакцию."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+
+    def progress(self, done, total=None, message=None):
+        values = {'progress': done, 'updated_at': datetime.utcnow()}
+        if total is not None:
+            values['total'] = total
+        if message is not None:
+            values['message'] = message[:255]
+        with db.engine.begin() as connection:
+            connection.execute(update(Job).where(Job.id == self.job_id).values(**values))
+
+
+class JobRunner:
+    """
+    Поток-исполнитель задач. Стартует лениво в каждом процессе (как AuditLogWriter),
+    между задачами ждёт poll_interval секунд или сигнала wake() от enqueue в этом же процессе.
+    Задачи в статусе running без отчёта о прогрессе дольше stale_after секунд
+    (воркер убит посреди выполнения) помечаются failed.
+    """
+
+    def __init__(self, poll_interval=2.0, stale_after=600):
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self._app = None
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._next_stale_check = 0.0
+        self._next_periodic = {}
+        self.enabled = True
+
+    def init_app(self, app):
+        self._app = app
+        # JOBS_ENABLED=0 — процесс без исполнителя (сервер /events): очередь разберут другие воркеры
+        self.enabled = app.config.get('JOBS_ENABLED', True)
+        self.poll_interval = app.config.get('JOBS_POLL_INTERVAL', self.poll_interval)
+        self.stale_after = app.config.get('JOBS_STALE_AFTER', self.stale_after)
+
+    def ensure_started(self):
+        if not self.enabled or (self._thread is not None and self._pid == os.getpid()):
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._wakeup = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='job-runner', daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        self.ensure_started()
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            try:
+                with self._app.app_context():
+                    job_id = self._claim()
+                    if job_id is not None:
+                        self._execute(job_id)
+                        continue
+                    self._fail_stale()
+                    self._run_periodic()
+            except Exception:
+                self._app.logger.exception('Job runner iteration failed')
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _claim(self):
+        candidates = db.session.execute(
+            select(Job.id).where(Job.status == 'queued').order_by(Job.id).limit(5)
+        ).scalars().all()
+        db.session.rollback()
+        now = datetime.utcnow()
+        for job_id in candidates:
+            with db.engine.begin() as connection:
+                claimed = connection.execute(
+                    update(Job).where(Job.id == job_id, Job.status == 'queued')
+                    .values(status='running', started_at=now, updated_at=now)
+                ).rowcount
+            if claimed:
+                return job_id
+        return None
+
+    def _execute(self, job_id):
+        job = db.session.get(Job, job_id)
+        handler = JOB_HANDLERS.get(job.kind)
+        params = json.loads(job.params or '{}')
+        db.session.rollback()
+        try:
+            if handler is None:
+                raise ValueError(f'Unknown job kind: {job.kind}')
+            result = handler(JobContext(job_id), **params)
+        except Exception as exc:
+            db.session.rollback()
+            self._app.logger.exception('Job %s (%s) failed', job_id, job.kind)
+            self._finish(job_id, 'failed', message=str(exc)[:255] or exc.__class__.__name__)
+        else:
+            self._finish(job_id, 'succeeded', result=result)
+        finally:
+            db.session.remove()
+
+    def _finish(self, job_id, status, message=None, result=None):
+        now = datetime.utcnow()
+        values = {'status': status, 'finished_at': now, 'updated_at': now}
+        if message is not None:
+            values['message'] = message
+        if result is not None:
+            values['result'] = json.dumps(result, ensure_ascii=False, default=str)
+        with db.engine.begin() as connection:
+            connection.execute(update(Job).where(Job.id == job_id).values(**values))
+
+    def _run_periodic(self):
+        """Периодические задачи, чей срок подошёл; первый запуск — сразу после старта потока."""
+        for name, (func_, interval_key, default_interval) in PERIODIC_TASKS.items():
+            now = time.monotonic()
+            if now < self._next_periodic.get(name, 0.0):
+                continue
+            interval = self._app.config.get(interval_key, default_interval)
+            # Проверяем чаще интервала: отметку мог сдвинуть другой воркер чуть раньше нас
+            self._next_periodic[name] = now + max(1.0, interval / 4)
+            if not _claim_periodic(name, interval):
+                continue
+            try:
+                func_(self._app)
+            except Exception:
+                db.session.rollback()
+                self._app.logger.exception('Periodic task %s failed', name)
+            finally:
+                db.session.remove()
+
+    def _fail_stale(self):
+        now = time.monotonic()
+        if now < self._next_stale_check:
+            return
+        self._next_stale_check = now + 60
+        deadline = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        with db.engine.begin() as connection:
+            connection.execute(
+                update(Job).where(Job.status == 'running', Job.updated_at < deadline)
+                .values(status='failed', message='Interrupted (worker stopped)', finished_at=datetime.utcnow())
+            )
+
+
+job_runner = JobRunner()
+
+
+def _claim_periodic(name, interval):
+    """Запуск periodic-задачи name достаётся одному воркеру на interval секунд."""
+    key = f'periodic.{name}'
+    now = datetime.utcnow()
+    with db.engine.begin() as connection:
+        claimed = connection.execute(
+            update(ReportWatermark)
+            .where(ReportWatermark.name == key,
+                   or_(ReportWatermark.last_at.is_(None),
+                       ReportWatermark.last_at <= now - timedelta(seconds=interval)))
+            .values(last_at=now)
+        ).rowcount
+    if claimed:
+        return True
+    try:
+        # Первый запуск: отметки ещё нет. Параллельный INSERT другого воркера -> IntegrityError
+        with db.engine.begin() as connection:
+            connection.execute(insert(ReportWatermark).values(name=key, last_at=now))
+    except IntegrityError:
+        return False
+    return True
+
+
+def init_jobs(app):
+    job_runner.init_app(app)
+
+    @app.before_request
+    def start_job_runner():
+        # Поток нужен и тем воркерам, которые сами задач не ставили: подберут очередь после рестарта
+        job_runner.ensure_started()
+
+
+def enqueue(kind, created_by=None, **params):
+    """Поставить задачу в очередь (отдельный commit) и разбудить исполнитель. Возвращает Job."""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f'Unknown job kind: {kind}')
+    job = Job(kind=kind, params=json.dumps(params, ensure_ascii=False), created_by=created_by)
+    db.session.add(job)
+    db.session.commit()
+    job_runner.wake()
+    return job
+
+
+def job_to_dict(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'total': job.total,
+        'percent': round(100 * job.progress / job.total) if job.total else None,
+        'message': job.message,
+        'result': json.loads(job.result) if job.result else None,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+# -------------------- Обработчики --------------------
+
+@periodic_task('prune_events', 'EVENTS_PRUNE_INTERVAL', 60)
+def prune_events_task(app):
+    """События живых обновлений (events.py) старше EVENTS_RETENTION — ограниченными пачками."""
+    from events import prune_events
+
+    prune_events(app.config.get('EVENTS_RETENTION', 3600))
+
+
+@periodic_task('seed_counters', 'STATS_SEED_INTERVAL', 300)
+def seed_counters_task(app):
+    """
+    Первый пересчёт счётчиков панели (stats.py), если db-upgrade их ещё не записал: до этого
+    /admin/dashboard считает GROUP BY на каждый запрос. Запуск за интервал — один на все воркеры.
+    """
+    from stats import counters_seeded, reconcile_counters
+
+    if not counters_seeded():
+        reconcile_counters()
+
+
+@periodic_task('refresh_reports', 'REPORTS_REFRESH_INTERVAL', 300)
+def refresh_reports_task(app):
+    """Сводки отчётов (reports.py): страница /admin/reports их только читает."""
+    from reports import refresh_reports
+
+    refresh_reports(max_age=app.config.get('REPORTS_REFRESH_INTERVAL', 300))
+
+
+@job_handler('delete_user')
+def delete_user_job(ctx, user_id):
+    """
+    Освободить предметы пользователя, удалить его заявки и его самого — в одной транзакции,
+    set-based UPDATE / DELETE вместо цикла по объектам. Счётчики панели и версии таблиц
+    поправляем через record_bulk_*, индексам в памяти пишем событие 'items' (item_sync.publish_items);
+    кэш пользователей сбрасывает событие удаления User.
+    """
+    from item_sync import publish_items
+    from stats import record_bulk_changes, record_bulk_delete_groups
+
+    # Прогресс — только до и после транзакции: она короткая, а на SQLite запись
+    # из второго соединения ждала бы её снятия блокировки
+    ctx.progress(0, 1, 'Deleting user')
+    user = db.session.get(User, user_id)
+    if user is None:
+        return {'deleted': False}
+
+    # Предметов на руках у одного пользователя немного: id нужны событию для индексов в памяти
+    held = db.session.query(InventoryItem.id, InventoryItem.is_available).filter(
+        InventoryItem.assigned_to == user_id).all()
+    db.session.execute(
+        update(InventoryItem).where(InventoryItem.assigned_to == user_id)
+        .values(assigned_to=None, is_available=True),
+        execution_options={'synchronize_session': False},
+    )
+    record_bulk_changes(InventoryItem, 'is_available',
+                        Counter((available, True) for _, available in held))
+    publish_items(ids=[item_id for item_id, _ in held])
+
+    # user_requests.user_id NOT NULL: заявки удаляем, а не «отвязываем» (иначе IntegrityError)
+    statuses = db.session.query(UserRequest.status, func.count()).filter(
+        UserRequest.user_id == user_id).group_by(UserRequest.status).all()
+    db.session.query(UserRequest).filter(UserRequest.user_id == user_id).delete(synchronize_session=False)
+    record_bulk_delete_groups(UserRequest, [({'status': status}, count) for status, count in statuses])
+
+    username = user.username
+    db.session.delete(user)
+    db.session.commit()
+    released = len(held)
+    ctx.progress(1, 1, f'Released {released} items')
+    return {'deleted': True, 'username': username, 'released_items': released,
+            'deleted_requests': sum(count for _, count in statuses)}
+
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'inventory.csv'),
+    'json': ('application/json', 'inventory.json'),
+    'ndjson': ('application/x-ndjson', 'inventory.ndjson'),
+}
+
+
+@job_handler('export_inventory')
+def export_inventory_job(ctx, fmt='csv'):
+    """Выгрузка инвентаря в файл JOBS_EXPORT_DIR; скачивается через /admin/jobs/<id>/download."""
+    from exports import generate_inventory_csv, generate_inventory_json, generate_inventory_ndjson
+    from stats import get_counters
+
+    generators = {'csv': generate_inventory_csv, 'json': generate_inventory_json, 'ndjson': generate_inventory_ndjson}
+    if fmt not in generators:
+        raise ValueError(f'Unknown export format: {fmt}')
+    total = get_counters().get('items', 0)
+    export_dir = current_app.config.get('JOBS_EXPORT_DIR', 'exports')
+    os.makedirs(export_dir, exist_ok=True)
+    path = os.path.join(export_dir, f'inventory_job{ctx.job_id}.{fmt}')
+    # Прогресс — по строкам, уже записанным в файл: BOM / заголовок / '[' строк не содержат
+    rows_exported = 0
+
+    def count_rows(rows):
+        nonlocal rows_exported
+        rows_exported = rows
+
+    done = 0
+    size = 0
+    with open(path, 'wb') as f:
+        for chunk in generators[fmt](progress=count_rows):
+            f.write(chunk)
+            size += len(chunk)
+            if rows_exported != done:
+                done = rows_exported
+                # Счётчик items мог отстать от таблицы (вставки во время выгрузки)
+                ctx.progress(done, max(total, done))
+    db.session.remove()
+    return {'path': os.path.abspath(path), 'format': fmt, 'size': size}
+
+
+@job_handler('archive_logs')
+def archive_logs_job(ctx, days):
+    """Фоновая версия flask archive-logs (log_archive.py)."""
+    from log_archive import archive_action_logs, retention_cutoff
+
+    cutoff = retention_cutoff(days)
+    archive_dir = current_app.config.get('ACTION_LOG_ARCHIVE_DIR', 'archive')
+    delete_batch = current_app.config.get('ACTION_LOG_DELETE_BATCH', 1000)
+    total = archive_action_logs(cutoff, archive_dir, dry_run=True).archived
+    ctx.progress(0, total)
+    report = archive_action_logs(cutoff, archive_dir, delete_batch=delete_batch,
+                                 progress=lambda archived: ctx.progress(archived, total))
+    return report.to_dict()
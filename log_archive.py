@@ -0,0 +1,112 @@
+"""
+Срок хранения журнала действий (ActionLog) и архивирование старых записей.
+
+Строки старше срока хранения выгружаются чанками (keyset по id) в сжатый
+NDJSON-файл и удаляются из БД пачками по ACTION_LOG_DELETE_BATCH строк —
+каждая пачка в своей короткой транзакции, так что таблица не блокируется надолго.
+Пачка удаляется только после того, как её строки записаны и сброшены на диск:
+при сбое посреди прогона строки не теряются (в худшем случае попадут в архив дважды).
+
+    flask --app app archive-logs --days 180 --dir archive
+"""
+import json
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func
+
+from exports import iter_chunks
+from models import db, ActionLog
+
+ARCHIVE_CHUNK_SIZE = 5000
+DELETE_BATCH_SIZE = 1000
+
+ACTION_LOG_ARCHIVE_COLUMNS = (ActionLog.id, ActionLog.user_id, ActionLog.action, ActionLog.timestamp)
+
+
+class ArchiveReport:
+    def __init__(self, cutoff, path=None):
+        self.cutoff = cutoff
+        self.path = path
+        self.archived = 0
+        self.deleted = 0
+
+    def to_dict(self):
+        return {
+            'cutoff': self.cutoff.isoformat(),
+            'path': self.path,
+            'archived': self.archived,
+            'deleted': self.deleted,
+        }
+
+
+def action_log_row_to_dict(row):
+    return {
+        'id': row.id,
+        'user_id': row.user_id,
+        'action': row.action,
+        'timestamp': row.timestamp.isoformat() if row.timestamp else None,
+    }
+
+
+def retention_cutoff(days, now=None):
+    return (now or datetime.utcnow()) - timedelta(days=days)
+
+
+def _delete_in_batches(ids, batch_size):
+    deleted = 0
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        result = db.session.execute(delete(ActionLog).where(ActionLog.id.in_(batch)))
+        db.session.commit()
+        deleted += result.rowcount
+    return deleted
+
+
+def archive_action_logs(cutoff, archive_dir, chunk_size=ARCHIVE_CHUNK_SIZE,
+                        delete_batch=DELETE_BATCH_SIZE, dry_run=False, progress=None):
+    """
+    Выгрузить записи с timestamp < cutoff в archive_dir/action_logs_<до>_<запуск>.ndjson.gz
+    и удалить их. dry_run — только посчитать; progress(archived) вызывается после каждого чанка.
+    Требует app context. Возвращает ArchiveReport.
+    """
+    old = ActionLog.timestamp < cutoff
+    # Верхняя граница по id: без неё последний чанк просматривал бы всю «свежую» часть таблицы
+    max_id = db.session.query(func.max(ActionLog.id)).filter(old).scalar()
+    report = ArchiveReport(cutoff)
+    if max_id is None:
+        return report
+    if dry_run:
+        report.archived = db.session.query(func.count(ActionLog.id)).filter(old, ActionLog.id <= max_id).scalar()
+        return report
+
+    os.makedirs(archive_dir, exist_ok=True)
+    name = f"action_logs_{cutoff:%Y%m%d}_{datetime.utcnow():%Y%m%dT%H%M%S}.ndjson.gz"
+    path = os.path.join(archive_dir, name)
+    partial = path + '.part'
+    query = db.session.query(*ACTION_LOG_ARCHIVE_COLUMNS).filter(old, ActionLog.id <= max_id)
+    import gzip  # нужен только архивированию (CLI и фоновая задача) — не грузим при старте воркера
+    with open(partial, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as archive:
+        for rows in iter_chunks(ACTION_LOG_ARCHIVE_COLUMNS, ActionLog.id, chunk_size, query=query):
+            archive.write(''.join(
+                json.dumps(action_log_row_to_dict(row), ensure_ascii=False) + '\n' for row in rows
+            ).encode('utf-8'))
+            # Сначала строки на диске, потом DELETE
+            archive.flush()
+            raw.flush()
+            os.fsync(raw.fileno())
+            report.archived += len(rows)
+            report.deleted += _delete_in_batches([row.id for row in rows], delete_batch)
+            if progress is not None:
+                progress(report.archived)
+    os.replace(partial, path)
+    report.path = path
+    return report
+
+
+def iter_archive(path):
+    """Прочитать архив обратно (проверка / восстановление): словари в порядке записи."""
+    import gzip
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        for line in archive:
+            yield json.loads(line)
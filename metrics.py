@@ -0,0 +1,368 @@
+"""
+Метрики запросов в формате Prometheus (/metrics) и журнал медленных запросов.
+
+На каждый endpoint + метод копятся: число ответов по статусам, гистограммы
+длительности и размера ответа, число SQL-запросов и их суммарное время
+(события Engine, как в query_budget.py), время рендера шаблонов (сигналы Flask).
+Запись — несколько сложений под одной блокировкой, так что метрики можно держать
+включёнными в продакшене.
+
+Каждый воркер gunicorn считает своё. Если задан METRICS_DIR, воркер раз в
+METRICS_FLUSH_INTERVAL секунд сохраняет снимок в <METRICS_DIR>/metrics_<pid>.json,
+а /metrics складывает снимки всех воркеров (счётчики завершённых воркеров тоже,
+чтобы суммы не «откатывались»; их gauge-значения пропускаются).
+"""
+import glob
+import json
+import os
+import threading
+import time
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2, 100 * 1024 ** 2)
+
+# Сколько самых медленных SQL-запросов показывать в журнале медленных запросов
+SLOW_LOG_TOP_STATEMENTS = 5
+SLOW_LOG_STATEMENT_CHARS = 300
+# Сколько запросов одного HTTP-запроса запоминать для журнала (защита от N+1 на тысячи строк)
+SLOW_LOG_MAX_STATEMENTS = 200
+
+
+def _observe(buckets, counts, value):
+    for i, bound in enumerate(buckets):
+        if value <= bound:
+            counts[i] += 1
+            return
+    counts[-1] += 1
+
+
+def _new_endpoint_stats():
+    return {
+        'statuses': {},
+        'duration_counts': [0] * (len(DURATION_BUCKETS) + 1),
+        'duration_sum': 0.0,
+        'size_counts': [0] * (len(SIZE_BUCKETS) + 1),
+        'size_sum': 0,
+        'sql_queries': 0,
+        'sql_seconds': 0.0,
+        'template_seconds': 0.0,
+    }
+
+
+class RequestMetrics:
+    """Счётчики процесса: {"<endpoint> <method>": статистика} + gauge-коллекторы."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._collectors = []
+        self._pid = os.getpid()
+        self.metrics_dir = None
+        self.flush_interval = 5.0
+        self._next_flush = 0.0
+
+    def _stats(self, key):
+        # Вызывается под self._lock
+        if self._pid != os.getpid():
+            # После fork счётчики мастера не наши
+            self._pid = os.getpid()
+            self._endpoints = {}
+        stats = self._endpoints.get(key)
+        if stats is None:
+            stats = self._endpoints[key] = _new_endpoint_stats()
+        return stats
+
+    def record(self, key, status, duration, sql_queries, sql_seconds, template_seconds, size=None):
+        with self._lock:
+            stats = self._stats(key)
+            stats['statuses'][status] = stats['statuses'].get(status, 0) + 1
+            _observe(DURATION_BUCKETS, stats['duration_counts'], duration)
+            stats['duration_sum'] += duration
+            stats['sql_queries'] += sql_queries
+            stats['sql_seconds'] += sql_seconds
+            stats['template_seconds'] += template_seconds
+            if size is not None:
+                _observe(SIZE_BUCKETS, stats['size_counts'], size)
+                stats['size_sum'] += size
+
+    def record_size(self, key, size):
+        with self._lock:
+            stats = self._stats(key)
+            _observe(SIZE_BUCKETS, stats['size_counts'], size)
+            stats['size_sum'] += size
+
+    def add_collector(self, name, kind, help_text, collect):
+        """collect() -> число; kind — 'gauge' или 'counter' (значение процесса, например размер очереди)."""
+        self._collectors.append((name, kind, help_text, collect))
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = json.loads(json.dumps(self._endpoints)) if self._pid == os.getpid() else {}
+        values = {}
+        for name, kind, help_text, collect in self._collectors:
+            try:
+                values[name] = collect()
+            except Exception:
+                continue
+        return {'pid': os.getpid(), 'endpoints': endpoints, 'collected': values}
+
+    def maybe_flush(self):
+        if not self.metrics_dir:
+            return
+        now = time.monotonic()
+        if now < self._next_flush:
+            return
+        self._next_flush = now + self.flush_interval
+        self.flush()
+
+    def flush(self):
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        path = os.path.join(self.metrics_dir, f'metrics_{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(path + '.tmp', path)
+
+    def _snapshots(self):
+        own = self.snapshot()
+        if not self.metrics_dir:
+            return [own]
+        snapshots = [own]
+        for path in glob.glob(os.path.join(self.metrics_dir, 'metrics_*.json')):
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if snapshot.get('pid') == own['pid']:
+                continue
+            if not _pid_alive(snapshot.get('pid')):
+                snapshot['collected'] = {
+                    name: value for name, value in snapshot.get('collected', {}).items()
+                    if self._collector_kind(name) == 'counter'
+                }
+            snapshots.append(snapshot)
+        return snapshots
+
+    def _collector_kind(self, name):
+        for collector_name, kind, _, _ in self._collectors:
+            if collector_name == name:
+                return kind
+        return None
+
+    def render(self):
+        """Текст в формате Prometheus exposition 0.0.4 (сумма по всем воркерам)."""
+        endpoints = {}
+        collected = {}
+        for snapshot in self._snapshots():
+            for key, stats in snapshot['endpoints'].items():
+                _merge(endpoints.setdefault(key, _new_endpoint_stats()), stats)
+            for name, value in snapshot.get('collected', {}).items():
+                collected[name] = collected.get(name, 0) + value
+        return _exposition(sorted(endpoints.items()), collected, self._collectors)
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge(total, stats):
+    for status, count in stats['statuses'].items():
+        total['statuses'][status] = total['statuses'].get(status, 0) + count
+    for field in ('duration_counts', 'size_counts'):
+        total[field] = [a + b for a, b in zip(total[field], stats[field])]
+    for field in ('duration_sum', 'size_sum', 'sql_queries', 'sql_seconds', 'template_seconds'):
+        total[field] += stats[field]
+
+
+def _labels(**labels):
+    return ','.join('{}="{}"'.format(
+        name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    ) for name, value in labels.items())
+
+
+def _histogram(lines, name, labels, buckets, counts, total_sum):
+    cumulative = 0
+    for bound, count in zip(buckets, counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    cumulative += counts[-1]
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+    lines.append(f'{name}_sum{{{labels}}} {total_sum}')
+    lines.append(f'{name}_count{{{labels}}} {cumulative}')
+
+
+def _exposition(endpoints, collected, collectors):
+    lines = []
+
+    def header(name, kind, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    header('http_requests_total', 'counter', 'HTTP responses by endpoint, method and status.')
+    for key, stats in endpoints:
+        endpoint, method = key.rsplit(' ', 1)
+        for status, count in sorted(stats['statuses'].items()):
+            lines.append(f'http_requests_total{{{_labels(endpoint=endpoint, method=method, status=status)}}} {count}')
+
+    header('http_request_duration_seconds', 'histogram',
+           'Time from request start to response (streamed bodies: until the view returns).')
+    for key, stats in endpoints:
+        endpoint, method = key.rsplit(' ', 1)
+        _histogram(lines, 'http_request_duration_seconds', _labels(endpoint=endpoint, method=method),
+                   DURATION_BUCKETS, stats['duration_counts'], stats['duration_sum'])
+
+    header('http_response_size_bytes', 'histogram', 'Response body size.')
+    for key, stats in endpoints:
+        endpoint, method = key.rsplit(' ', 1)
+        _histogram(lines, 'http_response_size_bytes', _labels(endpoint=endpoint, method=method),
+                   SIZE_BUCKETS, stats['size_counts'], stats['size_sum'])
+
+    for field, name, help_text in (
+        ('sql_queries', 'http_request_sql_queries_total', 'SQL statements executed while handling requests.'),
+        ('sql_seconds', 'http_request_sql_seconds_total', 'Time spent in SQL statements while handling requests.'),
+        ('template_seconds', 'http_request_template_seconds_total', 'Time spent rendering templates.'),
+    ):
+        header(name, 'counter', help_text)
+        for key, stats in endpoints:
+            endpoint, method = key.rsplit(' ', 1)
+            lines.append(f'{name}{{{_labels(endpoint=endpoint, method=method)}}} {stats[field]}')
+
+    for name, kind, help_text, _ in collectors:
+        if name in collected:
+            header(name, kind, help_text)
+            lines.append(f'{name} {collected[name]}')
+    return '\n'.join(lines) + '\n'
+
+
+request_metrics = RequestMetrics()
+
+
+# -------------------- Сбор во время запроса --------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'metrics_started' in g:
+        conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('metrics_query_start')
+    if not starts or not has_request_context() or 'metrics_started' not in g:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    g.metrics_sql_queries += 1
+    g.metrics_sql_seconds += elapsed
+    statements = g.metrics_statements
+    if statements is not None and len(statements) < SLOW_LOG_MAX_STATEMENTS:
+        statements.append((elapsed, statement))
+
+
+def _before_render(sender, template, context, **extra):
+    if 'metrics_started' in g:
+        g.metrics_template_depth += 1
+        if g.metrics_template_depth == 1:
+            g.metrics_template_started = time.perf_counter()
+
+
+def _rendered(sender, template, context, **extra):
+    if 'metrics_started' in g:
+        g.metrics_template_depth -= 1
+        if g.metrics_template_depth == 0:
+            g.metrics_template_seconds += time.perf_counter() - g.metrics_template_started
+
+
+class _CountedBody:
+    """
+    Тело потокового ответа, считающее отданные байты. Размер записывается в close() (его вызывает
+    WSGI-сервер) или по исчерпании, а не в finally генератора: тот выполнился бы и при сборке
+    мусора — в любой момент, в том числе под self._lock в snapshot(), и поток ждал бы сам себя.
+    """
+
+    def __init__(self, chunks, key):
+        self.chunks = chunks
+        self.key = key
+        self.size = 0
+        self._recorded = False
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            self.size += len(chunk)
+            yield chunk
+        self._record()
+
+    def _record(self):
+        if not self._recorded:
+            self._recorded = True
+            request_metrics.record_size(self.key, self.size)
+
+    def close(self):
+        try:
+            if hasattr(self.chunks, 'close'):
+                self.chunks.close()
+        finally:
+            self._record()
+
+
+def init_metrics(app):
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    request_metrics.metrics_dir = app.config.get('METRICS_DIR') or None
+    request_metrics.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', request_metrics.flush_interval)
+    slow_ms = app.config.get('SLOW_REQUEST_MS', 0)
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        g.metrics_sql_queries = 0
+        g.metrics_sql_seconds = 0.0
+        g.metrics_template_seconds = 0.0
+        g.metrics_template_depth = 0
+        g.metrics_statements = [] if slow_ms else None
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        duration = time.perf_counter() - started
+        key = f'{request.endpoint or "unmatched"} {request.method}'
+        size = None
+        if response.is_streamed:
+            response.response = _CountedBody(response.response, key)
+        else:
+            size = response.calculate_content_length()
+        request_metrics.record(key, response.status_code, duration, g.metrics_sql_queries,
+                               g.metrics_sql_seconds, g.metrics_template_seconds, size)
+        if slow_ms and duration * 1000 >= slow_ms:
+            _log_slow_request(app, duration, response.status_code)
+        request_metrics.maybe_flush()
+        return response
+
+
+def _log_slow_request(app, duration, status):
+    slowest = sorted(g.metrics_statements, key=lambda item: item[0], reverse=True)[:SLOW_LOG_TOP_STATEMENTS]
+    lines = [
+        f"Slow request {request.method} {request.full_path.rstrip('?')} ({request.endpoint}) -> {status}: "
+        f"{duration * 1000:.0f} ms, {g.metrics_sql_queries} SQL in {g.metrics_sql_seconds * 1000:.0f} ms, "
+        f"templates {g.metrics_template_seconds * 1000:.0f} ms"
+    ]
+    for elapsed, statement in slowest:
+        lines.append(f"  {elapsed * 1000:8.1f} ms  {' '.join(statement.split())[:SLOW_LOG_STATEMENT_CHARS]}")
+    app.logger.warning('\n'.join(lines))
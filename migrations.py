@@ -0,0 +1,149 @@
+"""
+Версионированные изменения схемы для уже существующих БД.
+
+Новая БД целиком создаётся через db.create_all() по models.py; ревизии ниже
+доводят до того же состояния базы, созданные старыми версиями приложения
+(create_all не добавляет колонки и индексы в существующие таблицы).
+Каждая ревизия идемпотентна и записывается в таблицу schema_migrations.
+
+    flask --app app db-upgrade
+"""
+import time
+from datetime import datetime
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.exc import OperationalError
+
+from models import db, InventoryItem, PurchasePlan, UserRequest, ActionLog
+from stats import counters_seeded, reconcile_counters
+
+schema_migrations = db.Table(
+    'schema_migrations',
+    db.Column('version', db.String(100), primary_key=True),
+    db.Column('applied_at', db.DateTime, nullable=False, default=datetime.utcnow),
+)
+
+
+def _create_missing_indexes(connection, model):
+    inspector = inspect(connection)
+    existing = {index['name'] for index in inspector.get_indexes(model.__tablename__)}
+    columns = {column['name'] for column in inspector.get_columns(model.__tablename__)}
+    for index in model.__table__.indexes:
+        # Индексы по колонкам из более поздних ревизий создаются вместе с колонкой
+        if index.name not in existing and all(column.name in columns for column in index.columns):
+            index.create(connection)
+
+
+def _hot_path_indexes(connection):
+    """Составные индексы для фильтров инвентаря, списков заявок и журнала действий."""
+    for model in (InventoryItem, UserRequest, ActionLog):
+        _create_missing_indexes(connection, model)
+
+
+def _user_request_item_fk(connection):
+    """
+    user_requests.item_id -> inventory_items.id (ON DELETE SET NULL) и заполнение по inventory_number.
+    Одобрение заявки дальше ищет предмет по PK, а не по строке.
+    """
+    columns = {column['name'] for column in inspect(connection).get_columns('user_requests')}
+    if 'item_id' not in columns:
+        if connection.dialect.name == 'sqlite':
+            # SQLite не умеет ADD CONSTRAINT, но понимает REFERENCES в ADD COLUMN
+            connection.execute(text(
+                'ALTER TABLE user_requests ADD COLUMN item_id INTEGER '
+                'REFERENCES inventory_items (id) ON DELETE SET NULL'
+            ))
+        else:
+            connection.execute(text('ALTER TABLE user_requests ADD COLUMN item_id INTEGER NULL'))
+            connection.execute(text(
+                'ALTER TABLE user_requests ADD CONSTRAINT fk_user_requests_item_id '
+                'FOREIGN KEY (item_id) REFERENCES inventory_items (id) ON DELETE SET NULL'
+            ))
+    _create_missing_indexes(connection, UserRequest)
+    connection.execute(text(
+        'UPDATE user_requests SET item_id = ('
+        'SELECT inventory_items.id FROM inventory_items '
+        'WHERE inventory_items.inventory_number = user_requests.inventory_number'
+        ') WHERE item_id IS NULL'
+    ))
+
+
+def _action_log_action_index(connection):
+    """(action, timestamp) для фильтра журнала по префиксу действия."""
+    _create_missing_indexes(connection, ActionLog)
+
+
+def _user_request_processed_at(connection):
+    """user_requests.processed_at — время подтверждения / отклонения — и индексы для отчётов."""
+    columns = {column['name'] for column in inspect(connection).get_columns('user_requests')}
+    if 'processed_at' not in columns:
+        connection.execute(text('ALTER TABLE user_requests ADD COLUMN processed_at DATETIME NULL'))
+    _create_missing_indexes(connection, UserRequest)
+
+
+def _purchase_plan_quantity(connection):
+    """purchase_plans.quantity и received_at — приёмка в инвентарь; индексы фильтров списка планов."""
+    columns = {column['name'] for column in inspect(connection).get_columns('purchase_plans')}
+    if 'quantity' not in columns:
+        connection.execute(text('ALTER TABLE purchase_plans ADD COLUMN quantity INTEGER NOT NULL DEFAULT 1'))
+    if 'received_at' not in columns:
+        connection.execute(text('ALTER TABLE purchase_plans ADD COLUMN received_at DATETIME NULL'))
+    _create_missing_indexes(connection, PurchasePlan)
+
+
+# Порядок важен; имя ревизии — ключ в schema_migrations, менять его нельзя
+MIGRATIONS = [
+    ('0001_hot_path_indexes', _hot_path_indexes),
+    ('0002_user_request_item_fk', _user_request_item_fk),
+    ('0003_action_log_action_index', _action_log_action_index),
+    ('0004_user_request_processed_at', _user_request_processed_at),
+    ('0005_purchase_plan_quantity', _purchase_plan_quantity),
+]
+
+
+def pending_migrations(connection):
+    schema_migrations.create(connection, checkfirst=True)
+    applied = set(connection.execute(select(schema_migrations.c.version)).scalars())
+    return [(version, migrate) for version, migrate in MIGRATIONS if version not in applied]
+
+
+def wait_for_database(engine, timeout):
+    """
+    Ждать до timeout секунд, пока БД примет соединение (контейнер MySQL стартует дольше приложения).
+    timeout=0 — одна попытка; ошибка последней попытки пробрасывается.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+            return
+        except OperationalError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(1)
+
+
+def upgrade_schema():
+    """
+    Создать недостающие таблицы, применить невыполненные ревизии (каждую в своей транзакции)
+    и пересчитать счётчики панели, если их ещё нет. Возвращает список применённых ревизий.
+    """
+    applied = []
+    with db.engine.begin() as connection:
+        # Ревизии пишут в существующие таблицы — сначала проверяем, какие из них не новые
+        fresh = not inspect(connection).has_table(UserRequest.__tablename__)
+    db.create_all()
+    with db.engine.begin() as connection:
+        todo = pending_migrations(connection)
+    for version, migrate in todo:
+        with db.engine.begin() as connection:
+            if not fresh:
+                migrate(connection)
+            connection.execute(schema_migrations.insert().values(version=version, applied_at=datetime.utcnow()))
+        applied.append(version)
+    # Счётчики панели (stats.py): без первого пересчёта /admin/dashboard считал бы GROUP BY
+    with db.engine.begin() as connection:
+        if not counters_seeded(connection):
+            reconcile_counters(connection)
+    return applied
@@ -1,7 +1,15 @@
+import re
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 
-db = SQLAlchemy()
+from db_routing import RoutingSession
+
+# RoutingSession отправляет чтение маршрутов @read_replica на реплики (см. db_routing.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# Инвентарный номер: цифры и символы - . /
+INVENTORY_NUMBER_RE = re.compile(r'^[0-9\-\./]+$')
+ITEM_CONDITIONS = ('new', 'in_use', 'broken', 'decommissioned')
 
 class User(db.Model):
     """
@@ -26,8 +34,16 @@ class InventoryItem(db.Model):
     - condition: new / in_use / broken / decommissioned
     - is_available: True, если предмет свободен
     - assigned_to: FK на user.id, если предмет выдан
+    Составные индексы покрывают фильтры списка инвентаря + сортировку по inventory_number
+    (см. pagination.filter_inventory_query).
     """
     __tablename__ = 'inventory_items'
+    __table_args__ = (
+        db.Index('ix_inventory_condition_number', 'condition', 'inventory_number'),
+        db.Index('ix_inventory_available_number', 'is_available', 'inventory_number'),
+        db.Index('ix_inventory_assigned_number', 'assigned_to', 'inventory_number'),
+        db.Index('ix_inventory_name_number', 'name', 'inventory_number'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     inventory_number = db.Column(db.String(50), unique=True, nullable=False)
@@ -43,15 +59,24 @@ class InventoryItem(db.Model):
 class PurchasePlan(db.Model):
     """
     Модель планирования закупок
-    - можно пометить status='received', когда фактически куплено
+    - quantity: сколько единиц закупается; planned_price — цена за единицу
+    - можно пометить status='received', когда фактически куплено: приёмка (purchasing.py)
+      создаёт quantity предметов инвентаря и ставит received_at
+    Индексы: (status, id) и (supplier_name, id) — фильтры и keyset-пагинация списка планов.
     """
     __tablename__ = 'purchase_plans'
+    __table_args__ = (
+        db.Index('ix_purchase_plans_status_id', 'status', 'id'),
+        db.Index('ix_purchase_plans_supplier_id', 'supplier_name', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     item_name = db.Column(db.String(100), nullable=False)
     supplier_name = db.Column(db.String(100), nullable=True)
     planned_price = db.Column(db.Float, nullable=True)
+    quantity = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     status = db.Column(db.String(50), default='planned')
+    received_at = db.Column(db.DateTime, nullable=True)
 
     def __repr__(self):
         return f'<PurchasePlan {self.item_name} - {self.status}>'
@@ -60,20 +85,39 @@ class UserRequest(db.Model):
     """
     Модель заявок от пользователя
     - request_type: get_item / repair_item
-    - inventory_number: строка
+    - inventory_number: строка (как ввёл пользователь)
+    - item_id: FK на inventory_items.id, если номер найден при создании заявки
     - status: pending / approved / rejected
+    Индексы: (status, created_at DESC) — сортировка admin_requests, (user_id, created_at) — user_requests,
+    (request_type, processed_at) и (user_id, inventory_number) — инкрементальные отчёты (reports.py).
     """
     __tablename__ = 'user_requests'
+    __table_args__ = (
+        db.Index('ix_user_requests_status_created', 'status', db.text('created_at DESC')),
+        db.Index('ix_user_requests_user_created', 'user_id', 'created_at'),
+        db.Index('ix_user_requests_inventory_number', 'inventory_number'),
+        db.Index('ix_user_requests_item_id', 'item_id'),
+        db.Index('ix_user_requests_type_processed', 'request_type', 'processed_at'),
+        db.Index('ix_user_requests_user_number', 'user_id', 'inventory_number'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     request_type = db.Column(db.String(50), nullable=False)
     inventory_number = db.Column(db.String(50), nullable=False)
+    item_id = db.Column(
+        db.Integer,
+        db.ForeignKey('inventory_items.id', ondelete='SET NULL'),
+        nullable=True
+    )
     comment = db.Column(db.Text, nullable=True)
     status = db.Column(db.String(20), default='pending')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Когда админ подтвердил / отклонил заявку (начало выдачи для отчётов); NULL — ещё не обработана
+    processed_at = db.Column(db.DateTime, nullable=True)
 
     user = db.relationship('User', backref='requests')
+    item = db.relationship('InventoryItem', backref=db.backref('requests', passive_deletes=True))
 
     def __repr__(self):
         return f'<UserRequest {self.request_type} - {self.inventory_number} - {self.status}>'
@@ -82,8 +126,15 @@ class ActionLog(db.Model):
     """
     Логирование действий
     user_id -> ondelete='SET NULL', чтобы не было IntegrityError при удалении пользователя
+    Индексы: timestamp (выборки по периоду), (user_id, timestamp) — история пользователя,
+    (action, timestamp) — фильтр по префиксу действия в журнале (audit_view.py).
     """
     __tablename__ = 'action_logs'
+    __table_args__ = (
+        db.Index('ix_action_logs_timestamp', 'timestamp'),
+        db.Index('ix_action_logs_user_timestamp', 'user_id', 'timestamp'),
+        db.Index('ix_action_logs_action_timestamp', 'action', 'timestamp'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(
@@ -98,3 +149,110 @@ class ActionLog(db.Model):
 
     def __repr__(self):
         return f'<ActionLog {self.action} by User {self.user_id}>'
+
+class StatCounter(db.Model):
+    """
+    Предрассчитанные счётчики для панели администратора (см. stats.py)
+    - name: например 'items', 'items.condition.broken', 'requests.status.pending'
+    - value: текущее значение, поддерживается в той же транзакции, что и изменения данных
+    """
+    __tablename__ = 'stat_counters'
+
+    name = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<StatCounter {self.name}={self.value}>'
+
+class ReportWatermark(db.Model):
+    """
+    Докуда обработана история для сводных таблиц отчётов (см. reports.py)
+    - last_id: последний учтённый id (action_logs)
+    - last_at: последний учтённый момент времени (user_requests.processed_at, время обновления)
+    Строки 'periodic.<имя>' — время последнего запуска периодических задач jobs.py.
+    """
+    __tablename__ = 'report_watermarks'
+
+    name = db.Column(db.String(100), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=True)
+    last_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<ReportWatermark {self.name}: {self.last_id} / {self.last_at}>'
+
+class ReportConditionDaily(db.Model):
+    """Снимок «сколько предметов в каждом состоянии» на день (из stat_counters)"""
+    __tablename__ = 'report_condition_daily'
+
+    day = db.Column(db.Date, primary_key=True)
+    condition = db.Column(db.String(50), primary_key=True)
+    items = db.Column(db.Integer, nullable=False, default=0)
+
+class ReportCheckoutStats(db.Model):
+    """Выдачи пользователю: число завершённых (возвращённых) и их суммарная длительность в секундах"""
+    __tablename__ = 'report_checkout_stats'
+
+    user_id = db.Column(db.Integer, primary_key=True)
+    checkouts = db.Column(db.Integer, nullable=False, default=0)
+    total_seconds = db.Column(db.Float, nullable=False, default=0)
+
+class ReportRepairStats(db.Model):
+    """Подтверждённые заявки на ремонт по названию предмета"""
+    __tablename__ = 'report_repair_stats'
+
+    item_name = db.Column(db.String(100), primary_key=True)
+    repairs = db.Column(db.Integer, nullable=False, default=0)
+
+class Job(db.Model):
+    """
+    Фоновая задача (см. jobs.py)
+    - kind: тип задачи ('delete_user', 'export_inventory', 'archive_logs')
+    - params / result: JSON-строки
+    - status: queued / running / succeeded / failed
+    - progress / total: сколько сделано из скольких (total может быть неизвестен)
+    - updated_at: «пульс» — обновляется при каждом отчёте о прогрессе
+    """
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_status_id', 'status', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    params = db.Column(db.Text, nullable=False, default='{}')
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=True)
+    message = db.Column(db.String(255), nullable=True)
+    result = db.Column(db.Text, nullable=True)
+    created_by = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind} - {self.status}>'
+
+
+class ChangeEvent(db.Model):
+    """
+    Событие для живых обновлений страниц (см. events.py)
+    - topic: 'request' (заявка создана / обработана) или 'item' (изменился предмет)
+    - user_id: владелец заявки — кому из пользователей видно событие 'request'
+    - payload: JSON-строка с новым состоянием объекта
+    Пишется в транзакции самого изменения; хранится EVENTS_RETENTION секунд.
+    """
+    __tablename__ = 'change_events'
+    __table_args__ = (
+        db.Index('ix_change_events_created_at', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(20), nullable=False)
+    user_id = db.Column(db.Integer, nullable=True)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ChangeEvent {self.id} {self.topic}>'
@@ -0,0 +1,247 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+from models import InventoryItem
+
+# Размер страницы по умолчанию и верхняя граница (чтобы ?per_page=1000000 не выгрузил всё)
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 200
+
+
+class KeysetPage:
+    """
+    Страница результата keyset-пагинации.
+    - items: записи текущей страницы (в прямом порядке сортировки)
+    - next_cursor / prev_cursor: курсоры соседних страниц или None
+    """
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def encode_cursor(values):
+    """Кодируем значения ключа сортировки в непрозрачную строку для URL."""
+    raw = json.dumps(list(values), ensure_ascii=False, default=str)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """Обратная операция к encode_cursor. Битый курсор -> None (начинаем с начала)."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except (ValueError, UnicodeError):
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    return values
+
+
+def _coerce_cursor(columns, values):
+    """
+    Значения курсора -> тип колонки (JSON не хранит datetime: encode_cursor пишет его строкой).
+    Курсор приходит из URL: значение не того типа (список, объект, null, строка вместо числа)
+    -> None, курсор игнорируется, как битый.
+    """
+    coerced = []
+    for column, value in zip(columns, values):
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            python_type = str
+        if python_type is datetime:
+            if not isinstance(value, str):
+                return None
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                return None
+        elif python_type is int:
+            if not isinstance(value, int) or isinstance(value, bool):
+                return None
+        elif not isinstance(value, python_type):
+            return None
+        coerced.append(value)
+    return coerced
+
+
+def parse_per_page(value, default=DEFAULT_PER_PAGE):
+    try:
+        per_page = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(per_page, MAX_PER_PAGE))
+
+
+def pager_params(filters, args):
+    """
+    Параметры ссылок «Назад» / «Далее»: фильтры и per_page, если он задан в args.
+    Считаются из query string без запроса к БД — страница может прийти из кэша фрагментов.
+    """
+    params = dict(filters)
+    if args.get('per_page'):
+        params['per_page'] = parse_per_page(args.get('per_page'))
+    return params
+
+
+def _after(columns, values):
+    """
+    (c1, c2, ...) > (v1, v2, ...) в развёрнутом виде:
+    c1 > v1 OR (c1 = v1 AND c2 > v2) OR ...
+    Так условие переносимо между MySQL и SQLite и использует составной индекс.
+    """
+    clauses = []
+    for i, column in enumerate(columns):
+        equal = [columns[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal, column > values[i]))
+    return or_(*clauses)
+
+
+def _before(columns, values):
+    clauses = []
+    for i, column in enumerate(columns):
+        equal = [columns[j] == values[j] for j in range(i)]
+        clauses.append(and_(*equal, column < values[i]))
+    return or_(*clauses)
+
+
+def keyset_paginate(query, columns, after=None, before=None, per_page=DEFAULT_PER_PAGE, descending=False):
+    """
+    Keyset (cursor) пагинация без OFFSET: стоимость страницы не зависит от её «глубины»,
+    если есть индекс «колонки фильтров по равенству + columns» — база читает его по порядку
+    и останавливается на per_page + 1 строке. Фильтр по диапазону (LIKE 'префикс%') на другой
+    колонке этот порядок ломает: страница стоит сортировки всех совпавших строк.
+    - columns: уникальный в совокупности ключ сортировки, например (InventoryItem.inventory_number,)
+    - after / before: курсоры из KeysetPage.next_cursor / prev_cursor
+    - descending: сортировка по убыванию (для журналов «сначала новые»)
+    Выбираем per_page + 1 строк, чтобы без COUNT(*) понять, есть ли следующая страница.
+    """
+    columns = list(columns)
+    after_values = decode_cursor(after, len(columns))
+    if after_values is not None:
+        after_values = _coerce_cursor(columns, after_values)
+    before_values = None
+    if after_values is None:
+        before_values = decode_cursor(before, len(columns))
+        if before_values is not None:
+            before_values = _coerce_cursor(columns, before_values)
+    backwards = before_values is not None
+
+    # При descending «вперёд» означает «к меньшим значениям»
+    if after_values is not None:
+        query = query.filter((_before if descending else _after)(columns, after_values))
+    elif backwards:
+        query = query.filter((_after if descending else _before)(columns, before_values))
+
+    # Идём назад -> сортируем в обратную сторону и потом разворачиваем страницу
+    ascending = descending == backwards
+    order = [c.asc() if ascending else c.desc() for c in columns]
+    rows = query.order_by(*order).limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    def key_of(row):
+        return encode_cursor(getattr(row, c.key) for c in columns)
+
+    next_cursor = prev_cursor = None
+    if rows:
+        if backwards:
+            next_cursor = key_of(rows[-1])
+            prev_cursor = key_of(rows[0]) if has_more else None
+        else:
+            next_cursor = key_of(rows[-1]) if has_more else None
+            prev_cursor = key_of(rows[0]) if after_values is not None else None
+    return KeysetPage(rows, next_cursor=next_cursor, prev_cursor=prev_cursor)
+
+
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def parse_inventory_filters(args):
+    """
+    Фильтры списка инвентаря из query string:
+    - condition: new / in_use / broken / decommissioned
+    - available: '1' / '0'
+    - assigned_to: ID пользователя или 'none' (никому не выдан)
+    - q: префикс названия
+    Пустые значения отбрасываем, чтобы их не тащить в ссылки пагинации.
+    """
+    filters = {}
+    condition = args.get('condition', '').strip()
+    if condition:
+        filters['condition'] = condition
+    available = args.get('available', '').strip()
+    if available in ('0', '1'):
+        filters['available'] = available
+    assigned_to = args.get('assigned_to', '').strip()
+    if assigned_to == 'none' or assigned_to.isdigit():
+        filters['assigned_to'] = assigned_to
+    q = args.get('q', '').strip()
+    if q:
+        filters['q'] = q
+    return filters
+
+
+def filter_inventory_query(query, filters):
+    """Применяем фильтры; каждому соответствует составной индекс из InventoryItem.__table_args__."""
+    if 'condition' in filters:
+        query = query.filter(InventoryItem.condition == filters['condition'])
+    if 'available' in filters:
+        query = query.filter(InventoryItem.is_available == (filters['available'] == '1'))
+    if 'assigned_to' in filters:
+        if filters['assigned_to'] == 'none':
+            query = query.filter(InventoryItem.assigned_to.is_(None))
+        else:
+            query = query.filter(InventoryItem.assigned_to == int(filters['assigned_to']))
+    if 'q' in filters:
+        query = query.filter(InventoryItem.name.like(escape_like(filters['q']) + '%', escape='\\'))
+    return query
+
+
+def inventory_order(filters):
+    """
+    Ключ сортировки списка инвентаря. С q (префикс названия) — (name, inventory_number):
+    диапазон индекса ix_inventory_name_number уже идёт в этом порядке, иначе ORDER BY
+    inventory_number сортировал бы все предметы с этим префиксом ради одной страницы.
+    """
+    if 'q' in filters:
+        return (InventoryItem.name, InventoryItem.inventory_number)
+    return (InventoryItem.inventory_number,)
+
+
+def paginate_inventory(args):
+    """
+    Страница инвентаря, отсортированная по inventory_order (номер; с q — название и номер), с фильтрами из args.
+    Возвращаем (page, params): params — фильтры (+ per_page), которые нужно
+    сохранить в ссылках «Назад» / «Далее».
+    """
+    filters = parse_inventory_filters(args)
+    per_page = parse_per_page(args.get('per_page'))
+    query = filter_inventory_query(InventoryItem.query, filters)
+    page = keyset_paginate(
+        query,
+        inventory_order(filters),
+        after=args.get('after'),
+        before=args.get('before'),
+        per_page=per_page,
+    )
+    return page, pager_params(filters, args)
@@ -0,0 +1,112 @@
+"""
+Хеширование и проверка паролей.
+
+- Параметры хеша задаёт PASSWORD_HASH_METHOD (формат Werkzeug: 'scrypt:N:r:p',
+  'pbkdf2:sha256:итераций'). Хеш со старыми параметрами пересчитывается при
+  успешном входе (needs_rehash) — пароль в этот момент известен.
+- scrypt / pbkdf2 — это секунды CPU на десятки входов подряд. При PASSWORD_HASH_WORKERS > 0
+  проверка уходит в пул процессов воркера, а число одновременных хеширований на воркер
+  ограничено PASSWORD_HASH_CONCURRENCY: лишние входы ждут слот не дольше
+  PASSWORD_HASH_WAIT секунд и получают PasswordHashBusy, вместо того чтобы занять все потоки.
+"""
+import os
+import threading
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_HASH_METHOD = 'scrypt:32768:8:1'
+
+
+class PasswordHashBusy(Exception):
+    """Все слоты хеширования заняты дольше PASSWORD_HASH_WAIT секунд."""
+
+
+class PasswordHasher:
+    def __init__(self, method=DEFAULT_HASH_METHOD, workers=0, concurrency=4, wait=5.0):
+        self.method = method
+        self.workers = workers
+        self.concurrency = concurrency
+        self.wait = wait
+        self._prefix = None
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._pool = None
+        self._pid = None
+        self._pool_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD') or self.method
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', self.workers)
+        self.concurrency = app.config.get('PASSWORD_HASH_CONCURRENCY') or max(self.workers, 1)
+        self.wait = app.config.get('PASSWORD_HASH_WAIT', self.wait)
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        # Префикс считается лениво (warm_up или первый вход): это полноценный хеш — ~0.15 с CPU,
+        # которые иначе тратил бы на старте каждый воркер
+        self._prefix = None
+
+    def _executor(self):
+        if self._pool is not None and self._pid == os.getpid():
+            return self._pool
+        with self._pool_lock:
+            if self._pool is None or self._pid != os.getpid():
+                # Пул нужен только при PASSWORD_HASH_WORKERS > 0 — модули импортируем здесь, а не при старте
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                # spawn, а не fork: воркер gunicorn многопоточный, fork копировал бы чужие блокировки
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+                self._pid = os.getpid()
+            return self._pool
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(timeout=self.wait):
+            raise PasswordHashBusy()
+        try:
+            if self.workers <= 0:
+                return func(*args)
+            from concurrent.futures.process import BrokenProcessPool
+            try:
+                return self._executor().submit(func, *args).result()
+            except BrokenProcessPool:
+                # Процесс пула убит (OOM и т.п.) — пересоздаём пул при следующем вызове
+                with self._pool_lock:
+                    self._pool = None
+                return func(*args)
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def _hash_prefix(self):
+        # Префикс хеша с текущими параметрами ('scrypt:32768:8:1'): Werkzeug дописывает
+        # умолчания (например, число итераций pbkdf2), поэтому берём его у настоящего хеша
+        if self._prefix is None:
+            self._prefix = generate_password_hash('', method=self.method).split('$', 1)[0]
+        return self._prefix
+
+    def needs_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != self._hash_prefix()
+
+    def warm_up(self):
+        """Посчитать префикс хеша и запустить процессы пула заранее (первый spawn — сотни миллисекунд)."""
+        self._hash_prefix()
+        if self.workers > 0:
+            pool = self._executor()
+            for future in [pool.submit(os.getpid) for _ in range(self.workers)]:
+                future.result()
+
+    def shutdown(self, wait=False):
+        with self._pool_lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait=wait, cancel_futures=True)
+            self._pool = None
+
+
+password_hasher = PasswordHasher()
+
+
+def init_passwords(app):
+    password_hasher.init_app(app)
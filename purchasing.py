@@ -0,0 +1,234 @@
+"""
+План закупок: фильтры и keyset-пагинация списка планов, приёмка поставки в инвентарь.
+
+Приёмка (receive_plans) — одна транзакция на любое число планов:
+- планы блокируются SELECT ... FOR UPDATE в порядке id (как заявки в approvals.py):
+  параллельный админ ждёт и видит уже принятый план, а не создаёт предметы второй раз;
+- инвентарные номера выдаются подряд: '<префикс><номер с ведущими нулями>' (2024/000001, ...),
+  продолжая самый большой существующий номер этого вида — один SELECT по уникальному индексу;
+- предметы пишутся многострочными INSERT пачками по RECEIVE_BATCH_SIZE, счётчики панели —
+  record_bulk_insert; индексы поиска и доступности дочитывают новые номера по событию 'items'
+  (item_sync.publish_items).
+Параллельная приёмка с тем же префиксом может занять те же номера: тогда IntegrityError,
+откат и повтор с новым максимумом (до RECEIVE_RETRIES раз).
+"""
+from datetime import datetime
+
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+
+from audit_log import log_action
+from bulk_import import IMPORT_BATCH_SIZE
+from item_sync import publish_items
+from models import db, InventoryItem, PurchasePlan, INVENTORY_NUMBER_RE
+from pagination import escape_like, keyset_paginate, pager_params, parse_per_page
+from stats import record_bulk_insert
+
+PLAN_STATUSES = ('planned', 'received')
+
+# Предел одной приёмки: 10 000 предметов — десяток пачек INSERT в одной транзакции
+MAX_RECEIVE_ITEMS = 10000
+MAX_PLAN_QUANTITY = MAX_RECEIVE_ITEMS
+RECEIVE_BATCH_SIZE = IMPORT_BATCH_SIZE
+RECEIVE_RETRIES = 3
+# Цифр в порядковой части номера: '2024/' + '000001'
+NUMBER_WIDTH = 6
+MAX_PREFIX_LENGTH = InventoryItem.inventory_number.type.length - NUMBER_WIDTH
+
+
+class ReceiveError(Exception):
+    """Приёмку нельзя выполнить целиком (префикс, объём, номера закончились) — ничего не записано."""
+
+
+class ReceiveResult:
+    """
+    Итог приёмки одного плана.
+    - status: received / skipped / not_found
+    - category: категория flash-сообщения (success / info / danger)
+    - first_number / last_number: диапазон номеров созданных предметов
+    """
+
+    def __init__(self, plan_id, status, category, message, items=0, first_number=None, last_number=None):
+        self.plan_id = plan_id
+        self.status = status
+        self.category = category
+        self.message = message
+        self.items = items
+        self.first_number = first_number
+        self.last_number = last_number
+
+    @property
+    def ok(self):
+        return self.status == 'received'
+
+    def to_dict(self):
+        return {'id': self.plan_id, 'status': self.status, 'message': self.message, 'items': self.items,
+                'first_number': self.first_number, 'last_number': self.last_number}
+
+
+# ---- список планов ----
+
+def parse_plan_filters(args):
+    """
+    Фильтры списка планов из query string (пустые и некорректные значения отбрасываются):
+    - status: planned / received
+    - supplier: поставщик (точное совпадение)
+    - q: префикс названия
+    """
+    filters = {}
+    status = args.get('status', '').strip()
+    if status in PLAN_STATUSES:
+        filters['status'] = status
+    for name in ('supplier', 'q'):
+        value = args.get(name, '').strip()
+        if value:
+            filters[name] = value
+    return filters
+
+
+def filter_plan_query(query, filters):
+    """status и supplier идут по индексам (status, id) / (supplier_name, id) из PurchasePlan.__table_args__."""
+    if 'status' in filters:
+        query = query.filter(PurchasePlan.status == filters['status'])
+    if 'supplier' in filters:
+        query = query.filter(PurchasePlan.supplier_name == filters['supplier'])
+    if 'q' in filters:
+        query = query.filter(PurchasePlan.item_name.like(escape_like(filters['q']) + '%', escape='\\'))
+    return query
+
+
+def paginate_plans(args):
+    """Страница планов (сначала новые). Возвращаем (page, params) — как paginate_inventory."""
+    filters = parse_plan_filters(args)
+    per_page = parse_per_page(args.get('per_page'))
+    page = keyset_paginate(
+        filter_plan_query(PurchasePlan.query, filters),
+        (PurchasePlan.id,),
+        after=args.get('after'),
+        before=args.get('before'),
+        per_page=per_page,
+        descending=True,
+    )
+    return page, pager_params(filters, args)
+
+
+def parse_quantity(value):
+    """Количество единиц в плане: целое 1..MAX_PLAN_QUANTITY, пустое значение — 1; иначе None."""
+    if value in (None, ''):
+        return 1
+    try:
+        quantity = int(value)
+    except (TypeError, ValueError):
+        return None
+    return quantity if 1 <= quantity <= MAX_PLAN_QUANTITY else None
+
+
+# ---- приёмка ----
+
+def default_number_prefix():
+    return datetime.utcnow().strftime('%Y/')
+
+
+def format_number(prefix, sequence):
+    return f'{prefix}{sequence:0{NUMBER_WIDTH}d}'
+
+
+def next_sequence(prefix):
+    """
+    Порядковый номер после самого большого существующего '<prefix><NUMBER_WIDTH цифр>'.
+    Номера одной длины с ведущими нулями сравниваются как строки — хватает обратного
+    просмотра диапазона уникального индекса; номера другого вида с тем же префиксом пропускаем.
+    """
+    length = len(prefix) + NUMBER_WIDTH
+    candidates = (
+        db.session.query(InventoryItem.inventory_number)
+        .filter(InventoryItem.inventory_number.between(format_number(prefix, 0), prefix + '9' * NUMBER_WIDTH),
+                func.length(InventoryItem.inventory_number) == length)
+        .order_by(InventoryItem.inventory_number.desc())
+        .limit(100)
+    )
+    for (number,) in candidates:
+        suffix = number[len(prefix):]
+        if suffix.isdigit():
+            return int(suffix) + 1
+    return 1
+
+
+def _lock_plans(plan_ids):
+    return {
+        plan.id: plan
+        for plan in PurchasePlan.query.filter(PurchasePlan.id.in_(plan_ids))
+        .order_by(PurchasePlan.id).with_for_update().all()
+    }
+
+
+def _receive(plan_ids, prefix, user_id):
+    plans = _lock_plans(plan_ids)
+    results = []
+    pending = []
+    for plan_id in plan_ids:
+        plan = plans.get(plan_id)
+        if plan is None:
+            results.append(ReceiveResult(plan_id, 'not_found', 'danger', f'План закупки #{plan_id} не найден.'))
+        elif plan.status == 'received':
+            results.append(ReceiveResult(plan_id, 'skipped', 'info', f'План закупки #{plan_id} уже принят.'))
+        else:
+            result = ReceiveResult(plan_id, 'received', 'success', '')
+            results.append(result)
+            pending.append((plan, result))
+
+    total = sum(plan.quantity or 1 for plan, _ in pending)
+    if total > MAX_RECEIVE_ITEMS:
+        raise ReceiveError(f'За одну приёмку можно создать не больше {MAX_RECEIVE_ITEMS} предметов, выбрано {total}.')
+    if not pending:
+        return results
+    sequence = next_sequence(prefix)
+    if sequence + total > 10 ** NUMBER_WIDTH:
+        raise ReceiveError(f'Номера с префиксом «{prefix}» закончились: выберите другой префикс.')
+
+    now = datetime.utcnow()
+    rows = []
+    for plan, result in pending:
+        quantity = plan.quantity or 1
+        first, last = format_number(prefix, sequence), format_number(prefix, sequence + quantity - 1)
+        rows.extend({
+            'inventory_number': format_number(prefix, sequence + offset),
+            'name': plan.item_name,
+            'condition': 'new',
+            'is_available': True,
+        } for offset in range(quantity))
+        sequence += quantity
+        plan.status = 'received'
+        plan.received_at = now
+        result.items, result.first_number, result.last_number = quantity, first, last
+        result.message = f'План закупки #{plan.id} принят: {quantity} шт., номера {first} – {last}.'
+        log_action(user_id, f"Purchase plan received: {plan.item_name} ({quantity} items #{first}-#{last})")
+
+    for start in range(0, len(rows), RECEIVE_BATCH_SIZE):
+        db.session.execute(insert(InventoryItem), rows[start:start + RECEIVE_BATCH_SIZE])
+    # INSERT в обход unit of work — счётчики, версию таблицы и событие для индексов пишем сами
+    record_bulk_insert(InventoryItem, rows)
+    publish_items(numbers=[row['inventory_number'] for row in rows])
+    return results
+
+
+def receive_plans(plan_ids, prefix, user_id):
+    """
+    Принять планы (status='received') и создать по quantity предметов на каждый — одним commit.
+    Возвращает ReceiveResult в порядке plan_ids; ReceiveError — ничего не изменено.
+    """
+    if len(prefix) > MAX_PREFIX_LENGTH or (prefix and not INVENTORY_NUMBER_RE.match(prefix)):
+        raise ReceiveError(f'Префикс номера: до {MAX_PREFIX_LENGTH} символов из цифр и - . /')
+    plan_ids = list(dict.fromkeys(plan_ids))
+    for _ in range(RECEIVE_RETRIES):
+        try:
+            results = _receive(plan_ids, prefix, user_id)
+            db.session.commit()
+            return results
+        except IntegrityError:
+            # Те же номера только что заняла параллельная приёмка — берём новый максимум
+            db.session.rollback()
+        except ReceiveError:
+            db.session.rollback()
+            raise
+    raise ReceiveError('Номера заняты параллельной приёмкой, повторите попытку.')
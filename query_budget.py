@@ -0,0 +1,65 @@
+from functools import wraps
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Режимы контроля числа SQL-запросов на один HTTP-запрос:
+# - off: ничего не считаем (по умолчанию, для продакшена)
+# - warn: пишем предупреждение в лог приложения
+# - raise: бросаем QueryBudgetExceeded (для тестов и отладки — N+1 сразу видно)
+QUERY_BUDGET_MODES = ('off', 'warn', 'raise')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(max_queries):
+    """
+    Декоратор маршрута: «этот view должен укладываться в max_queries SQL-запросов».
+    Сам по себе ничего не делает — лимит проверяет after_request из init_query_budget.
+    Ставится под @app.route, чтобы атрибут попал на зарегистрированную функцию.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            return view(*args, **kwargs)
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.sql_query_count = g.get('sql_query_count', 0) + 1
+
+
+def init_query_budget(app):
+    mode = app.config.get('QUERY_BUDGET_MODE', 'off')
+    if mode not in QUERY_BUDGET_MODES:
+        raise ValueError(f"QUERY_BUDGET_MODE must be one of {QUERY_BUDGET_MODES}, got {mode!r}")
+    if mode == 'off':
+        return
+
+    # Слушаем класс Engine, а не конкретный engine: не нужен app context при старте
+    if not event.contains(Engine, 'before_cursor_execute', _count_query):
+        event.listen(Engine, 'before_cursor_execute', _count_query)
+
+    @app.before_request
+    def reset_query_count():
+        # Счёт — на HTTP-запрос: тестовый клиент выполняет запросы внутри одного app context (и одного g)
+        g.sql_query_count = 0
+
+    @app.after_request
+    def check_query_budget(response):
+        view = app.view_functions.get(request.endpoint)
+        budget = getattr(view, 'query_budget', None)
+        count = g.get('sql_query_count', 0)
+        response.headers['X-SQL-Query-Count'] = str(count)
+        if budget is not None and count > budget:
+            message = f"{request.endpoint}: {count} SQL queries, budget is {budget}"
+            if mode == 'raise':
+                raise QueryBudgetExceeded(message)
+            app.logger.warning(message)
+        return response
@@ -0,0 +1,88 @@
+"""
+Ограничение частоты неудачных входов (в памяти процесса).
+
+Неудачи считаются отдельно по логину и по IP в скользящем окне: после max_failures
+неудач за window секунд ключ заблокирован, пока самая старая неудача не выйдет из окна.
+Заблокированный вход отклоняется до проверки пароля — перебор не тратит CPU на хеширование.
+Успешный вход сбрасывает счётчик логина. Каждый воркер gunicorn считает сам, так что
+реальный предел — max_failures * WEB_CONCURRENCY; для защиты CPU воркера этого достаточно.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Сколько ключей помнить (LRU): поток запросов с разных IP не раздувает память
+RATE_LIMIT_MAX_KEYS = 100000
+
+
+class FailureLimiter:
+    def __init__(self, max_failures, window, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.max_failures = max_failures
+        self.window = window
+        self.max_keys = max_keys
+        self._failures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _recent(self, key, now):
+        # Вызывается под self._lock
+        failures = self._failures.get(key)
+        if failures is None:
+            return None
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+            return None
+        return failures
+
+    def retry_after(self, key):
+        """0, если можно пробовать; иначе сколько секунд ждать."""
+        if self.max_failures <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            failures = self._recent(key, now)
+            if failures is None or len(failures) < self.max_failures:
+                return 0
+            return max(1, int(failures[-self.max_failures] + self.window - now) + 1)
+
+    def add_failure(self, key):
+        if self.max_failures <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            failures = self._recent(key, now)
+            if failures is None:
+                failures = self._failures[key] = deque(maxlen=self.max_failures)
+            failures.append(now)
+            self._failures.move_to_end(key)
+            while len(self._failures) > self.max_keys:
+                self._failures.popitem(last=False)
+
+    def reset(self, key):
+        with self._lock:
+            self._failures.pop(key, None)
+
+
+login_user_limiter = FailureLimiter(max_failures=5, window=300)
+login_ip_limiter = FailureLimiter(max_failures=20, window=300)
+
+
+def init_rate_limit(app):
+    window = app.config.get('LOGIN_FAILURE_WINDOW', 300)
+    login_user_limiter.window = login_ip_limiter.window = window
+    login_user_limiter.max_failures = app.config.get('LOGIN_MAX_FAILURES_PER_USER', login_user_limiter.max_failures)
+    login_ip_limiter.max_failures = app.config.get('LOGIN_MAX_FAILURES_PER_IP', login_ip_limiter.max_failures)
+
+
+def login_retry_after(username, ip):
+    return max(login_user_limiter.retry_after(username), login_ip_limiter.retry_after(ip))
+
+
+def record_login_failure(username, ip):
+    login_user_limiter.add_failure(username)
+    login_ip_limiter.add_failure(ip)
+
+
+def record_login_success(username):
+    login_user_limiter.reset(username)
@@ -0,0 +1,198 @@
+"""
+Отчёты для /admin/reports.
+
+Тяжёлые отчёты читаются из сводных таблиц (report_*), которые обновляются
+инкрементально: каждый проход refresh_reports() обрабатывает только историю
+после сохранённой отметки (ReportWatermark) — агрегатами в SQL, без циклов по строкам.
+Сводки переживают архивирование action_logs (log_archive.py).
+Обновляет их периодическая задача jobs.py раз в REPORTS_REFRESH_INTERVAL секунд (или CLI,
+или кнопка на странице — POST); GET /admin/reports только читает и может идти на реплику.
+
+- condition_daily: снимок числа предметов по состояниям на день (из stat_counters, O(1))
+- checkouts: длительность выдачи = «Returned item #N» в журнале минус подтверждение
+  последней заявки get_item этого пользователя на тот же номер
+- repairs: подтверждённые заявки repair_item по названию предмета
+Траты на закупки по поставщикам считаются на лету — purchase_plans маленькая.
+
+    flask --app app refresh-reports
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, func, insert, literal_column, select, update
+
+from models import (db, User, InventoryItem, PurchasePlan, UserRequest, ActionLog, ITEM_CONDITIONS,
+                    ReportWatermark, ReportConditionDaily, ReportCheckoutStats, ReportRepairStats)
+from stats import counter_name, get_counters
+
+# Записи моложе этого не обрабатываем: журнал пишется асинхронно, и строка с меньшим id
+# может появиться в БД чуть позже строки с большим — отметка по id её бы пропустила
+REPORT_LAG = timedelta(minutes=1)
+
+# Как часто фоновая задача догоняет историю (сек); CLI и кнопка «Обновить» обновляют всегда
+REPORTS_REFRESH_INTERVAL = 300
+
+REPORT_DAYS = 30
+REPORT_TOP = 50
+
+RETURN_ACTION_PREFIX = 'Returned item #'
+
+WATERMARK_CHECKOUTS = 'checkouts'
+WATERMARK_REPAIRS = 'repairs'
+WATERMARK_REFRESHED = 'refreshed'
+
+
+def _seconds_between(start, end):
+    if db.engine.dialect.name == 'sqlite':
+        return (func.julianday(end) - func.julianday(start)) * 86400
+    return func.timestampdiff(literal_column('SECOND'), start, end)
+
+
+def _watermark(name):
+    """Отметка под FOR UPDATE: два параллельных обновления не учтут одну историю дважды."""
+    watermark = ReportWatermark.query.filter_by(name=name).with_for_update().first()
+    if watermark is None:
+        watermark = ReportWatermark(name=name)
+        db.session.add(watermark)
+    return watermark
+
+
+def _add_to_summary(model, key_column, rows, value_columns):
+    """rows: [(ключ, прирост1, прирост2, ...)] -> UPDATE ... SET v = v + :d или INSERT."""
+    for key, *deltas in rows:
+        values = {column: getattr(model, column) + delta for column, delta in zip(value_columns, deltas)}
+        result = db.session.execute(update(model).where(getattr(model, key_column) == key).values(**values))
+        if result.rowcount == 0:
+            db.session.execute(insert(model).values({key_column: key, **dict(zip(value_columns, deltas))}))
+
+
+def refresh_condition_snapshot(counters, today):
+    ReportConditionDaily.query.filter_by(day=today).delete()
+    db.session.execute(insert(ReportConditionDaily), [
+        {'day': today, 'condition': condition,
+         'items': counters.get(counter_name('items', 'condition', condition), 0)}
+        for condition in ITEM_CONDITIONS
+    ])
+
+
+def refresh_checkouts(until):
+    """Возвраты из action_logs с id в (отметка, max id старше until] -> report_checkout_stats."""
+    watermark = _watermark(WATERMARK_CHECKOUTS)
+    last_id = watermark.last_id or 0
+    max_id = db.session.query(func.max(ActionLog.id)).filter(ActionLog.timestamp < until).scalar()
+    if max_id is None or max_id <= last_id:
+        return 0
+
+    started_at = func.coalesce(UserRequest.processed_at, UserRequest.created_at)
+    number = func.substr(ActionLog.action, len(RETURN_ACTION_PREFIX) + 1)
+    # Коррелированный подзапрос — точечный поиск по индексу (user_id, inventory_number)
+    checkout_start = select(func.max(started_at)).where(
+        UserRequest.user_id == ActionLog.user_id,
+        UserRequest.inventory_number == number,
+        UserRequest.request_type == 'get_item',
+        UserRequest.status == 'approved',
+        started_at <= ActionLog.timestamp,
+    ).scalar_subquery()
+    returns = select(
+        ActionLog.user_id.label('user_id'),
+        ActionLog.timestamp.label('returned_at'),
+        checkout_start.label('started_at'),
+    ).where(
+        ActionLog.id > last_id,
+        ActionLog.id <= max_id,
+        ActionLog.user_id.isnot(None),
+        ActionLog.action.like(RETURN_ACTION_PREFIX + '%'),
+    ).subquery()
+    rows = db.session.execute(
+        select(returns.c.user_id, func.count(), func.sum(_seconds_between(returns.c.started_at, returns.c.returned_at)))
+        .where(returns.c.started_at.isnot(None))
+        .group_by(returns.c.user_id)
+    ).all()
+    _add_to_summary(ReportCheckoutStats, 'user_id', rows, ('checkouts', 'total_seconds'))
+    watermark.last_id = max_id
+    return len(rows)
+
+
+def refresh_repairs(until):
+    """Подтверждённые repair_item с processed_at в (отметка, until] -> report_repair_stats."""
+    watermark = _watermark(WATERMARK_REPAIRS)
+    query = select(InventoryItem.name, func.count()).select_from(UserRequest).join(
+        InventoryItem, InventoryItem.id == UserRequest.item_id
+    ).where(UserRequest.request_type == 'repair_item', UserRequest.status == 'approved')
+    if watermark.last_at is None:
+        # Первый проход: вся история, включая заявки, обработанные до появления processed_at
+        query = query.where((UserRequest.processed_at.is_(None)) | (UserRequest.processed_at <= until))
+    else:
+        query = query.where(UserRequest.processed_at > watermark.last_at, UserRequest.processed_at <= until)
+    rows = db.session.execute(query.group_by(InventoryItem.name)).all()
+    _add_to_summary(ReportRepairStats, 'item_name', rows, ('repairs',))
+    watermark.last_at = until
+    return len(rows)
+
+
+def refresh_reports(now=None, max_age=None):
+    """
+    Догнать все сводки до now - REPORT_LAG в одной транзакции. Требует app context.
+    max_age: обновлять, только если прошлое обновление старше max_age секунд. Проверка —
+    под блокировкой отметки, поэтому из воркеров, пришедших одновременно, работу делает
+    один, остальные получают None.
+    """
+    now = now or datetime.utcnow()
+    until = now - REPORT_LAG
+    # До блокировок: на непосчитанной БД get_counters считает GROUP BY по таблицам
+    counters = get_counters()
+    refreshed = _watermark(WATERMARK_REFRESHED)
+    if (max_age is not None and refreshed.last_at is not None
+            and now - refreshed.last_at < timedelta(seconds=max_age)):
+        db.session.rollback()
+        return None
+    result = {
+        'checkout_users': refresh_checkouts(until),
+        'repair_items': refresh_repairs(until),
+    }
+    refresh_condition_snapshot(counters, now.date())
+    refreshed.last_at = now
+    db.session.commit()
+    return result
+
+
+def reports_refreshed_at():
+    return db.session.query(ReportWatermark.last_at).filter_by(name=WATERMARK_REFRESHED).scalar()
+
+
+def condition_history(days=REPORT_DAYS):
+    """[(день, {состояние: число})] за последние days дней, новые сверху."""
+    since = datetime.utcnow().date() - timedelta(days=days)
+    history = {}
+    for day, condition, items in db.session.query(
+        ReportConditionDaily.day, ReportConditionDaily.condition, ReportConditionDaily.items
+    ).filter(ReportConditionDaily.day > since).order_by(ReportConditionDaily.day.desc()):
+        history.setdefault(day, {})[condition] = items
+    return list(history.items())
+
+
+def checkout_durations(limit=REPORT_TOP):
+    """Пользователи с наибольшим числом выдач: (id, логин, выдач, средняя длительность в часах)."""
+    average_hours = ReportCheckoutStats.total_seconds / ReportCheckoutStats.checkouts / 3600
+    return db.session.query(
+        ReportCheckoutStats.user_id, User.username, ReportCheckoutStats.checkouts, average_hours
+    ).outerjoin(User, User.id == ReportCheckoutStats.user_id).filter(
+        ReportCheckoutStats.checkouts > 0
+    ).order_by(ReportCheckoutStats.checkouts.desc()).limit(limit).all()
+
+
+def repair_frequency(limit=REPORT_TOP):
+    return db.session.query(ReportRepairStats.item_name, ReportRepairStats.repairs).order_by(
+        ReportRepairStats.repairs.desc()
+    ).limit(limit).all()
+
+
+def spend_by_supplier():
+    """(поставщик, планов, план всего, из них куплено) — GROUP BY по purchase_plans; цена плана — за единицу."""
+    received = PurchasePlan.status == 'received'
+    cost = PurchasePlan.planned_price * PurchasePlan.quantity
+    return db.session.query(
+        PurchasePlan.supplier_name,
+        func.count(PurchasePlan.id),
+        func.coalesce(func.sum(cost), 0),
+        func.coalesce(func.sum(case((received, cost), else_=0)), 0),
+    ).group_by(PurchasePlan.supplier_name).order_by(func.sum(cost).desc()).all()
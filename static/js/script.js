@@ -12,4 +12,58 @@ document.addEventListener('DOMContentLoaded', function() {
       });
     });
   });
-  
\ No newline at end of file
+  
+
+// Подсказки инвентарных номеров: <input data-autocomplete-url list="..."> + <datalist>
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('input[data-autocomplete-url]').forEach(input => {
+      const datalist = document.getElementById(input.getAttribute('list'));
+      let timer = null;
+      let lastQuery = '';
+
+      input.addEventListener('input', () => {
+        clearTimeout(timer);
+        timer = setTimeout(() => {
+          const query = input.value.trim();
+          if (!query || query === lastQuery) {
+            return;
+          }
+          lastQuery = query;
+          fetch(input.dataset.autocompleteUrl + '?q=' + encodeURIComponent(query))
+            .then(response => response.ok ? response.json() : [])
+            .then(options => {
+              datalist.innerHTML = '';
+              options.forEach(option => {
+                const el = document.createElement('option');
+                el.value = option.value;
+                el.label = option.label + (option.is_available ? '' : ' (занят)');
+                datalist.appendChild(el);
+              });
+            })
+            .catch(() => {});
+        }, 150);
+      });
+    });
+  });
+
+
+// Живые обновления (GET /events, server-sent events): handlers = {request: fn(data), item: fn(data)}.
+// Браузер сам переподключается и присылает Last-Event-ID; 'reset' — пропущено слишком много, перерисовываем страницу
+function listenForChanges(url, handlers) {
+    if (!window.EventSource) {
+      return null;
+    }
+    const source = new EventSource(url);
+    Object.keys(handlers).forEach(topic => {
+      source.addEventListener(topic, event => handlers[topic](JSON.parse(event.data)));
+    });
+    source.addEventListener('reset', () => window.location.reload());
+    return source;
+  }
+
+// Счётчик «появились новые записи» в элементе [data-new-count]: показывает блок и число
+function bumpNewCount(element) {
+    const count = element.querySelector('[data-new-count]');
+    count.textContent = Number(count.textContent || 0) + 1;
+    element.hidden = false;
+  }
@@ -0,0 +1,308 @@
+import random
+from collections import Counter
+
+from flask import current_app, has_app_context
+from sqlalchemy import delete, event, func, inspect, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from models import db, User, InventoryItem, PurchasePlan, UserRequest, StatCounter
+
+# Какие модели считаем и по каким колонкам делим: {модель: (префикс, колонки)}.
+# Имя счётчика: '<префикс>' — всего строк, '<префикс>.<колонка>.<значение>' — разбивка.
+TRACKED_MODELS = {
+    User: ('users', ()),
+    InventoryItem: ('items', ('condition', 'is_available')),
+    UserRequest: ('requests', ('status',)),
+    PurchasePlan: ('plans', ('status',)),
+}
+
+# Счётчик изменений таблицы: '<префикс>.version' растёт при каждом INSERT / UPDATE / DELETE.
+# По нему процессы узнают, что данные поменялись (поисковый индекс, кэши), одним SELECT по PK.
+VERSION_SUFFIX = '.version'
+
+# Горячие счётчики ('items', 'items.version', разбивки по состоянию) меняет почти каждая
+# запись, и строка счётчика сериализовала бы все пишущие транзакции. Поэтому счётчик —
+# COUNTER_SLOTS строк-слотов: '<имя>' (слот 0) и '<имя>#1' ... '<имя>#N-1'. Транзакция
+# пишет все свои дельты в один случайный слот, чтение суммирует слоты.
+COUNTER_SLOTS = 8
+SLOT_SEPARATOR = '#'
+
+# Маркер «счётчики хоть раз пересчитаны с нуля». Пока его нет (первый запуск на
+# существующей БД), инкременты неполны и get_counters считает GROUP BY, ничего не записывая.
+SEEDED_COUNTER = 'stats.seeded'
+
+
+def counter_name(prefix, column=None, value=None):
+    if column is None:
+        return prefix
+    if isinstance(value, bool):
+        value = int(value)
+    return f'{prefix}.{column}.{value}'
+
+
+def version_name(model):
+    return TRACKED_MODELS[model][0] + VERSION_SUFFIX
+
+
+def row_counters(model, values):
+    """Счётчики, в которые попадает строка с данными values (dict колонка -> значение)."""
+    prefix, columns = TRACKED_MODELS[model]
+    return [counter_name(prefix)] + [counter_name(prefix, column, values.get(column)) for column in columns]
+
+
+def base_name(name):
+    """'items.version#3' -> 'items.version': имя счётчика без номера слота."""
+    return name.partition(SLOT_SEPARATOR)[0]
+
+
+def slot_name(name, slot):
+    return name if slot == 0 else f'{name}{SLOT_SEPARATOR}{slot}'
+
+
+def _transaction_slot(connection):
+    """
+    Слот на всю транзакцию: разные слоты в одной транзакции — это лишние блокировки
+    и риск взаимоблокировки с транзакцией, взявшей те же слоты в другом порядке.
+    """
+    slots = current_app.config.get('STATS_COUNTER_SLOTS', COUNTER_SLOTS) if has_app_context() else COUNTER_SLOTS
+    transaction = connection.get_transaction()
+    cached = connection.info.get('stat_counter_slot')
+    if cached is None or cached[0] is not transaction:
+        cached = (transaction, random.randrange(max(1, slots)))
+        connection.info['stat_counter_slot'] = cached
+    return cached[1]
+
+
+def _upsert(connection, name, delta):
+    """value = value + delta одним запросом; строки слота ещё нет — она создаётся (без гонки UPDATE/INSERT)."""
+    dialect = connection.dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        statement = mysql_insert(StatCounter).values(name=name, value=delta)
+        connection.execute(statement.on_duplicate_key_update(value=StatCounter.value + statement.inserted.value))
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        statement = sqlite_insert(StatCounter).values(name=name, value=delta)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[StatCounter.name], set_={'value': StatCounter.value + statement.excluded.value}))
+    else:
+        result = connection.execute(
+            update(StatCounter).where(StatCounter.name == name).values(value=StatCounter.value + delta)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(StatCounter).values(name=name, value=delta))
+
+
+def apply_deltas(connection, deltas):
+    """
+    value = value + :delta — атомарно на стороне БД, в текущей транзакции, в слот этой транзакции.
+    Имена — по порядку: все транзакции берут блокировки строк в одном порядке.
+    """
+    slot = _transaction_slot(connection)
+    for name in sorted(deltas):
+        if deltas[name]:
+            _upsert(connection, slot_name(name, slot), deltas[name])
+
+
+def sum_slots(rows):
+    """[(имя слота, значение)] -> {имя счётчика: сумма по слотам}."""
+    counters = Counter()
+    for name, value in rows:
+        counters[base_name(name)] += value
+    return dict(counters)
+
+
+def _loaded_values(state, columns):
+    return {column: state.dict.get(column) for column in columns}
+
+
+def _old_and_new(state, column):
+    history = state.attrs[column].history
+    old = history.deleted[0] if history.deleted else None
+    new = history.added[0] if history.added else None
+    return old, new
+
+
+def collect_flush_deltas(session):
+    """
+    Изменения счётчиков по объектам текущего flush (new / dirty / deleted).
+    Вызывается из after_flush: списки сессии и история атрибутов ещё «до flush».
+    """
+    deltas = Counter()
+    for obj in session.new:
+        model = type(obj)
+        if model in TRACKED_MODELS:
+            values = _loaded_values(inspect(obj), TRACKED_MODELS[model][1])
+            for name in row_counters(model, values):
+                deltas[name] += 1
+            deltas[version_name(model)] += 1
+    for obj in session.deleted:
+        model = type(obj)
+        if model in TRACKED_MODELS:
+            values = _loaded_values(inspect(obj), TRACKED_MODELS[model][1])
+            for name in row_counters(model, values):
+                deltas[name] -= 1
+            deltas[version_name(model)] += 1
+    for obj in session.dirty:
+        model = type(obj)
+        if model not in TRACKED_MODELS or not session.is_modified(obj):
+            continue
+        deltas[version_name(model)] += 1
+        prefix, columns = TRACKED_MODELS[model]
+        state = inspect(obj)
+        for column in columns:
+            if not state.attrs[column].history.has_changes():
+                continue
+            old, new = _old_and_new(state, column)
+            if old != new:
+                deltas[counter_name(prefix, column, old)] -= 1
+                deltas[counter_name(prefix, column, new)] += 1
+    return deltas
+
+
+@event.listens_for(Session, 'before_flush')
+def _load_deleted_values(session, flush_context, instances):
+    # После DELETE значения уже не дочитать — подгружаем колонки разбивки заранее
+    for obj in session.deleted:
+        model = type(obj)
+        if model in TRACKED_MODELS:
+            for column in TRACKED_MODELS[model][1]:
+                getattr(obj, column)
+
+
+@event.listens_for(Session, 'after_flush')
+def _update_counters_after_flush(session, flush_context):
+    deltas = collect_flush_deltas(session)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def _noop_set(target, value, oldvalue, initiator):
+    return value
+
+
+# active_history: при присваивании SQLAlchemy сначала загрузит старое значение
+# (даже если атрибут был expired после commit) — иначе не знали бы, какой счётчик уменьшать
+for _model, (_prefix, _columns) in TRACKED_MODELS.items():
+    for _column in _columns:
+        event.listen(getattr(_model, _column), 'set', _noop_set, active_history=True, retval=True)
+
+
+def record_bulk_insert(model, rows):
+    """Для INSERT в обход unit of work (executemany в bulk_import и т.п.) — счётчики вручную."""
+    deltas = Counter()
+    for row in rows:
+        for name in row_counters(model, row):
+            deltas[name] += 1
+    deltas[version_name(model)] += len(rows)
+    apply_deltas(db.session.connection(), deltas)
+
+
+def record_bulk_delete(model, rows):
+    """Для DELETE в обход unit of work: rows — значения колонок разбивки удалённых строк."""
+    record_bulk_delete_groups(model, [(row, 1) for row in rows])
+
+
+def record_bulk_delete_groups(model, groups):
+    """
+    То же по группам: groups — [(значения колонок разбивки, число строк), ...],
+    например результат GROUP BY status — без словаря на каждую удалённую строку.
+    """
+    deltas = Counter()
+    for values, count in groups:
+        for name in row_counters(model, values):
+            deltas[name] -= count
+        deltas[version_name(model)] += count
+    apply_deltas(db.session.connection(), deltas)
+
+
+def record_bulk_change(model, column, old_value, new_value, count=1):
+    """Для bulk UPDATE: count строк перешли из old_value в new_value по колонке column."""
+    record_bulk_changes(model, column, {(old_value, new_value): count})
+
+
+def record_bulk_changes(model, column, transitions):
+    """
+    Несколько переходов одной колонки разом: transitions — {(старое, новое): число строк}.
+    Дельты суммируются и применяются одним apply_deltas на пачку.
+    """
+    prefix = TRACKED_MODELS[model][0]
+    deltas = Counter()
+    for (old_value, new_value), count in transitions.items():
+        if not count:
+            continue
+        deltas[version_name(model)] += count
+        if old_value != new_value:
+            deltas[counter_name(prefix, column, old_value)] -= count
+            deltas[counter_name(prefix, column, new_value)] += count
+    if deltas:
+        apply_deltas(db.session.connection(), deltas)
+
+
+def _version_filter(names):
+    return or_(*(or_(StatCounter.name == name, StatCounter.name.like(name + SLOT_SEPARATOR + '%'))
+                 for name in names))
+
+
+def get_version(model, connection=None):
+    """Текущая версия таблицы (0, если изменений ещё не было); connection — чтобы прочитать внутри транзакции."""
+    statement = select(func.sum(StatCounter.value)).where(_version_filter([version_name(model)]))
+    return (connection or db.session).execute(statement).scalar() or 0
+
+
+def get_versions():
+    """Версии всех таблиц TRACKED_MODELS одним запросом: {'items.version': N, ...}."""
+    names = [version_name(model) for model in TRACKED_MODELS]
+    return sum_slots(db.session.query(StatCounter.name, StatCounter.value).filter(_version_filter(names)))
+
+
+def get_counters():
+    """
+    Все счётчики одним запросом по маленькой таблице (O(1) относительно объёма данных), слоты сложены.
+    Только чтение: пока счётчики не пересчитаны (нет SEEDED_COUNTER), отдаём живой GROUP BY —
+    записывает их db-upgrade, reconcile-stats или периодическая задача seed_counters (jobs.py).
+    """
+    counters = sum_slots(db.session.query(StatCounter.name, StatCounter.value).all())
+    if SEEDED_COUNTER not in counters:
+        return dict(compute_counters())
+    return counters
+
+
+def counters_seeded(connection=None):
+    statement = select(StatCounter.name).where(StatCounter.name == SEEDED_COUNTER)
+    return (connection or db.session).execute(statement).first() is not None
+
+
+def compute_counters(connection=None):
+    """Полный пересчёт через GROUP BY — источник истины для reconcile."""
+    executor = connection or db.session
+    counters = Counter()
+    for model, (prefix, columns) in TRACKED_MODELS.items():
+        counters[counter_name(prefix)] = executor.execute(select(func.count()).select_from(model)).scalar()
+        for column in columns:
+            attr = getattr(model, column)
+            for value, count in executor.execute(select(attr, func.count()).group_by(attr)).all():
+                counters[counter_name(prefix, column, value)] = count
+    return counters
+
+
+def reconcile_counters(connection=None):
+    """
+    Пересчитать все счётчики с нуля и записать их (лечит расхождения после ручных правок БД).
+    Сначала DELETE, потом GROUP BY: DELETE блокирует строки счётчиков, и транзакции, меняющие
+    данные параллельно, ждут на своей дельте до нашего commit. Всё закоммиченное раньше
+    пересчёт видит, поэтому инкремент не теряется, а второй параллельный пересчёт ждёт первого
+    и удаляет его строки, а не вставляет дубликаты. connection — выполнить в чужой транзакции
+    (db-upgrade) без commit.
+    """
+    executor = connection or db.session
+    # Версии таблиц не пересчитываются — они только растут, иначе кэши примут старые данные за свежие.
+    # Остальные счётчики — со всеми слотами; пересчёт ложится в слот 0
+    versions = [version_name(model) for model in TRACKED_MODELS]
+    executor.execute(delete(StatCounter).where(~_version_filter(versions)))
+    counters = compute_counters(connection)
+    counters[SEEDED_COUNTER] = 1
+    executor.execute(insert(StatCounter), [{'name': name, 'value': value} for name, value in counters.items()])
+    if connection is None:
+        db.session.commit()
+    return dict(counters)
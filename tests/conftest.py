@@ -0,0 +1,95 @@
+"""
+Общие фикстуры. Приложение поднимается на временной SQLite с QUERY_BUDGET_MODE=raise:
+маршрут, превысивший @query_budget, роняет тест (QueryBudgetExceeded).
+Журнал действий — strict (строки видны сразу после commit); прогрев, пул хеширования
+паролей, индексы в памяти и исполнитель задач выключены — их фоновые потоки тестам не нужны
+(задачи тесты выполняют сами через job_runner).
+"""
+import os
+import tempfile
+
+os.environ.update({
+    'DATABASE_URL': 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='sports-inventory-'), 'test.db'),
+    'QUERY_BUDGET_MODE': 'raise',
+    'AUDIT_LOG_MODE': 'strict',
+    'PASSWORD_HASH_WORKERS': '0',
+    'WARMUP_ENABLED': '0',
+    'SEARCH_INDEX_ENABLED': '0',
+    'AVAILABILITY_INDEX_ENABLED': '0',
+    'JOBS_ENABLED': '0',
+})
+
+import pytest  # noqa: E402
+
+from app import app as flask_app  # noqa: E402
+from http_cache import fragment_cache  # noqa: E402
+from migrations import upgrade_schema  # noqa: E402
+from models import db, User, InventoryItem  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def _schema():
+    with flask_app.app_context():
+        upgrade_schema()
+    return flask_app
+
+
+@pytest.fixture(autouse=True)
+def app(_schema):
+    """Приложение с пустыми таблицами и контекстом приложения на время теста."""
+    with flask_app.app_context():
+        yield flask_app
+        db.session.remove()
+        with db.engine.begin() as connection:
+            for table in reversed(db.metadata.sorted_tables):
+                connection.execute(table.delete())
+        # Версии таблиц начинаются заново — фрагменты прошлого теста совпали бы с ними по ключу
+        fragment_cache.clear()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def make_user(username, role='user'):
+    user = User(username=username, password_hash='-', role=role)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def make_items(count, prefix='1-', **values):
+    items = [InventoryItem(inventory_number=f'{prefix}{i:04d}', name=values.get('name', f'Мяч {i}'),
+                           condition=values.get('condition', 'new'), is_available=values.get('is_available', True),
+                           assigned_to=values.get('assigned_to'))
+             for i in range(count)]
+    db.session.add_all(items)
+    db.session.commit()
+    return items
+
+
+def build_index(index, monkeypatch):
+    """Собрать индекс в памяти (в тестах выключен) без фоновой синхронизации; после теста он снова не готов."""
+    monkeypatch.setattr(index, 'enabled', True)
+    monkeypatch.setattr(index, 'ready', False)
+    monkeypatch.setattr(index, '_next_check', float('inf'))
+    return index.build()
+
+
+def login(client, user):
+    with client.session_transaction() as session:
+        session['user_id'] = user.id
+        session['username'] = user.username
+        session['role'] = user.role
+
+
+@pytest.fixture
+def admin(app):
+    # ADMIN_LOGINS из config.py
+    return make_user('admin', role='admin')
+
+
+@pytest.fixture
+def user(app):
+    return make_user('ivanov')
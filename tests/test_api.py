@@ -0,0 +1,125 @@
+import gzip
+import json
+
+import api
+from models import db, InventoryItem, UserRequest
+
+from conftest import login, make_items
+
+
+def test_anonymous_gets_json_401(client):
+    response = client.get('/api/v1/items')
+
+    assert response.status_code == 401
+    assert response.get_json() == {'error': 'login required'}
+    assert client.get('/api/v1/nothing').get_json() == {'error': 'Not Found'}
+
+
+def test_field_selection_and_keyset_pages(client, user):
+    make_items(3)
+    login(client, user)
+
+    first = client.get('/api/v1/items', query_string={'fields': 'name', 'per_page': 2}).get_json()
+    second = client.get('/api/v1/items', query_string={'fields': 'name', 'per_page': 2,
+                                                       'after': first['next_cursor']}).get_json()
+
+    assert first['items'] == [{'name': 'Мяч 0'}, {'name': 'Мяч 1'}]
+    assert second['items'] == [{'name': 'Мяч 2'}] and second['next_cursor'] is None
+
+
+def test_unknown_field_is_rejected(client, user):
+    login(client, user)
+
+    response = client.get('/api/v1/items', query_string={'fields': 'name,price'})
+
+    assert response.status_code == 400
+    assert response.get_json()['error'].startswith('unknown fields: price')
+
+
+def test_lookup_keeps_request_order_and_reports_missing(client, user):
+    make_items(3)
+    login(client, user)
+
+    response = client.post('/api/v1/items/lookup?fields=inventory_number,is_available',
+                           json={'numbers': ['1-0002', 'нет', '1-0000']})
+
+    assert response.get_json() == {
+        'items': [{'inventory_number': '1-0002', 'is_available': True},
+                  {'inventory_number': '1-0000', 'is_available': True}],
+        'missing': ['нет'],
+    }
+
+
+def test_batch_size_limit(client, user, monkeypatch):
+    monkeypatch.setattr(api, 'API_MAX_BATCH', 2)
+    login(client, user)
+
+    assert client.post('/api/v1/items/lookup', json={'numbers': ['a', 'b', 'c']}).status_code == 413
+    assert client.post('/api/v1/items/lookup', json={'codes': []}).status_code == 400
+
+
+def test_submit_requests_reports_each_entry(client, user):
+    make_items(2)
+    login(client, user)
+
+    response = client.post('/api/v1/requests', json={'requests': [
+        {'inventory_number': '1-0000'},
+        {'inventory_number': '1-0001', 'request_type': 'repair_item', 'comment': 'Порвана'},
+        {'inventory_number': 'нет'},
+        {'inventory_number': '1-0000', 'request_type': 'sell'},
+        'abc',
+    ]})
+
+    assert response.status_code == 201
+    results = response.get_json()['results']
+    assert [result.get('status') for result in results] == ['created', 'created', None, None, None]
+    assert results[2]['error'] == 'item нет not found'
+    assert {result['index'] for result in results if 'error' in result} == {2, 3, 4}
+    saved = {req.id: (req.inventory_number, req.request_type) for req in UserRequest.query}
+    assert saved == {results[0]['id']: ('1-0000', 'get_item'), results[1]['id']: ('1-0001', 'repair_item')}
+
+
+def test_returns_only_own_items(client, user, admin):
+    mine = make_items(1, assigned_to=user.id, is_available=False)[0].id
+    make_items(1, prefix='2-', assigned_to=admin.id, is_available=False)
+    login(client, user)
+
+    response = client.post('/api/v1/returns', json={'numbers': ['1-0000', '2-0000', 'нет', '1-0000']})
+
+    assert response.get_json()['results'] == [
+        {'inventory_number': '1-0000', 'status': 'returned'},
+        {'inventory_number': '2-0000', 'status': 'not_assigned'},
+        {'inventory_number': 'нет', 'status': 'not_found'},
+    ]
+    item = db.session.get(InventoryItem, mine)
+    assert item.assigned_to is None and item.is_available
+
+
+def test_admin_decides_requests_in_one_call(client, user, admin):
+    item, = make_items(1)
+    req = UserRequest(user_id=user.id, request_type='get_item', inventory_number=item.inventory_number,
+                      item_id=item.id)
+    db.session.add(req)
+    db.session.commit()
+    req_id = req.id
+    login(client, admin)
+
+    response = client.post('/api/v1/requests/decisions', json={'action': 'approve', 'ids': [req_id, 999]})
+
+    statuses = {result['id']: result['status'] for result in response.get_json()['results']}
+    assert statuses == {req_id: 'approved', 999: 'not_found'}
+    assert client.post('/api/v1/requests/decisions', json={'action': 'delete', 'ids': []}).status_code == 400
+
+
+def test_large_response_is_gzipped(client, user, app, monkeypatch):
+    monkeypatch.setitem(app.config, 'API_COMPRESS_MIN_BYTES', 100)
+    make_items(5)
+    login(client, user)
+
+    plain = client.get('/api/v1/items')
+    packed = client.get('/api/v1/items', headers={'Accept-Encoding': 'gzip'})
+
+    assert 'Content-Encoding' not in plain.headers
+    assert packed.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(packed.get_data())) == plain.get_json()
+    assert 'Accept-Encoding' in packed.headers['Vary']
@@ -0,0 +1,101 @@
+import pytest
+
+from approvals import process_requests
+from events import latest_event_id
+from models import db, ChangeEvent, UserRequest
+
+from conftest import make_items
+
+
+def make_request(user, item, request_type='get_item', **values):
+    user_req = UserRequest(user_id=user.id, request_type=request_type, inventory_number=item.inventory_number,
+                           item_id=item.id, **values)
+    db.session.add(user_req)
+    db.session.commit()
+    return user_req
+
+
+def test_approve_assigns_item(user):
+    item, = make_items(1)
+    user_req = make_request(user, item)
+
+    result, = process_requests([user_req.id], 'approve')
+    db.session.commit()
+
+    assert result.status == 'approved'
+    assert (item.assigned_to, item.is_available) == (user.id, False)
+    assert user_req.status == 'approved' and user_req.processed_at is not None
+
+
+def test_second_request_for_same_item_is_skipped(user):
+    item, = make_items(1)
+    first = make_request(user, item)
+    second = make_request(user, item)
+
+    results = process_requests([first.id, second.id], 'approve')
+    db.session.commit()
+
+    assert [result.status for result in results] == ['approved', 'skipped']
+    assert second.status == 'pending'
+
+
+def test_repair_marks_item_broken(user):
+    item, = make_items(1)
+    user_req = make_request(user, item, request_type='repair_item')
+
+    result, = process_requests([user_req.id], 'approve')
+    db.session.commit()
+
+    assert result.status == 'approved'
+    assert (item.condition, item.is_available) == ('broken', False)
+
+
+def test_reject_leaves_item_alone(user):
+    item, = make_items(1)
+    user_req = make_request(user, item)
+
+    result, = process_requests([user_req.id], 'reject')
+    db.session.commit()
+
+    assert result.status == 'rejected'
+    assert user_req.status == 'rejected'
+    assert (item.assigned_to, item.is_available) == (None, True)
+
+
+def test_processed_duplicate_and_unknown_ids(user):
+    item, = make_items(1)
+    done = make_request(user, item, status='rejected')
+
+    results = process_requests([done.id, done.id, 999], 'approve')
+
+    assert [(result.req_id, result.status) for result in results] == [(done.id, 'skipped'), (999, 'not_found')]
+
+
+def test_missing_item_is_skipped(user):
+    item, = make_items(1)
+    user_req = make_request(user, item)
+    user_req.item_id = None
+    user_req.inventory_number = '9-9999'
+    db.session.commit()
+
+    result, = process_requests([user_req.id], 'approve')
+
+    assert result.status == 'skipped'
+    assert not result.ok
+
+
+def test_unknown_action():
+    with pytest.raises(ValueError):
+        process_requests([1], 'archive')
+
+
+def test_approval_publishes_request_and_item_events(user):
+    item, = make_items(1)
+    user_req = make_request(user, item)
+    before = latest_event_id()
+
+    process_requests([user_req.id], 'approve')
+    db.session.commit()
+
+    topics = db.session.query(ChangeEvent.topic).filter(ChangeEvent.id > before).all()
+    assert sorted(topic for (topic,) in topics) == ['item', 'request']
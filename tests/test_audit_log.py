@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+from audit_log import AuditLogWriter, audit_writer, log_action
+from models import db, ActionLog
+
+
+@pytest.fixture
+def async_mode(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'AUDIT_LOG_MODE', 'async')
+    monkeypatch.setattr(audit_writer, 'flush_interval', 0.05)
+
+
+def actions():
+    return [action for (action,) in db.session.query(ActionLog.action).order_by(ActionLog.id)]
+
+
+def test_strict_row_commits_with_the_action(user):
+    log_action(user.id, 'Logged in')
+    db.session.commit()
+
+    assert actions() == ['Logged in']
+
+
+def test_async_row_waits_for_commit(user, async_mode):
+    log_action(user.id, 'Created item')
+    audit_writer.flush()
+    assert actions() == []
+
+    db.session.commit()
+    audit_writer.flush()
+
+    assert actions() == ['Created item']
+
+
+def test_async_row_is_discarded_on_rollback(user, async_mode):
+    log_action(user.id, 'Created item')
+    db.session.rollback()
+    audit_writer.flush()
+
+    assert actions() == []
+
+
+def test_writer_flushes_in_batches(app, user):
+    writer = AuditLogWriter(batch_size=2, flush_interval=0.05)
+    writer.init_app(app)
+
+    for i in range(5):
+        assert writer.enqueue(user.id, f'Action {i}')
+    writer.flush()
+    writer.stop()
+
+    assert actions() == [f'Action {i}' for i in range(5)]
+    assert writer.stats() == {'queued': 5, 'flushed': 5, 'dropped': 0, 'pending': 0}
+
+
+def test_full_queue_drops_and_counts():
+    writer = AuditLogWriter(queue_size=1, put_timeout=0)
+    # Поток-исполнитель «занят»: очередь никто не разбирает
+    writer._thread, writer._pid = object(), os.getpid()
+
+    assert writer.enqueue(None, 'first')
+    assert not writer.enqueue(None, 'second')
+    assert writer.stats()['dropped'] == 1
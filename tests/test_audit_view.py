@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+from audit_view import generate_audit_ndjson, paginate_audit_log
+from models import db, ActionLog
+
+from conftest import login, make_user
+
+NOW = datetime(2024, 5, 10, 12, 0)
+
+
+def log(user, action, days_ago=0):
+    db.session.add(ActionLog(user_id=user.id if user else None, action=action,
+                             timestamp=NOW - timedelta(days=days_ago)))
+    db.session.commit()
+
+
+def actions(args):
+    page, _ = paginate_audit_log(args)
+    return [row.action for row in page.items]
+
+
+def test_filters_by_user_id_and_login(user):
+    other = make_user('petrov')
+    log(user, 'Returned item #1')
+    log(other, 'Returned item #2')
+
+    assert actions({'user': str(other.id)}) == ['Returned item #2']
+    assert actions({'user': 'ivanov'}) == ['Returned item #1']
+
+
+def test_unknown_login_matches_nothing(user):
+    # Записи удалённых пользователей (user_id IS NULL) не должны попадать под чужой логин
+    log(None, 'Deleted user')
+    log(user, 'Returned item #1')
+
+    assert actions({'user': 'nobody'}) == []
+
+
+def test_action_prefix_is_escaped(user):
+    log(user, 'Returned item #1')
+    log(user, 'Return_x')
+    log(user, 'Created item #2')
+
+    assert actions({'action': 'Returned'}) == ['Returned item #1']
+    assert actions({'action': 'Return_'}) == ['Return_x']
+
+
+def test_date_range_includes_whole_until_day(user):
+    log(user, 'old', days_ago=10)
+    log(user, 'today')
+
+    assert actions({'since': '2024-05-05'}) == ['today']
+    assert actions({'until': '2024-05-10'}) == ['today', 'old']
+    assert actions({'until': '2024-05-09'}) == ['old']
+    assert actions({'since': 'yesterday'}) == ['today', 'old']
+
+
+def test_newest_first_with_cursor(user):
+    for days_ago in range(5):
+        log(user, f'action {days_ago}', days_ago=days_ago)
+
+    first, _ = paginate_audit_log({'per_page': '2'})
+    second, _ = paginate_audit_log({'per_page': '2', 'after': first.next_cursor})
+
+    assert [row.action for row in first.items + second.items] == ['action 0', 'action 1', 'action 2', 'action 3']
+
+
+def test_ndjson_export_uses_same_filters(user):
+    log(user, 'Returned item #1')
+    log(user, 'Created item #2')
+
+    lines = b''.join(generate_audit_ndjson({'action': 'Returned'}, chunk_size=1)).decode().splitlines()
+
+    assert len(lines) == 1 and '"Returned item #1"' in lines[0]
+
+
+def test_audit_json_endpoint(client, admin, user):
+    log(user, 'Returned item #1')
+    login(client, admin)
+
+    response = client.get('/admin/audit.json', query_string={'user': 'nobody'})
+
+    assert response.status_code == 200
+    assert response.get_json()['items'] == []
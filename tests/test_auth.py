@@ -0,0 +1,71 @@
+import pytest
+from flask import g, session
+
+from auth import current_user, user_cache
+from models import db, User
+
+from conftest import make_user
+
+
+@pytest.fixture
+def user_cache_on(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'CURRENT_USER_CACHE_TTL', 60)
+    monkeypatch.setitem(app.config, 'CURRENT_USER_CACHE_VERSION_INTERVAL', 0)
+    user_cache.clear()
+    yield
+    user_cache.clear()
+
+
+def request_user(app, user_id, username):
+    with app.test_request_context():
+        # Контекст приложения (и g) общий с тестом — иначе вернулся бы пользователь прошлого вызова
+        g.pop('current_user', None)
+        session['user_id'] = user_id
+        session['username'] = username
+        user = current_user()
+        return None if user is None else (user.id, user.role)
+
+
+def change_elsewhere(monkeypatch, change):
+    """Изменение «в другом воркере»: слушатели этого процесса кэш не сбрасывают."""
+    with monkeypatch.context() as patch:
+        patch.setattr(user_cache, 'invalidate', lambda user_id: None)
+        change()
+        db.session.commit()
+    db.session.remove()
+
+
+def test_cached_user_is_served_without_loading(app, user_cache_on):
+    user = make_user('petrov')
+    request_user(app, user.id, 'petrov')
+
+    assert user_cache.get(user.id) is not None
+    assert request_user(app, user.id, 'petrov') == (user.id, 'user')
+
+
+def test_role_change_in_another_worker_drops_cache(app, user_cache_on, monkeypatch):
+    user = make_user('petrov')
+    user_id = user.id
+    request_user(app, user_id, 'petrov')
+
+    change_elsewhere(monkeypatch, lambda: setattr(db.session.get(User, user_id), 'role', 'admin'))
+
+    assert request_user(app, user_id, 'petrov') == (user_id, 'admin')
+
+
+def test_delete_in_another_worker_drops_cache(app, user_cache_on, monkeypatch):
+    user_id = make_user('petrov').id
+    request_user(app, user_id, 'petrov')
+
+    change_elsewhere(monkeypatch, lambda: db.session.delete(db.session.get(User, user_id)))
+
+    assert request_user(app, user_id, 'petrov') is None
+
+
+def test_entry_read_under_old_version_is_not_cached(app, user_cache_on):
+    user = make_user('petrov')
+    user_cache.sync_version(lambda: 1, 0)
+
+    user_cache.put(user.id, user, 60, version=0)
+
+    assert user_cache.get(user.id) is None
@@ -0,0 +1,95 @@
+import pytest
+from sqlalchemy import delete, update
+
+import item_sync
+from availability_index import availability_index
+from item_sync import publish_items
+from models import db, InventoryItem, User
+
+from conftest import build_index, login, make_items, make_user
+
+
+def held_numbers(user_id):
+    return [item.inventory_number for item in availability_index.held_by(user_id)]
+
+
+@pytest.fixture
+def holder(user, monkeypatch):
+    """Пользователь с тремя предметами; индекс собран по пяти (сборка закрывает сессию — user перечитан)."""
+    user_id = user.id
+    make_items(3, assigned_to=user_id, is_available=False)
+    make_items(2, prefix='2-')
+    build_index(availability_index, monkeypatch)
+    return db.session.get(User, user_id)
+
+
+def test_not_ready_index_sends_callers_to_db(user):
+    make_items(1)
+
+    assert availability_index.find('1-0000') is None
+    assert availability_index.held_by(user.id) is None
+
+
+def test_lookups_after_build(holder):
+    item = availability_index.find('2-0001')
+
+    assert (item.inventory_number, item.condition, item.is_available, item.assigned_to) == ('2-0001', 'new', True, None)
+    assert availability_index.get(item.id) == item
+    assert availability_index.find('3-0000') is None
+    assert held_numbers(holder.id) == ['1-0000', '1-0001', '1-0002']
+    assert availability_index.stats()['held'] == 3
+
+
+def test_orm_changes_are_written_through_on_commit(holder):
+    other = make_user('petrov')
+    returned = InventoryItem.query.filter_by(inventory_number='1-0001').one()
+    returned.assigned_to, returned.is_available = None, True
+    InventoryItem.query.filter_by(inventory_number='2-0000').one().assigned_to = other.id
+    InventoryItem.query.filter_by(inventory_number='2-0001').one().inventory_number = '2-0099'
+    db.session.delete(InventoryItem.query.filter_by(inventory_number='1-0002').one())
+    db.session.commit()
+
+    assert held_numbers(holder.id) == ['1-0000']
+    assert held_numbers(other.id) == ['2-0000']
+    assert availability_index.find('1-0001').is_available
+    assert availability_index.find('2-0001') is None
+    assert availability_index.find('2-0099').inventory_number == '2-0099'
+    assert availability_index.find('1-0002') is None
+
+
+def test_catch_up_reads_rows_changed_outside_orm(holder):
+    assigned = InventoryItem.query.filter_by(inventory_number='2-0000').one().id
+    removed = InventoryItem.query.filter_by(inventory_number='1-0000').one().id
+    db.session.execute(update(InventoryItem).where(InventoryItem.id == assigned).values(
+        assigned_to=holder.id, is_available=False, condition='broken'))
+    db.session.execute(delete(InventoryItem).where(InventoryItem.id == removed))
+    publish_items(ids=[assigned, removed])
+    db.session.commit()
+
+    assert availability_index.catch_up(availability_index.version)
+
+    assert held_numbers(holder.id) == ['1-0001', '1-0002', '2-0000']
+    assert availability_index.get(assigned).condition == 'broken'
+    assert availability_index.get(removed) is None
+
+
+def test_many_point_changes_trigger_compaction(holder, monkeypatch):
+    monkeypatch.setattr(item_sync, 'COMPACT_MIN_CHANGES', 1)
+    for number in ('2-0000', '2-0001'):
+        InventoryItem.query.filter_by(inventory_number=number).one().inventory_number = number + 'a'
+    db.session.commit()
+    assert availability_index.compaction_due()
+
+    availability_index.build()
+
+    assert availability_index.pending_changes() == 0
+    assert availability_index.find('2-0001a').inventory_number == '2-0001a'
+
+
+def test_return_page_lists_items_from_index(client, holder):
+    login(client, holder)
+
+    body = client.get('/user/return_items').get_data(as_text=True)
+
+    assert all(number in body for number in ('1-0000', '1-0001', '1-0002'))
+    assert '2-0000' not in body
@@ -0,0 +1,93 @@
+import io
+
+from sqlalchemy import event
+
+from bulk_import import MAX_NAME_LENGTH, iter_records, import_inventory
+from models import db, InventoryItem
+from stats import compute_counters, get_counters, reconcile_counters
+
+from conftest import make_items
+
+
+def records(text, fmt='csv'):
+    return iter_records(io.BytesIO(text.encode('utf-8')), fmt)
+
+
+def items():
+    return {item.inventory_number: (item.name, item.condition) for item in InventoryItem.query}
+
+
+def test_csv_import_with_export_headers():
+    report = import_inventory(records('InventoryNumber,Name,Condition\n1-1,Мяч,new\n1-2,,broken\n'))
+
+    assert report.to_dict()['inserted'] == 2
+    assert items() == {'1-1': ('Мяч', 'new'), '1-2': ('Без названия', 'broken')}
+
+
+def test_ndjson_errors_are_reported_per_line():
+    text = '{"inventory_number": "1-1"}\nnot json\n[1]\n{"inventory_number": "abc"}\n' \
+           '{"inventory_number": "1-2", "condition": "lost"}\n{"inventory_number": "1-1"}\n'
+
+    report = import_inventory(records(text, 'ndjson'))
+
+    assert report.inserted == 1
+    assert [error['line'] for error in report.errors] == [2, 3, 4, 5, 6]
+    assert report.errors[-1]['error'] == 'Duplicate inventory number in file'
+
+
+def test_length_limits_are_checked_before_insert():
+    rows = [(1, {'inventory_number': '1' * 51}), (2, {'inventory_number': '1-2', 'name': 'x' * (MAX_NAME_LENGTH + 1)}),
+            (3, {'inventory_number': '1-3'})]
+
+    report = import_inventory(iter(rows))
+
+    assert (report.inserted, report.failed) == (1, 2)
+    assert list(items()) == ['1-3']
+
+
+def test_existing_numbers_fail_without_upsert_and_update_with_it():
+    make_items(1, prefix='1-', name='Старое')
+
+    report = import_inventory(iter([(1, {'inventory_number': '1-0000', 'name': 'Новое', 'condition': 'broken'})]))
+    assert report.errors[0]['error'] == 'Inventory number already exists'
+
+    report = import_inventory(iter([(1, {'inventory_number': '1-0000', 'name': 'Новое', 'condition': 'broken'})]),
+                              upsert=True)
+    assert report.updated == 1
+    db.session.expire_all()
+    assert items() == {'1-0000': ('Новое', 'broken')}
+
+
+def test_batches_commit_separately_and_keep_counters():
+    reconcile_counters()
+    make_items(2, prefix='1-', condition='in_use')
+    rows = [(line, {'inventory_number': f'1-{line:04d}', 'condition': 'new'}) for line in range(5)]
+
+    report = import_inventory(iter(rows), upsert=True, batch_size=2)
+
+    assert (report.inserted, report.updated) == (3, 2)
+    counters = get_counters()
+    assert all(counters.get(name, 0) == value for name, value in compute_counters().items())
+
+
+def test_failed_batch_is_rolled_back_and_reported(app):
+    # Номер «занимают» между проверкой уникальности и INSERT — как параллельный импорт
+    calls = []
+
+    @event.listens_for(db.engine, 'before_cursor_execute')
+    def insert_duplicate(connection, cursor, statement, parameters, context, executemany):
+        if statement.startswith('INSERT INTO inventory_items') and not calls:
+            calls.append(statement)
+            cursor.execute("INSERT INTO inventory_items (inventory_number, name, condition, is_available) "
+                           "VALUES ('2-2', 'race', 'new', 1)")
+
+    try:
+        report = import_inventory(iter([(1, {'inventory_number': '2-1'}), (2, {'inventory_number': '2-2'}),
+                                        (3, {'inventory_number': '2-3'})]), batch_size=2)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', insert_duplicate)
+
+    assert report.inserted == 1
+    assert [(error['line'], error['error'].startswith('Batch rolled back')) for error in report.errors] == \
+        [(1, True), (2, True)]
+    assert list(items()) == ['2-3']
@@ -0,0 +1,96 @@
+import pytest
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import create_engine, insert
+
+import db_routing
+from db_routing import ReplicaRouter, RoutingSession, init_db_routing, read_replica
+
+
+@pytest.fixture
+def routed(tmp_path, monkeypatch):
+    """Отдельное приложение: основная БД и реплика — разные файлы SQLite с разным содержимым."""
+    router = ReplicaRouter(sticky_seconds=60)
+    # Проверку здоровья реплик ведёт тест, фоновый поток не нужен
+    router._thread, router._pid = object(), db_routing.os.getpid()
+    monkeypatch.setattr(db_routing, 'replica_router', router)
+
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tmp_path}/primary.db'
+    app.config['SQLALCHEMY_BINDS'] = {'replica_0': f'sqlite:///{tmp_path}/replica.db'}
+    db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+
+    class Note(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        text = db.Column(db.String(20))
+
+    init_db_routing(app, db)
+    with app.app_context():
+        for key in (None, 'replica_0'):
+            with db.engines[key].begin() as connection:
+                Note.__table__.create(connection)
+                connection.execute(insert(Note).values(text='replica' if key else 'primary'))
+
+    def first_note():
+        return db.session.query(Note.text).order_by(Note.id).limit(1).scalar()
+
+    @app.route('/read', methods=['GET', 'POST'])
+    @read_replica
+    def read():
+        return first_note()
+
+    @app.route('/locked')
+    @read_replica
+    def locked():
+        return db.session.query(Note.text).order_by(Note.id).limit(1).with_for_update().scalar()
+
+    @app.route('/write', methods=['POST'])
+    @read_replica(methods=('POST',))
+    def write():
+        db.session.add(Note(text='new'))
+        db.session.flush()
+        text = first_note()
+        db.session.commit()
+        return text
+
+    @app.route('/plain')
+    def plain():
+        return first_note()
+
+    return app.test_client(), router
+
+
+def test_get_of_read_replica_view_reads_replica(routed):
+    client, _ = routed
+    assert client.get('/read').get_data(as_text=True) == 'replica'
+    assert client.post('/read').get_data(as_text=True) == 'primary'
+    assert client.get('/plain').get_data(as_text=True) == 'primary'
+    assert client.get('/locked').get_data(as_text=True) == 'primary'
+
+
+def test_reads_after_write_stay_on_primary(routed):
+    client, _ = routed
+
+    assert client.post('/write').get_data(as_text=True) == 'primary'
+    # Сессия пользователя ещё sticky_seconds читает с основной
+    assert client.get('/read').get_data(as_text=True) == 'primary'
+
+    with client.session_transaction() as session:
+        session[db_routing.STICKY_SESSION_KEY] = 0
+    assert client.get('/read').get_data(as_text=True) == 'replica'
+
+
+def test_unhealthy_replica_leaves_rotation(routed):
+    client, router = routed
+    router.mark_unhealthy('replica_0')
+
+    assert router.healthy_count() == 0
+    assert client.get('/read').get_data(as_text=True) == 'primary'
+
+
+def test_health_check(tmp_path):
+    router = ReplicaRouter()
+
+    assert router.check(create_engine('sqlite://'))
+    assert not router.check(create_engine(f'sqlite:///{tmp_path}/missing/replica.db'))
@@ -0,0 +1,98 @@
+import pytest
+
+import config
+import events
+from events import Subscriber, event_bus, latest_event_id
+from models import db, UserRequest
+
+from conftest import login, make_items, make_user
+
+
+@pytest.fixture(autouse=True)
+def short_streams(monkeypatch):
+    # Поток завершается сразу после пропущенных событий — тесту не нужно ждать EVENTS_STREAM_TIMEOUT
+    monkeypatch.setattr(config, 'EVENTS_STREAM_TIMEOUT', 0)
+
+
+def read_stream(client, last_event_id=None, **query):
+    headers = {'Last-Event-ID': str(last_event_id)} if last_event_id is not None else {}
+    response = client.get('/events', headers=headers, query_string=query)
+    assert response.status_code == 200
+    return response.get_data(as_text=True)
+
+
+def event_ids(body, topic):
+    blocks = [block.splitlines() for block in body.split('\n\n')]
+    return [int(lines[0][len('id: '):]) for lines in blocks
+            if len(lines) > 1 and lines[1] == f'event: {topic}']
+
+
+def test_replays_events_after_last_event_id(client, user):
+    item, = make_items(1)
+    start = latest_event_id()
+    item.name = 'Сетка'
+    db.session.commit()
+    login(client, user)
+
+    body = read_stream(client, last_event_id=start)
+
+    replayed = event_ids(body, 'item')
+    assert replayed == [latest_event_id()]
+    assert '"name": "Сетка"' in body
+    # Последняя строка сдвигает Last-Event-ID клиента на конец пересланного
+    assert body.rstrip().endswith(f'id: {latest_event_id()}')
+
+
+def test_last_event_id_header_wins_over_query(client, user):
+    item, = make_items(1)
+    start = latest_event_id()
+    item.condition = 'broken'
+    db.session.commit()
+    login(client, user)
+
+    assert event_ids(read_stream(client, last_event_id=latest_event_id(), after=start), 'item') == []
+
+
+def test_user_sees_only_own_requests(client, user):
+    other = make_user('petrov')
+    item, = make_items(1)
+    start = latest_event_id()
+    for owner in (user, other):
+        user_req = UserRequest(user_id=owner.id, request_type='get_item', inventory_number=item.inventory_number)
+        db.session.add(user_req)
+        db.session.flush()
+        events.publish_request(user_req)
+    db.session.commit()
+    login(client, user)
+
+    body = read_stream(client, last_event_id=start)
+
+    assert len(event_ids(body, 'request')) == 1
+    assert f'"user_id": {user.id}' in body and f'"user_id": {other.id}' not in body
+
+
+def test_too_many_missed_events_ask_for_reload(client, user, monkeypatch):
+    monkeypatch.setattr(events, 'EVENTS_REPLAY_LIMIT', 1)
+    items = make_items(2)
+    start = latest_event_id()
+    for item in items:
+        item.name = 'Сетка'
+    db.session.commit()
+    login(client, user)
+
+    assert 'event: reset' in read_stream(client, last_event_id=start)
+
+
+def test_over_stream_cap_falls_back_to_retry(client, user, monkeypatch):
+    event_bus.ensure_started()
+    monkeypatch.setattr(event_bus, 'max_streams', 1)
+    monkeypatch.setattr(event_bus, '_subscribers', {Subscriber(0, False)})
+    login(client, user)
+
+    body = read_stream(client)
+
+    assert body.startswith(f'retry: {config.EVENTS_FALLBACK_RETRY * 1000}')
+
+
+def test_anonymous_is_rejected(client):
+    assert client.get('/events').status_code == 401
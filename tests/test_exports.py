@@ -0,0 +1,65 @@
+import csv
+import io
+import json
+
+from exports import generate_inventory_csv, generate_inventory_json, generate_inventory_ndjson, iter_chunks
+from models import InventoryItem
+
+from conftest import login, make_items
+
+
+def test_iter_chunks_walks_table_by_key():
+    make_items(5)
+
+    chunks = list(iter_chunks((InventoryItem.id, InventoryItem.inventory_number), InventoryItem.id, chunk_size=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert [row.inventory_number for chunk in chunks for row in chunk] == [f'1-{i:04d}' for i in range(5)]
+
+
+def test_csv_has_bom_header_and_all_rows(user):
+    make_items(3, assigned_to=user.id, is_available=False)
+
+    data = b''.join(generate_inventory_csv(chunk_size=2)).decode('utf-8')
+
+    assert data.startswith('\ufeff')
+    rows = list(csv.reader(io.StringIO(data.lstrip('\ufeff'))))
+    assert rows[0] == ['ID', 'InventoryNumber', 'Name', 'Condition', 'is_available', 'assigned_to']
+    assert [row[1] for row in rows[1:]] == ['1-0000', '1-0001', '1-0002']
+    assert rows[1][4:] == ['Нет', str(user.id)]
+
+
+def test_json_matches_indented_dump():
+    make_items(3)
+
+    data = b''.join(generate_inventory_json(chunk_size=2)).decode('utf-8')
+
+    items = json.loads(data)
+    assert data == json.dumps(items, ensure_ascii=False, indent=2)
+    assert [item['inventory_number'] for item in items] == ['1-0000', '1-0001', '1-0002']
+
+
+def test_json_of_empty_table():
+    assert b''.join(generate_inventory_json()) == b'[]'
+
+
+def test_ndjson_one_object_per_line():
+    make_items(3)
+
+    lines = b''.join(generate_inventory_ndjson(chunk_size=2)).decode('utf-8').splitlines()
+
+    assert [json.loads(line)['inventory_number'] for line in lines] == ['1-0000', '1-0001', '1-0002']
+
+
+def test_export_routes_stream_attachments(client, admin):
+    make_items(2)
+    login(client, admin)
+
+    for path, mimetype in (('/admin/export_csv', 'text/csv'), ('/admin/export_json', 'application/json'),
+                           ('/admin/export_ndjson', 'application/x-ndjson')):
+        response = client.get(path)
+        assert response.status_code == 200
+        assert response.mimetype == mimetype
+        assert response.headers['Content-Disposition'].startswith('attachment;')
+        assert response.is_streamed
+        assert b'1-0001' in response.get_data()
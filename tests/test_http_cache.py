@@ -0,0 +1,85 @@
+from flask import g
+
+from http_cache import FragmentCache, fragment_cache
+from models import db, InventoryItem
+
+from conftest import login, make_items, make_user
+
+
+def get(client, path, **kwargs):
+    # Запросы теста идут в одном app context: версии таблиц, прочитанные прошлым запросом, сбрасываем
+    g.pop('table_versions', None)
+    return client.get(path, **kwargs)
+
+
+def test_fragment_cache_evicts_least_recently_used():
+    cache = FragmentCache(max_entries=2, max_bytes=10)
+    cache.set('a', 'aaaa')
+    cache.set('b', 'bbbb')
+    cache.get('a')
+    cache.set('c', 'cccc')
+
+    assert cache.get('b') is None
+    assert cache.get('a') == ('aaaa', None)
+    cache.set('d', 'dddddddd')
+    assert cache.stats()['entries'] == 1 and cache.stats()['bytes'] == 8
+    cache.set('huge', 'x' * 11)
+    assert cache.get('huge') is None
+
+
+def test_matching_etag_gets_304(client, admin):
+    make_items(2)
+    login(client, admin)
+
+    first = get(client, '/admin/inventory')
+    again = get(client, '/admin/inventory', headers={'If-None-Match': first.headers['ETag']})
+
+    assert first.status_code == 200 and first.headers['Cache-Control'] == 'private, no-cache'
+    assert again.status_code == 304
+    assert again.headers['ETag'] == first.headers['ETag']
+    assert again.get_data() == b''
+
+
+def test_etag_changes_with_table_url_and_user(client, admin):
+    item, = make_items(1)
+    login(client, admin)
+    etag = get(client, '/admin/inventory').headers['ETag']
+
+    assert get(client, '/admin/inventory', query_string={'q': 'Мяч'}).headers['ETag'] != etag
+
+    item.name = 'Сетка'
+    db.session.commit()
+    response = get(client, '/admin/inventory', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'Сетка' in response.get_data(as_text=True)
+
+    other = make_user('admin2', role='admin')
+    login(client, other)
+    assert get(client, '/admin/inventory', headers={'If-None-Match': response.headers['ETag']}).status_code == 200
+
+
+def test_fragment_is_reused_until_items_change(client, admin):
+    item, = make_items(1)
+    login(client, admin)
+
+    get(client, '/admin/inventory')
+    hits = fragment_cache.stats()['hits']
+    get(client, '/admin/inventory')
+    assert fragment_cache.stats()['hits'] == hits + 1
+
+    item.name = 'Сетка'
+    db.session.commit()
+    body = get(client, '/admin/inventory').get_data(as_text=True)
+    assert fragment_cache.stats()['hits'] == hits + 1
+    assert 'Сетка' in body
+
+
+def test_page_with_flash_is_not_cached(client, admin):
+    login(client, admin)
+    with client.session_transaction() as session:
+        session['_flashes'] = [('info', 'Готово')]
+
+    response = get(client, '/admin/inventory')
+
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from jobs import JobContext, job_runner
+from models import db, InventoryItem, Job, User, UserRequest
+from stats import compute_counters, get_counters, reconcile_counters
+
+from conftest import make_items, make_user
+
+
+def add_job(kind, **params):
+    # Без enqueue(): он будит поток JobRunner, а тест выполняет задачу сам
+    job = Job(kind=kind, params=json.dumps(params))
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+
+def run_next_job():
+    job_id = job_runner._claim()
+    assert job_id is not None
+    job_runner._execute(job_id)
+    return db.session.get(Job, job_id)
+
+
+def test_claim_takes_each_job_once():
+    first = add_job('export_inventory', fmt='csv')
+    second = add_job('export_inventory', fmt='csv')
+
+    assert job_runner._claim() == first
+    assert job_runner._claim() == second
+    assert job_runner._claim() is None
+    assert {job.status for job in Job.query} == {'running'}
+
+
+def test_failed_job_records_message():
+    add_job('export_inventory', fmt='xml')
+
+    job = run_next_job()
+
+    assert job.status == 'failed'
+    assert 'xml' in job.message
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'json', 'ndjson'])
+def test_export_progress_counts_written_rows(app, tmp_path, monkeypatch, fmt):
+    app.config['JOBS_EXPORT_DIR'] = str(tmp_path)
+    reconcile_counters()
+    make_items(3)
+    reports = []
+    monkeypatch.setattr(JobContext, 'progress', lambda self, done, total=None, message=None: reports.append((done, total)))
+    add_job('export_inventory', fmt=fmt)
+
+    job = run_next_job()
+
+    assert job.status == 'succeeded'
+    # Заголовок / '[' строк не содержит — отчёт только после чанка со строками
+    assert reports == [(3, 3)]
+    assert (tmp_path / f'inventory_job{job.id}.{fmt}').stat().st_size == json.loads(job.result)['size']
+
+
+def test_delete_user_releases_items_and_drops_requests(admin):
+    reconcile_counters()
+    owner_id = make_user('petrov').id
+    held = [item.id for item in make_items(2, assigned_to=owner_id, is_available=False)]
+    make_items(1, prefix='2-')
+    db.session.add_all([UserRequest(user_id=owner_id, request_type='get_item', inventory_number='2-0000'),
+                        UserRequest(user_id=owner_id, request_type='repair_item', inventory_number='1-0000',
+                                    status='approved')])
+    db.session.commit()
+    add_job('delete_user', user_id=owner_id)
+
+    job = run_next_job()
+
+    result = json.loads(job.result)
+    assert result == {'deleted': True, 'username': 'petrov', 'released_items': 2, 'deleted_requests': 2}
+    db.session.expire_all()
+    assert db.session.get(User, owner_id) is None
+    assert UserRequest.query.count() == 0
+    assert all(db.session.get(InventoryItem, item_id).is_available for item_id in held)
+    counters = get_counters()
+    for name, value in compute_counters().items():
+        assert counters.get(name, 0) == value, name
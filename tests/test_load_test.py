@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.load_test import (ADMIN_STEPS, USER_STEPS, FlaskClient, Recorder, VirtualUser, compare,
+                                  load_scenario_data)
+from benchmarks.seed import SEED_PASSWORD, seed
+
+
+def play_every_step(vu, recorder):
+    """Вход и по одному разу каждый шаг сценария."""
+    vu.run(0, 0, recorder)
+    for name, _, step in vu.steps:
+        call = step(vu)
+        if call is not None:
+            status, size = vu.client.request(*call)
+            recorder.record(name, 0.001, status, size, ok=status < 400)
+
+
+def test_scenario_steps_hit_working_routes(app):
+    counts = seed(users=3, items=20, requests=30, plans=3, logs=20)
+    assert counts['inventory_items'] == 20
+    data = load_scenario_data(app)
+    recorder = Recorder()
+    virtual_users = [VirtualUser(FlaskClient(app), data.usernames[0], SEED_PASSWORD, USER_STEPS, data, 1),
+                     VirtualUser(FlaskClient(app), 'admin', SEED_PASSWORD, ADMIN_STEPS, data, 2)]
+
+    # Как в load_test.py — каждый виртуальный пользователь в своём потоке (и своём контексте запроса)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        for vu in virtual_users:
+            pool.submit(play_every_step, vu, recorder).result()
+
+    result = recorder.summary(1.0)
+    assert result['errors'] == 0, {name: route['statuses'] for name, route in result['routes'].items()}
+    assert result['routes']['POST /login']['count'] == 2
+    assert set(result['routes']) >= {name for name, _, _ in USER_STEPS + ADMIN_STEPS}
+
+
+def test_compare_flags_p95_regressions(tmp_path, capsys):
+    def report(name, p95):
+        path = tmp_path / name
+        path.write_text('{"rps": 10, "routes": {"GET /": {"p50_ms": 1.0, "p95_ms": %s}}}' % p95)
+        return str(path)
+
+    assert compare(report('base.json', 10.0), report('same.json', 11.0), threshold=20.0) == 0
+    assert compare(report('base.json', 10.0), report('slow.json', 13.0), threshold=20.0) == 1
+    assert 'p95 regressed' in capsys.readouterr().out
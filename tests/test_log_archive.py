@@ -0,0 +1,54 @@
+import os
+from datetime import datetime, timedelta
+
+from log_archive import archive_action_logs, iter_archive, retention_cutoff
+from models import db, ActionLog
+
+NOW = datetime(2024, 6, 1)
+
+
+def add_logs(user, days_ago):
+    db.session.add_all(ActionLog(user_id=user.id, action=f'Action {days}', timestamp=NOW - timedelta(days=days))
+                       for days in days_ago)
+    db.session.commit()
+
+
+def remaining():
+    return [action for (action,) in db.session.query(ActionLog.action).order_by(ActionLog.id)]
+
+
+def test_retention_cutoff():
+    assert retention_cutoff(180, now=NOW) == NOW - timedelta(days=180)
+
+
+def test_old_rows_are_archived_then_deleted(user, tmp_path):
+    add_logs(user, [400, 300, 200, 10, 1])
+    reported = []
+
+    report = archive_action_logs(retention_cutoff(180, now=NOW), str(tmp_path), chunk_size=2, delete_batch=1,
+                                 progress=reported.append)
+
+    assert (report.archived, report.deleted) == (3, 3)
+    assert reported == [2, 3]
+    assert [row['action'] for row in iter_archive(report.path)] == ['Action 400', 'Action 300', 'Action 200']
+    assert os.listdir(tmp_path) == [os.path.basename(report.path)]
+    assert remaining() == ['Action 10', 'Action 1']
+
+
+def test_dry_run_only_counts(user, tmp_path):
+    add_logs(user, [400, 300, 1])
+
+    report = archive_action_logs(retention_cutoff(180, now=NOW), str(tmp_path), dry_run=True)
+
+    assert (report.archived, report.deleted, report.path) == (2, 0, None)
+    assert os.listdir(tmp_path) == []
+    assert len(remaining()) == 3
+
+
+def test_nothing_old_writes_no_file(user, tmp_path):
+    add_logs(user, [1])
+
+    report = archive_action_logs(retention_cutoff(180, now=NOW), str(tmp_path / 'archive'))
+
+    assert report.to_dict()['path'] is None
+    assert not (tmp_path / 'archive').exists()
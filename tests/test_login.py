@@ -0,0 +1,106 @@
+import pytest
+from werkzeug.security import generate_password_hash
+
+import rate_limit
+from auth import authenticate
+from models import db, User
+from passwords import password_hasher
+from rate_limit import FailureLimiter, login_ip_limiter, login_user_limiter
+
+CHEAP_METHOD = 'pbkdf2:sha256:1000'
+
+
+@pytest.fixture(autouse=True)
+def fresh_limiters(monkeypatch):
+    for limiter in (login_user_limiter, login_ip_limiter):
+        monkeypatch.setattr(limiter, '_failures', type(limiter._failures)())
+    # Быстрый хеш: тестам нужна смена параметров, а не стойкость
+    monkeypatch.setattr(password_hasher, 'method', CHEAP_METHOD)
+    monkeypatch.setattr(password_hasher, '_prefix', None)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def make_login_user(username, password, method=CHEAP_METHOD):
+    user = User(username=username, password_hash=generate_password_hash(password, method), role='user')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def test_limiter_blocks_within_window(clock):
+    limiter = FailureLimiter(max_failures=2, window=60)
+    limiter.add_failure('ivanov')
+    assert limiter.retry_after('ivanov') == 0
+
+    clock[0] += 10
+    limiter.add_failure('ivanov')
+    assert limiter.retry_after('ivanov') == 51
+
+    # Самая старая неудача вышла из окна — снова можно
+    clock[0] += 51
+    assert limiter.retry_after('ivanov') == 0
+    limiter.add_failure('ivanov')
+    limiter.reset('ivanov')
+    assert limiter.retry_after('ivanov') == 0
+
+
+def test_limiter_forgets_least_recent_keys(clock):
+    limiter = FailureLimiter(max_failures=1, window=60, max_keys=2)
+    for key in ('a', 'b', 'c'):
+        limiter.add_failure(key)
+
+    assert limiter.retry_after('a') == 0
+    assert limiter.retry_after('c') > 0
+
+
+def test_failures_throttle_login_before_password_check(app, monkeypatch):
+    make_login_user('ivanov', 'secret')
+    for _ in range(login_user_limiter.max_failures):
+        assert authenticate('ivanov', 'wrong', '10.0.0.1').status == 'invalid'
+    monkeypatch.setattr(password_hasher, 'verify', lambda *args: pytest.fail('password checked while throttled'))
+
+    with app.test_request_context():
+        result = authenticate('ivanov', 'secret', '10.0.0.2')
+
+    assert result.status == 'throttled' and result.retry_after > 0
+
+
+def test_login_route_answers_429_with_retry_after(client):
+    make_login_user('ivanov', 'secret')
+    for _ in range(login_user_limiter.max_failures):
+        client.post('/login', data={'username': 'ivanov', 'password': 'wrong'})
+
+    response = client.post('/login', data={'username': 'ivanov', 'password': 'secret'})
+
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) > 0
+
+
+def test_success_resets_user_failures(app):
+    make_login_user('ivanov', 'secret')
+    for _ in range(login_user_limiter.max_failures - 1):
+        authenticate('ivanov', 'wrong', '10.0.0.1')
+
+    with app.test_request_context():
+        assert authenticate('ivanov', 'secret', '10.0.0.1').ok
+
+    assert login_user_limiter.retry_after('ivanov') == 0
+
+
+def test_old_hash_is_rehashed_on_login(app):
+    user = make_login_user('ivanov', 'secret', method='pbkdf2:sha256:500')
+
+    with app.test_request_context():
+        assert authenticate('ivanov', 'secret', '10.0.0.1').ok
+    db.session.commit()
+
+    password_hash = db.session.get(User, user.id).password_hash
+    assert password_hash.startswith(CHEAP_METHOD + '$')
+    assert password_hasher.verify(password_hash, 'secret')
+    assert not password_hasher.needs_rehash(password_hash)
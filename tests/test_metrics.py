@@ -0,0 +1,77 @@
+import gc
+import json
+
+import config
+from metrics import RequestMetrics, _CountedBody, request_metrics
+
+from conftest import login
+
+
+def test_histograms_are_cumulative():
+    metrics = RequestMetrics()
+    metrics.record('index GET', 200, 0.003, 2, 0.001, 0.0005, size=500)
+    metrics.record('index GET', 200, 0.2, 4, 0.1, 0.05, size=2048)
+    metrics.record('index GET', 500, 20.0, 0, 0.0, 0.0)
+
+    text = metrics.render()
+
+    assert 'http_requests_total{endpoint="index",method="GET",status="200"} 2' in text
+    assert 'http_requests_total{endpoint="index",method="GET",status="500"} 1' in text
+    assert 'http_request_duration_seconds_bucket{endpoint="index",method="GET",le="0.005"} 1' in text
+    assert 'http_request_duration_seconds_bucket{endpoint="index",method="GET",le="0.25"} 2' in text
+    assert 'http_request_duration_seconds_count{endpoint="index",method="GET"} 3' in text
+    assert 'http_response_size_bytes_count{endpoint="index",method="GET"} 2' in text
+    assert 'http_request_sql_queries_total{endpoint="index",method="GET"} 6' in text
+
+
+def test_snapshots_of_other_workers_are_summed(tmp_path):
+    metrics = RequestMetrics()
+    metrics.metrics_dir = str(tmp_path)
+    metrics.add_collector('queue_pending', 'gauge', 'Queue.', lambda: 1)
+    metrics.add_collector('queue_dropped_total', 'counter', 'Dropped.', lambda: 1)
+    metrics.record('index GET', 200, 0.01, 0, 0.0, 0.0)
+    # Снимок завершённого воркера: его счётчики остаются в сумме, gauge — нет
+    other = dict(metrics.snapshot(), pid=2 ** 22 + 1, collected={'queue_pending': 5, 'queue_dropped_total': 3})
+    (tmp_path / 'metrics_other.json').write_text(json.dumps(other))
+
+    text = metrics.render()
+
+    assert 'http_requests_total{endpoint="index",method="GET",status="200"} 2' in text
+    assert 'queue_pending 1\n' in text
+    assert 'queue_dropped_total 4\n' in text
+
+
+def test_metrics_route_counts_requests(client, admin):
+    login(client, admin)
+    client.get('/admin/inventory')
+
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert 'http_requests_total{endpoint="admin_inventory",method="GET",status="200"}' in response.get_data(as_text=True)
+
+
+def test_metrics_route_access(client, user, monkeypatch):
+    login(client, user)
+    assert client.get('/metrics').status_code == 403
+
+    monkeypatch.setattr(config, 'METRICS_TOKEN', 'secret')
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
+
+
+def test_streamed_size_is_recorded_once_on_close():
+    metrics = request_metrics
+    body = _CountedBody(iter([b'ab', b'c', b'd']), 'test_stream GET')
+    chunks = iter(body)
+    next(chunks)
+    # Брошенный недочитанный ответ собирается сборщиком мусора, пока кто-то держит блокировку метрик
+    with metrics._lock:
+        del chunks
+        gc.collect()
+    before = metrics.snapshot()['endpoints'].get('test_stream GET', {}).get('size_sum', 0)
+
+    body.close()
+    body.close()
+
+    assert metrics.snapshot()['endpoints']['test_stream GET']['size_sum'] == before + 2
@@ -0,0 +1,54 @@
+from sqlalchemy import create_engine, inspect, text
+
+from migrations import MIGRATIONS, _create_missing_indexes, _user_request_item_fk, upgrade_schema
+from models import db, InventoryItem, UserRequest
+
+
+def test_upgrade_is_idempotent_and_records_revisions():
+    # Фикстура app очищает и schema_migrations: первый вызов заново применяет ревизии к готовой схеме
+    upgrade_schema()
+    assert upgrade_schema() == []
+    applied = {version for (version,) in db.session.execute(text('SELECT version FROM schema_migrations'))}
+    assert applied == {version for version, _ in MIGRATIONS}
+
+
+def test_hot_lookup_indexes_exist():
+    inspector = inspect(db.engine)
+    for model in (InventoryItem, UserRequest):
+        existing = {index['name'] for index in inspector.get_indexes(model.__tablename__)}
+        assert {index.name for index in model.__table__.indexes} <= existing
+
+
+def test_item_fk_revision_fills_item_id_on_old_schema():
+    # Схема до ревизии 0002: у заявки только строковый номер
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        InventoryItem.__table__.create(connection)
+        connection.execute(text('CREATE TABLE users (id INTEGER PRIMARY KEY)'))
+        connection.execute(text(
+            'CREATE TABLE user_requests (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, '
+            'request_type VARCHAR(50) NOT NULL, inventory_number VARCHAR(50) NOT NULL, '
+            "status VARCHAR(20) NOT NULL DEFAULT 'pending', created_at DATETIME, processed_at DATETIME)"))
+        connection.execute(text("INSERT INTO inventory_items (id, inventory_number, name, condition, is_available) "
+                                "VALUES (7, '1-0007', 'Мяч', 'new', 1)"))
+        connection.execute(text("INSERT INTO user_requests (user_id, request_type, inventory_number) "
+                                "VALUES (1, 'get_item', '1-0007'), (1, 'get_item', 'нет такого')"))
+
+        _user_request_item_fk(connection)
+
+        rows = connection.execute(text('SELECT inventory_number, item_id FROM user_requests ORDER BY id')).all()
+        indexes = {index['name'] for index in inspect(connection).get_indexes('user_requests')}
+    assert rows == [('1-0007', 7), ('нет такого', None)]
+    assert 'ix_user_requests_item_id' in indexes
+
+
+def test_missing_indexes_are_created_once():
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        connection.execute(text(
+            'CREATE TABLE inventory_items (id INTEGER PRIMARY KEY, inventory_number VARCHAR(50), name VARCHAR(100), '
+            'condition VARCHAR(50), is_available BOOLEAN, assigned_to INTEGER)'))
+        _create_missing_indexes(connection, InventoryItem)
+        _create_missing_indexes(connection, InventoryItem)
+        existing = {index['name'] for index in inspect(connection).get_indexes('inventory_items')}
+    assert {index.name for index in InventoryItem.__table__.indexes} <= existing
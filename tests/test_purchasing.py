@@ -0,0 +1,80 @@
+import pytest
+
+from models import db, InventoryItem, PurchasePlan
+from purchasing import ReceiveError, receive_plans
+from stats import compute_counters, get_counters, reconcile_counters
+
+
+def make_plan(item_name='Мяч', quantity=1, **values):
+    plan = PurchasePlan(item_name=item_name, quantity=quantity, **values)
+    db.session.add(plan)
+    db.session.commit()
+    return plan
+
+
+def numbers():
+    return [number for (number,) in db.session.query(InventoryItem.inventory_number).order_by(InventoryItem.id)]
+
+
+def test_receive_creates_numbered_items(admin):
+    first = make_plan('Мяч', quantity=2)
+    second = make_plan('Сетка', quantity=1)
+
+    results = receive_plans([first.id, second.id], '2024/', admin.id)
+
+    assert [result.status for result in results] == ['received', 'received']
+    assert (results[0].first_number, results[0].last_number) == ('2024/000001', '2024/000002')
+    assert numbers() == ['2024/000001', '2024/000002', '2024/000003']
+    assert first.status == second.status == 'received'
+    assert first.received_at is not None
+
+
+def test_receive_continues_existing_sequence(admin):
+    db.session.add_all([InventoryItem(inventory_number='2024/000040', name='Мяч'),
+                        InventoryItem(inventory_number='2024/000040-1', name='Номер другого вида')])
+    db.session.commit()
+    plan = make_plan(quantity=1)
+
+    result, = receive_plans([plan.id], '2024/', admin.id)
+
+    assert result.first_number == '2024/000041'
+
+
+def test_received_and_unknown_plans_are_skipped(admin):
+    plan = make_plan(status='received')
+
+    results = receive_plans([plan.id, 999], '2024/', admin.id)
+
+    assert [result.status for result in results] == ['skipped', 'not_found']
+    assert numbers() == []
+
+
+def test_invalid_prefix_changes_nothing(admin):
+    plan = make_plan()
+
+    with pytest.raises(ReceiveError):
+        receive_plans([plan.id], 'abc/', admin.id)
+
+    assert plan.status == 'planned'
+
+
+def test_too_many_items_changes_nothing(admin, monkeypatch):
+    monkeypatch.setattr('purchasing.MAX_RECEIVE_ITEMS', 3)
+    plan = make_plan(quantity=4)
+
+    with pytest.raises(ReceiveError):
+        receive_plans([plan.id], '2024/', admin.id)
+
+    db.session.expire_all()
+    assert db.session.get(PurchasePlan, plan.id).status == 'planned'
+    assert numbers() == []
+
+
+def test_receive_keeps_counters_in_sync(admin):
+    reconcile_counters()
+    plan = make_plan(quantity=5)
+
+    receive_plans([plan.id], '2024/', admin.id)
+
+    counters = get_counters()
+    assert all(counters.get(name, 0) == value for name, value in compute_counters().items())
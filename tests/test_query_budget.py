@@ -0,0 +1,58 @@
+"""
+Бюджеты SQL-запросов маршрутов с @query_budget. QUERY_BUDGET_MODE=raise (conftest.py):
+превышение бюджета — 500 вместо 200. Данных по несколько строк на связь, чтобы N+1 был виден.
+"""
+import pytest
+
+from models import db, ActionLog, Job, PurchasePlan, UserRequest
+
+from conftest import login, make_items, make_user
+
+# (endpoint, кто, метод, URL, JSON)
+BUDGET_ROUTES = [
+    ('api_v1.list_items', 'admin', 'GET', '/api/v1/items?q=Мяч', None),
+    ('api_v1.lookup_items', 'user', 'POST', '/api/v1/items/lookup', {'numbers': ['1-0000', '1-0001', '9-9']}),
+    ('api_v1.my_items', 'user', 'GET', '/api/v1/me/items', None),
+    ('api_v1.list_requests', 'admin', 'GET', '/api/v1/requests', None),
+    ('api_v1.list_purchase_plans', 'admin', 'GET', '/api/v1/purchase_plans', None),
+    ('user_dashboard', 'user', 'GET', '/user/dashboard', None),
+    ('admin_inventory', 'admin', 'GET', '/admin/inventory?condition=new', None),
+    ('admin_requests', 'admin', 'GET', '/admin/requests', None),
+    ('reports', 'admin', 'GET', '/admin/reports', None),
+    ('admin_audit', 'admin', 'GET', '/admin/audit?user=ivanov', None),
+    ('admin_audit_api', 'admin', 'GET', '/admin/audit.json', None),
+    ('admin_users', 'admin', 'GET', '/admin/users', None),
+    ('admin_jobs', 'admin', 'GET', '/admin/jobs', None),
+]
+
+
+@pytest.fixture
+def people(admin, user):
+    users = [user, make_user('petrov'), make_user('sidorov')]
+    for index, owner in enumerate(users):
+        items = make_items(3, prefix=f'{index + 1}-', assigned_to=owner.id, is_available=False)
+        for item in items:
+            db.session.add(UserRequest(user_id=owner.id, request_type='repair_item',
+                                       inventory_number=item.inventory_number, item_id=item.id))
+            db.session.add(ActionLog(user_id=owner.id, action=f'Returned item #{item.inventory_number}'))
+    make_items(3, prefix='9-')
+    db.session.add_all([PurchasePlan(item_name=f'Мяч {i}', quantity=2) for i in range(3)])
+    db.session.add_all([Job(kind='export_inventory', created_by=admin.id) for _ in range(3)])
+    db.session.commit()
+    return {'admin': admin, 'user': user}
+
+
+def test_every_budgeted_route_is_covered(app):
+    budgeted = {endpoint for endpoint, view in app.view_functions.items() if hasattr(view, 'query_budget')}
+    assert budgeted == {route[0] for route in BUDGET_ROUTES}
+
+
+@pytest.mark.parametrize('endpoint, who, method, url, payload', BUDGET_ROUTES, ids=[route[0] for route in BUDGET_ROUTES])
+def test_route_stays_within_budget(app, client, people, endpoint, who, method, url, payload):
+    login(client, people[who])
+
+    response = client.open(url, method=method, json=payload)
+
+    assert response.status_code == 200
+    budget = app.view_functions[endpoint].query_budget
+    assert int(response.headers['X-SQL-Query-Count']) <= budget
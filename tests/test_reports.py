@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db, ActionLog, ReportWatermark, UserRequest
+from reports import checkout_durations, condition_history, refresh_reports, repair_frequency
+
+from conftest import login, make_items
+
+
+def checkout(user, item, taken_at, returned_at):
+    db.session.add(UserRequest(user_id=user.id, request_type='get_item', inventory_number=item.inventory_number,
+                               item_id=item.id, status='approved', created_at=taken_at, processed_at=taken_at))
+    db.session.add(ActionLog(user_id=user.id, action=f'Returned item #{item.inventory_number}', timestamp=returned_at))
+    db.session.commit()
+
+
+def test_checkouts_are_counted_once_per_return(user):
+    item, = make_items(1)
+    now = datetime.utcnow()
+    checkout(user, item, now - timedelta(hours=10), now - timedelta(hours=8))
+
+    refresh_reports(now=now)
+    refresh_reports(now=now + timedelta(minutes=5))
+    assert checkout_durations() == [(user.id, 'ivanov', 1, pytest.approx(2.0))]
+
+    checkout(user, item, now - timedelta(hours=5), now - timedelta(hours=1))
+    refresh_reports(now=now + timedelta(minutes=10))
+    assert checkout_durations() == [(user.id, 'ivanov', 2, pytest.approx(3.0))]
+
+
+def test_recent_history_waits_for_report_lag(user):
+    item, = make_items(1)
+    now = datetime.utcnow()
+    checkout(user, item, now - timedelta(hours=1), now - timedelta(seconds=10))
+
+    refresh_reports(now=now)
+    assert checkout_durations() == []
+
+    refresh_reports(now=now + timedelta(minutes=2))
+    assert len(checkout_durations()) == 1
+
+
+def test_repairs_and_condition_snapshot(user):
+    items = make_items(3)
+    make_items(1, prefix='2-', condition='broken')
+    for item in items[:2]:
+        db.session.add(UserRequest(user_id=user.id, request_type='repair_item', inventory_number=item.inventory_number,
+                                   item_id=item.id, status='approved', processed_at=datetime.utcnow()))
+    db.session.commit()
+
+    refresh_reports(now=datetime.utcnow() + timedelta(minutes=2))
+
+    assert sorted(repair_frequency()) == [('Мяч 0', 1), ('Мяч 1', 1)]
+    (_, snapshot), = condition_history()
+    assert snapshot['new'] == 3 and snapshot['broken'] == 1
+
+
+def test_max_age_skips_recent_refresh():
+    now = datetime.utcnow()
+    assert refresh_reports(now=now) is not None
+    assert refresh_reports(now=now + timedelta(seconds=10), max_age=300) is None
+    assert refresh_reports(now=now + timedelta(seconds=400), max_age=300) is not None
+
+
+def test_reports_page_does_not_refresh(client, admin):
+    login(client, admin)
+
+    assert client.get('/admin/reports').status_code == 200
+    assert ReportWatermark.query.count() == 0
+
+    client.post('/admin/reports/refresh')
+    assert ReportWatermark.query.filter_by(name='refreshed').count() == 1
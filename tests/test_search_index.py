@@ -0,0 +1,77 @@
+import pytest
+
+from item_sync import publish_items
+from models import db, InventoryItem
+from search_index import query_tokens, search_index, search_items, tokenize
+
+from conftest import build_index, login, make_items
+
+
+def found(query, limit=20):
+    return [item.inventory_number for item in search_items(query, limit)]
+
+
+@pytest.fixture
+def items(monkeypatch):
+    make_items(3, name='Мяч футбольный')
+    make_items(2, prefix='0012/', name='Сетка волейбольная')
+    build_index(search_index, monkeypatch)
+
+
+def test_tokenize_keeps_number_parts():
+    assert tokenize('0012/345 Мяч') == {'0012', '345', 'мяч'}
+    assert query_tokens('0012/3') == ['0012/3']
+    assert sorted(query_tokens('мяч  фут')) == ['мяч', 'фут']
+
+
+def test_every_query_word_is_a_prefix(items):
+    assert found('мяч фут') == ['1-0000', '1-0001', '1-0002']
+    assert found('фут сет') == []
+    assert found('0012/000') == ['0012/0000', '0012/0001']
+    assert found('волей', limit=1) == ['0012/0000']
+    assert found('   ') == []
+
+
+def test_orm_changes_are_written_through_on_commit(items):
+    item = InventoryItem.query.filter_by(inventory_number='1-0001').one()
+    item.name = 'Ракетка'
+    db.session.add(InventoryItem(inventory_number='2-0001', name='Ракетка теннисная', condition='new'))
+    db.session.delete(InventoryItem.query.filter_by(inventory_number='1-0002').one())
+    db.session.commit()
+
+    assert found('ракет') == ['1-0001', '2-0001']
+    assert found('мяч') == ['1-0000']
+
+
+def test_rollback_leaves_index_unchanged(items):
+    InventoryItem.query.filter_by(inventory_number='1-0001').one().name = 'Ракетка'
+    db.session.flush()
+    db.session.rollback()
+
+    assert found('ракет') == []
+    assert found('мяч') == ['1-0000', '1-0001', '1-0002']
+
+
+def test_catch_up_applies_changes_made_outside_orm(items):
+    # Как bulk_import.py: UPDATE мимо unit of work и событие 'items' в той же транзакции
+    db.session.query(InventoryItem).filter_by(inventory_number='1-0000').update(
+        {'name': 'Гиря'}, synchronize_session=False)
+    publish_items(numbers=['1-0000'])
+    db.session.commit()
+    assert found('гиря') == []
+
+    assert search_index.catch_up(search_index.version)
+
+    assert found('гиря') == ['1-0000']
+    assert found('мяч') == ['1-0001', '1-0002']
+
+
+def test_falls_back_to_db_until_index_is_built(client, user):
+    make_items(2, name='Мяч футбольный')
+    login(client, user)
+
+    response = client.get('/search', query_string={'q': '1-000'})
+
+    assert not search_index.ready
+    assert [item['inventory_number'] for item in response.get_json()['items']] == ['1-0000', '1-0001']
+    assert client.get('/search/autocomplete', query_string={'q': 'Мяч'}).get_json()[0]['value'] == '1-0000'
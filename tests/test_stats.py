@@ -0,0 +1,86 @@
+from models import db, InventoryItem, StatCounter, UserRequest
+from migrations import upgrade_schema
+from stats import (SEEDED_COUNTER, apply_deltas, compute_counters, counters_seeded, get_counters, get_version,
+                   reconcile_counters, record_bulk_changes)
+
+from conftest import make_items, make_user
+
+
+def counter_rows():
+    return db.session.query(StatCounter.name, StatCounter.value).count()
+
+
+def assert_counters_match():
+    counters = get_counters()
+    for name, value in compute_counters().items():
+        assert counters.get(name, 0) == value, name
+
+
+def test_get_counters_does_not_write_before_seeding():
+    db.session.query(StatCounter).delete()
+    make_items(3)
+    before = counter_rows()
+
+    counters = get_counters()
+
+    assert counters['items'] == 3
+    assert counters['items.condition.new'] == 3
+    assert not counters_seeded()
+    assert counter_rows() == before
+
+
+def test_upgrade_schema_seeds_counters():
+    db.session.query(StatCounter).delete()
+    make_items(2)
+
+    upgrade_schema()
+
+    assert counters_seeded()
+    assert get_counters()['items'] == 2
+
+
+def test_flush_applies_deltas_and_bumps_version():
+    reconcile_counters()
+    items = make_items(2)
+    version = get_version(InventoryItem)
+
+    items[0].condition = 'broken'
+    db.session.commit()
+    db.session.delete(items[1])
+    db.session.commit()
+
+    counters = get_counters()
+    assert counters['items'] == 1
+    assert counters['items.condition.broken'] == 1
+    assert counters.get('items.condition.new', 0) == 0
+    assert get_version(InventoryItem) == version + 2
+    assert_counters_match()
+
+
+def test_bulk_changes_keep_counters_consistent(user):
+    reconcile_counters()
+    make_items(3, is_available=False, assigned_to=user.id)
+
+    db.session.query(InventoryItem).update({'is_available': True}, synchronize_session=False)
+    record_bulk_changes(InventoryItem, 'is_available', {(False, True): 3})
+    db.session.commit()
+
+    assert_counters_match()
+
+
+def test_reconcile_keeps_versions_and_replaces_slots():
+    reconcile_counters()
+    requester = make_user('petrov')
+    db.session.add(UserRequest(user_id=requester.id, request_type='get_item', inventory_number='1-0000'))
+    db.session.commit()
+    version = get_version(UserRequest)
+    # Ручная правка БД: счётчик разошёлся с таблицей
+    apply_deltas(db.session.connection(), {'requests': 10})
+    db.session.commit()
+    assert get_counters()['requests'] == 11
+
+    counters = reconcile_counters()
+
+    assert counters['requests'] == 1 and counters[SEEDED_COUNTER] == 1
+    assert get_counters()['requests'] == 1
+    assert get_version(UserRequest) == version
@@ -0,0 +1,58 @@
+import logging
+import os
+import subprocess
+import sys
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
+import warmup
+from passwords import password_hasher
+from warmup import start_warm_up, warm_pool, warm_up
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_does_not_touch_database(tmp_path):
+    path = tmp_path / 'absent.db'
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{path}')
+
+    subprocess.run([sys.executable, '-c', 'import wsgi'], cwd=ROOT, env=env, check=True)
+
+    assert not path.exists()
+
+
+def test_warm_pool_leaves_connections_open(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path}/pool.db', poolclass=QueuePool, pool_size=5)
+
+    assert warm_pool(engine, 3) == 3
+    assert engine.pool.checkedin() == 3
+
+
+def test_warm_up_prepares_hasher_and_logs(app, monkeypatch, caplog):
+    monkeypatch.setitem(app.config, 'WARMUP_DB_CONNECTIONS', 2)
+    monkeypatch.setattr(password_hasher, 'method', 'pbkdf2:sha256:1000')
+    monkeypatch.setattr(password_hasher, '_prefix', None)
+
+    with caplog.at_level(logging.INFO, logger=warmup.logger.name):
+        warm_up(app)
+
+    assert password_hasher._prefix == 'pbkdf2:sha256:1000'
+    assert '2 db connections' in caplog.text
+
+
+def test_unreachable_database_is_only_logged(app, monkeypatch, caplog):
+    def refuse(engine, connections):
+        raise OSError('connection refused')
+    monkeypatch.setitem(app.config, 'WARMUP_DB_CONNECTIONS', 2)
+    monkeypatch.setattr(warmup, 'warm_pool', refuse)
+
+    with caplog.at_level(logging.INFO, logger=warmup.logger.name):
+        warm_up(app)
+
+    assert 'database is not reachable yet (connection refused)' in caplog.text
+
+
+def test_warm_up_can_be_disabled(app):
+    # conftest: WARMUP_ENABLED=0
+    assert start_warm_up(app) is None
@@ -0,0 +1,68 @@
+"""
+Прогрев воркера после старта — в фоновом потоке, воркер тем временем уже принимает запросы.
+
+Импорт app.py к БД не обращается (схему создаёт `flask --app app db-upgrade`), поэтому воркер
+стартует быстро и даже тогда, когда БД ещё недоступна. Прогрев заранее делает то, что иначе
+досталось бы первым запросам каждого воркера:
+- открывает WARMUP_DB_CONNECTIONS соединений пула (TCP и авторизация MySQL);
+- считает префикс хеша паролей и запускает процессы пула хеширования (passwords.py);
+- запускает сборку индексов поиска и доступности.
+Ошибки только пишутся в лог: если БД ещё не поднялась, первые запросы подключатся сами.
+"""
+import logging
+import threading
+import time
+
+from availability_index import availability_index
+from models import db
+from passwords import password_hasher
+from search_index import search_index
+
+logger = logging.getLogger(__name__)
+
+
+def warm_pool(engine, connections):
+    """Открыть connections соединений одновременно и вернуть их в пул (пул держит их открытыми)."""
+    held = []
+    try:
+        for _ in range(connections):
+            connection = engine.connect()
+            held.append(connection)
+            connection.exec_driver_sql('SELECT 1')
+    finally:
+        for connection in held:
+            connection.close()
+    return len(held)
+
+
+def warm_up(app):
+    started = time.perf_counter()
+    steps = []
+    with app.app_context():
+        connections = app.config.get('WARMUP_DB_CONNECTIONS', 0)
+        if connections > 0:
+            try:
+                steps.append(f'{warm_pool(db.engine, connections)} db connections')
+            except Exception as exc:
+                logger.warning('warm-up: database is not reachable yet (%s)', exc)
+        try:
+            password_hasher.warm_up()
+            steps.append(f'{password_hasher.workers} hash workers')
+        except Exception:
+            logger.exception('warm-up: password hasher')
+        try:
+            search_index.refresh()
+            availability_index.refresh()
+            steps.append('indexes')
+        except Exception as exc:
+            logger.warning('warm-up: indexes not started (%s)', exc)
+        db.session.remove()
+    logger.info('warm-up: %s in %.2fs', ', '.join(steps) or 'nothing', time.perf_counter() - started)
+
+
+def start_warm_up(app):
+    if not app.config.get('WARMUP_ENABLED', True):
+        return None
+    thread = threading.Thread(target=warm_up, args=(app,), name='warm-up', daemon=True)
+    thread.start()
+    return thread
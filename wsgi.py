@@ -0,0 +1,7 @@
+"""
+WSGI-точка входа для продакшена:
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from app import app
+
+application = app